@@ -1,7 +1,10 @@
 # core/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.http import Http404, JsonResponse
+from django.urls import path
 from django.utils.translation import gettext_lazy as _
-from .models import AcademicYear, Semester, Major
+from .import_jobs import resume_job, visible_jobs
+from .models import AcademicYear, Semester, Major, ImportJob
 
 # -----------------------
 # Academic Year Admin
@@ -32,3 +35,49 @@ class MajorAdmin(admin.ModelAdmin):
     list_display = ("name",)
     search_fields = ("name",)
     list_per_page = 20
+
+
+# -----------------------
+# Import Job Admin
+# -----------------------
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "status", "processed_rows", "total_rows", "created", "updated", "requested_by", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    fields = ("kind", "file", "status", "total_rows", "processed_rows", "created", "updated", "requested_by", "created_at", "finished_at", "errors")
+    readonly_fields = fields
+    actions = ("resume_jobs",)
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        return visible_jobs(request.user)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path("<int:job_id>/progress/", self.admin_site.admin_view(self.progress_view), name="core_importjob_progress"),
+        ]
+        return custom_urls + urls
+
+    def progress_view(self, request, job_id):
+        """Progress of a job, polled by the import pages."""
+        job = visible_jobs(request.user).filter(pk=job_id).first()
+        if job is None:
+            raise Http404
+        return JsonResponse({
+            "status": job.status,
+            "status_display": job.get_status_display(),
+            "finished": job.status not in ImportJob.ACTIVE,
+            "total_rows": job.total_rows,
+            "processed_rows": job.processed_rows,
+            "created": job.created,
+            "updated": job.updated,
+            "errors": job.errors,
+        })
+
+    @admin.action(description=_("បន្តការនាំចូលដែលបរាជ័យ"))
+    def resume_jobs(self, request, queryset):
+        resumed = sum(resume_job(job) for job in queryset)
+        self.message_user(request, _("បានបន្តការនាំចូលចំនួន %d") % resumed, level=messages.SUCCESS)
@@ -0,0 +1,176 @@
+"""
+Background import of uploaded spreadsheets.
+
+An upload is stored with an ImportJob and imported by a celery worker (or
+inline when IMPORT_ASYNC is off) chunk by chunk, streaming the sheet so only
+the current chunk is held in memory. Every chunk is written in one
+transaction together with the job's row counters, so the counters always
+match what is committed: a job interrupted by a worker crash or a deploy
+resumes from its last committed chunk instead of starting over. The admin
+import pages poll the job's progress.
+
+Uploaded sheets hold personal data, so a job deletes its sheet once done; a
+failed job keeps it for IMPORT_FILE_RETENTION_DAYS to be resumed, after
+which purge_failed_import_files deletes it.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.shortcuts import redirect
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ImportJob
+from .sheets import SheetReader
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+# Errors kept per job; the rest are counted in the last one
+MAX_JOB_ERRORS = 500
+# A running job whose heartbeat is older than this was interrupted
+STALE_AFTER = timedelta(minutes=10)
+
+IMPORTERS = {
+    ImportJob.Kind.STUDENTS: "apps.students.importing.StudentSheetImporter",
+    ImportJob.Kind.TEACHERS: "apps.teachers.importing.TeacherSheetImporter",
+    ImportJob.Kind.QUIZZES: "apps.quizzes.importing.QuizSheetImporter",
+}
+
+
+class SheetImporter:
+    """
+    Imports the rows of one kind of sheet. Subclasses implement import_rows
+    and may override how the sheet is read and where chunks may start.
+    """
+    chunk_size = IMPORT_CHUNK_SIZE
+
+    def __init__(self, job):
+        self.job = job
+
+    def read(self, file):
+        return SheetReader(file)
+
+    def chunks(self, reader, start):
+        """Yield the chunks of rows from position `start` on as DataFrames."""
+        return reader.chunks(self.chunk_size, start)
+
+    def import_rows(self, df):
+        """Import a chunk of rows, indexed by sheet position; returns (created, updated, [(line, message)])."""
+        raise NotImplementedError
+
+
+def start_import(kind, upload, user, total_rows=0):
+    """Store an upload and queue its import. Returns the job."""
+    upload.seek(0)
+    with transaction.atomic():
+        job = ImportJob.objects.create(kind=kind, file=upload, requested_by=user, total_rows=total_rows)
+        transaction.on_commit(lambda: _dispatch(job.id))
+    return job
+
+
+def visible_jobs(user):
+    """The jobs a user may follow: their own, or every job for superusers."""
+    jobs = ImportJob.objects.all()
+    return jobs if user.is_superuser else jobs.filter(requested_by=user)
+
+
+def requested_job(request):
+    """The job named by the ?job= parameter of an import page, or None."""
+    job_id = request.GET.get("job", "")
+    return visible_jobs(request.user).filter(pk=job_id).first() if job_id.isdigit() else None
+
+
+def redirect_to_job(request, job):
+    return redirect(f"{request.path}?job={job.pk}")
+
+
+def _dispatch(job_id):
+    if settings.IMPORT_ASYNC:
+        from .tasks import run_import
+
+        run_import.delay(job_id)
+    else:
+        run_import_job(job_id)
+
+
+def _errors(current, new):
+    errors = current + [{"line": line, "message": str(message)} for line, message in new]
+    if len(errors) > MAX_JOB_ERRORS:
+        errors = errors[:MAX_JOB_ERRORS - 1] + [{"line": None, "message": f"+{len(errors) - MAX_JOB_ERRORS + 1}"}]
+    return errors
+
+
+def run_import_job(job_id):
+    """
+    Run a queued or interrupted job to completion. Jobs that are finished or
+    running with a recent heartbeat are ignored.
+    """
+    now = timezone.now()
+    if not ImportJob.objects.filter(
+        Q(status=ImportJob.Status.PENDING) | Q(status=ImportJob.Status.RUNNING, heartbeat_at__lt=now - STALE_AFTER),
+        pk=job_id,
+    ).update(status=ImportJob.Status.RUNNING, heartbeat_at=now):
+        return
+    job = ImportJob.objects.select_related("requested_by").get(pk=job_id)
+    try:
+        importer = import_string(IMPORTERS[job.kind])(job)
+        errors = job.errors
+        processed = job.processed_rows
+        with job.file.open("rb") as file:
+            for chunk in importer.chunks(importer.read(file), job.processed_rows):
+                processed = int(chunk.index[-1]) + 1
+                with transaction.atomic():
+                    created, updated, chunk_errors = importer.import_rows(chunk)
+                    errors = _errors(errors, chunk_errors)
+                    ImportJob.objects.filter(pk=job.pk).update(
+                        processed_rows=processed, created=F("created") + created, updated=F("updated") + updated,
+                        errors=errors, heartbeat_at=timezone.now(),
+                    )
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.DONE, finished_at=timezone.now(), total_rows=processed, file="",
+        )
+        job.file.storage.delete(job.file.name)
+    except Exception as e:
+        logger.exception(f"Import job {job_id} failed")
+        job.refresh_from_db(fields=["errors"])
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.FAILED, finished_at=timezone.now(), errors=_errors(job.errors, [(None, e)]),
+        )
+
+
+def resume_job(job):
+    """Queue a failed job again; it continues after its last committed chunk."""
+    if ImportJob.objects.filter(pk=job.pk, status=ImportJob.Status.FAILED).exclude(file="").update(
+        status=ImportJob.Status.PENDING, finished_at=None,
+    ):
+        transaction.on_commit(lambda: _dispatch(job.pk))
+        return True
+    return False
+
+
+def resume_interrupted_jobs():
+    """Dispatch queued jobs and running jobs that lost their worker. Returns their ids."""
+    job_ids = list(ImportJob.objects.filter(
+        Q(status=ImportJob.Status.PENDING)
+        | Q(status=ImportJob.Status.RUNNING, heartbeat_at__lt=timezone.now() - STALE_AFTER)
+    ).values_list("id", flat=True))
+    for job_id in job_ids:
+        _dispatch(job_id)
+    return job_ids
+
+
+def purge_failed_import_files():
+    """Delete the sheets of jobs that failed more than IMPORT_FILE_RETENTION_DAYS ago. Returns their count."""
+    cutoff = timezone.now() - timedelta(days=settings.IMPORT_FILE_RETENTION_DAYS)
+    jobs = ImportJob.objects.filter(status=ImportJob.Status.FAILED, finished_at__lt=cutoff).exclude(file="")
+    purged = 0
+    for job in jobs:
+        # Skips a job resumed in the meantime
+        if ImportJob.objects.filter(pk=job.pk, status=ImportJob.Status.FAILED).update(file=""):
+            job.file.storage.delete(job.file.name)
+            purged += 1
+    return purged
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.import_jobs import purge_failed_import_files
+
+
+class Command(BaseCommand):
+    help = "Delete the uploaded sheets of failed imports older than IMPORT_FILE_RETENTION_DAYS."
+
+    def handle(self, *args, **options):
+        purged = purge_failed_import_files()
+        self.stdout.write(self.style.SUCCESS(f"Deleted the sheets of {purged} failed import job(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.import_jobs import resume_interrupted_jobs
+
+
+class Command(BaseCommand):
+    help = "Resume queued spreadsheet imports and running ones whose worker was lost, e.g. after a deploy."
+
+    def handle(self, *args, **options):
+        job_ids = resume_interrupted_jobs()
+        self.stdout.write(self.style.SUCCESS(f"Resumed {len(job_ids)} import job(s)."))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('STUDENTS', 'សិស្ស'), ('TEACHERS', 'គ្រូបង្រៀន'), ('QUIZZES', 'កម្រងតេស្ត')], max_length=10, verbose_name='ប្រភេទ')),
+                ('file', models.FileField(upload_to='imports/', verbose_name='ឯកសារ')),
+                ('status', models.CharField(choices=[('PENDING', 'កំពុងរង់ចាំ'), ('RUNNING', 'កំពុងដំណើរការ'), ('DONE', 'បានបញ្ចប់'), ('FAILED', 'បរាជ័យ')], default='PENDING', max_length=10, verbose_name='ស្ថានភាព')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='ចំនួនជួរ')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='បានដំណើរការ')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='បានបង្កើត')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='បានធ្វើបច្ចុប្បន្នភាព')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='កំហុស')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='បង្កើតនៅ')),
+                ('heartbeat_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='បញ្ចប់នៅ')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ស្នើដោយ')),
+            ],
+            options={
+                'verbose_name': 'ការនាំចូល',
+                'verbose_name_plural': 'ការនាំចូល',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_stamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='file',
+            field=models.FileField(blank=True, upload_to='imports/', verbose_name='ឯកសារ'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 # core/models.py
+from django.conf import settings
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 class AcademicYear(models.Model):
@@ -45,3 +48,71 @@ class Major(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ImportJob(models.Model):
+    """A spreadsheet upload imported by a background job, chunk by chunk."""
+
+    class Kind(models.TextChoices):
+        STUDENTS = "STUDENTS", _("សិស្ស")
+        TEACHERS = "TEACHERS", _("គ្រូបង្រៀន")
+        QUIZZES = "QUIZZES", _("កម្រងតេស្ត")
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("កំពុងរង់ចាំ")
+        RUNNING = "RUNNING", _("កំពុងដំណើរការ")
+        DONE = "DONE", _("បានបញ្ចប់")
+        FAILED = "FAILED", _("បរាជ័យ")
+
+    ACTIVE = (Status.PENDING, Status.RUNNING)
+
+    kind = models.CharField(_("ប្រភេទ"), max_length=10, choices=Kind.choices)
+    # Holds personal data: deleted once the job is done, or purged after a retention period if it failed
+    file = models.FileField(_("ឯកសារ"), upload_to="imports/", blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="+", verbose_name=_("ស្នើដោយ")
+    )
+    status = models.CharField(_("ស្ថានភាព"), max_length=10, choices=Status.choices, default=Status.PENDING)
+    total_rows = models.PositiveIntegerField(_("ចំនួនជួរ"), default=0)
+    # Sheet rows committed so far; an interrupted job resumes from here
+    processed_rows = models.PositiveIntegerField(_("បានដំណើរការ"), default=0)
+    created = models.PositiveIntegerField(_("បានបង្កើត"), default=0)
+    updated = models.PositiveIntegerField(_("បានធ្វើបច្ចុប្បន្នភាព"), default=0)
+    # [{"line": ..., "message": ...}]; line is null for errors of the whole job
+    errors = models.JSONField(_("កំហុស"), default=list, blank=True)
+    created_at = models.DateTimeField(_("បង្កើតនៅ"), auto_now_add=True)
+    # Refreshed after every chunk; a running job without a recent heartbeat was interrupted
+    heartbeat_at = models.DateTimeField(null=True, blank=True, editable=False)
+    finished_at = models.DateTimeField(_("បញ្ចប់នៅ"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("ការនាំចូល")
+        verbose_name_plural = _("ការនាំចូល")
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.get_status_display()}"
+
+
+@receiver(post_delete, sender=ImportJob)
+def delete_import_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+class Stamp(models.Model):
+    """
+    Version stamp of a scope and optional key, e.g. ("courses", "") or
+    ("user", "12"), shared by every web and worker process.
+    """
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=64, blank=True)
+    # Nanoseconds since the epoch of the last change, strictly increasing
+    value = models.BigIntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["scope", "key"], name="core_unique_stamp")]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
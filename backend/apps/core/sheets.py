@@ -0,0 +1,117 @@
+"""
+Streaming reader of uploaded import sheets.
+
+.xlsx workbooks are read with openpyxl's read-only mode and .csv files with
+the csv module, one row at a time, so only the chunk being imported is held
+in memory whatever the size of the sheet. Rows keep their position in the
+sheet: row i is line i + 2 (the header is line 1), as with pandas'
+read_excel, and chunks are DataFrames indexed by those positions.
+"""
+import codecs
+import csv
+
+import pandas as pd
+from openpyxl import load_workbook
+
+XLSX_MAGIC = b"PK\x03\x04"
+
+
+def canonical_column(header, columns=()):
+    """A stripped header, or the last of columns it contains (case-insensitively)."""
+    name = "" if header is None else str(header).strip()
+    for column in columns:
+        if column.lower() in name.lower():
+            name = column
+    return name
+
+
+def _cell(value):
+    if isinstance(value, str):
+        return value if value.strip() else None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class SheetReader:
+    """
+    Rows of the first sheet of an .xlsx workbook or of a .csv file. Headers
+    are stripped and renamed to the known column containing them; empty
+    cells read as `empty`.
+    """
+
+    def __init__(self, file, columns=(), empty=None):
+        self.file = file
+        self.aliases = columns
+        self.empty = empty
+        self.columns = None
+
+    def _is_xlsx(self):
+        self.file.seek(0)
+        magic = self.file.read(len(XLSX_MAGIC))
+        self.file.seek(0)
+        return magic == XLSX_MAGIC
+
+    def _raw_rows(self):
+        if not self._is_xlsx():
+            yield from csv.reader(codecs.iterdecode(self.file, "utf-8-sig"))
+            return
+        wb = load_workbook(self.file, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+
+    def _header(self, row):
+        columns, seen = [], {}
+        for i, header in enumerate(row):
+            name = canonical_column(header, self.aliases) or f"Unnamed: {i}"
+            # Repeated headers are numbered like pandas does
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+        return columns
+
+    def rows(self, start=0):
+        """Yield (position, values) of the rows from position `start` on, dropping trailing blank rows."""
+        raw = self._raw_rows()
+        self.columns = self._header(next(raw, ()))
+        width = len(self.columns)
+        blank = []
+        for position, row in enumerate(raw):
+            values = [_cell(value) for value in row[:width]]
+            values += [None] * (width - len(values))
+            if all(value is None for value in values):
+                blank.append(position)
+                continue
+            for blank_position in blank:
+                if blank_position >= start:
+                    yield blank_position, (self.empty,) * width
+            blank = []
+            if position >= start:
+                yield position, tuple(self.empty if value is None else value for value in values)
+
+    def frame(self, rows):
+        """A DataFrame of (position, values) rows."""
+        return pd.DataFrame(
+            [values for _position, values in rows], index=[position for position, _values in rows],
+            columns=self.columns, dtype=object,
+        )
+
+    def chunks(self, size, start=0, starts_chunk=None):
+        """
+        Yield the rows from `start` on as DataFrames of at least `size` rows
+        (but the last). A chunk is only cut before a row, as a dict, for which
+        starts_chunk is true.
+        """
+        rows = []
+        for position, values in self.rows(start):
+            if len(rows) >= size and (starts_chunk is None or starts_chunk(dict(zip(self.columns, values)))):
+                yield self.frame(rows)
+                rows = []
+            rows.append((position, values))
+        if rows:
+            yield self.frame(rows)
@@ -0,0 +1,22 @@
+from celery import shared_task
+
+from .import_jobs import purge_failed_import_files, resume_interrupted_jobs, run_import_job
+
+
+# Acknowledged once done, so a job whose worker dies is redelivered and resumes
+@shared_task(ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def run_import(job_id):
+    """Run a queued spreadsheet import job."""
+    run_import_job(job_id)
+
+
+@shared_task(ignore_result=True)
+def resume_import_jobs():
+    """Resume the import jobs that were interrupted; suitable for celery beat."""
+    resume_interrupted_jobs()
+
+
+@shared_task(ignore_result=True)
+def purge_import_files():
+    """Delete the sheets of failed imports past their retention; suitable for celery beat."""
+    purge_failed_import_files()
@@ -1,3 +1,73 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+from unittest import mock
 
-# Create your tests here.
+from openpyxl import Workbook
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from .conditional import bump_stamp, bump_stamps, get_stamp, get_stamps
+from .sheets import SheetReader
+
+
+def xlsx(rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(row)
+    file = io.BytesIO()
+    wb.save(file)
+    file.seek(0)
+    return file
+
+
+class SheetReaderTests(SimpleTestCase):
+    rows = [
+        [" Quiz title ", "Points", "Start time", "Points"],
+        ["Quiz 1", 2.0, datetime.datetime(2025, 9, 18, 9), 1],
+        ["  ", None, None, None],
+        ["", 3.5, None, None],
+        [None, None, None, None],
+        [None, None, None, None],
+    ]
+
+    def test_xlsx_rows_are_typed_and_aliased(self):
+        df, = SheetReader(xlsx(self.rows), columns=("Quiz Title", "Start Time")).chunks(10)
+
+        self.assertEqual(list(df.columns), ["Quiz Title", "Points", "Start Time", "Points.1"])
+        self.assertEqual(list(df.index), [0, 1, 2])
+        self.assertEqual(df.loc[0].tolist(), ["Quiz 1", 2, datetime.datetime(2025, 9, 18, 9), 1])
+        self.assertIsInstance(df.loc[0, "Points"], int)
+        self.assertEqual(df.loc[1].tolist(), [None] * 4)
+        self.assertEqual(df.loc[2, "Points"], 3.5)
+
+    def test_csv_chunks_start_at_allowed_rows(self):
+        file = io.StringIO()
+        csv.writer(file).writerows([["Quiz Title", "Question"]] + [["Q" if i % 3 == 0 else "", i] for i in range(10)])
+        reader = SheetReader(io.BytesIO(file.getvalue().encode("utf-8-sig")), empty="")
+
+        chunks = list(reader.chunks(2, start=1, starts_chunk=lambda row: row["Quiz Title"] == "Q"))
+
+        self.assertEqual([list(chunk.index) for chunk in chunks], [[1, 2], [3, 4, 5], [6, 7, 8], [9]])
+        self.assertEqual(chunks[0].loc[1].tolist(), ["", "1"])
+
+
+class StampTests(TestCase):
+    def test_stamps_are_shared_and_only_move_forward(self):
+        stamp = get_stamp("courses")
+        cache.clear()  # another process has its own local cache
+        self.assertEqual(get_stamps("courses", [""]), [stamp])
+
+        with mock.patch("apps.core.conditional.time.time_ns", return_value=stamp - 10):
+            bump_stamp("courses")  # from a process whose clock is behind
+        self.assertEqual(get_stamp("courses"), stamp + 1)
+        bump_stamp("user", 7)
+        self.assertEqual(get_stamps("user", [7, "7"]), [get_stamp("user", "7")] * 2)
+
+    def test_many_stamps_are_bumped_together(self):
+        before = get_stamps("user", [1, 2])
+        with self.assertNumQueries(3):  # one insert of the missing stamps and one update per scope
+            bump_stamps([("user", 1), ("user", 2), ("user", 3), ("courses", "")])
+        after = get_stamps("user", [1, 2, 3])
+        self.assertTrue(all(new > old for new, old in zip(after, before)))
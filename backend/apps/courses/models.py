@@ -3,6 +3,9 @@ from django_ckeditor_5.fields import CKEditor5Field
 from django.utils.translation import gettext_lazy as _
 from apps.classes.models import SchoolClass
 from django.conf import settings
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from apps.core.conditional import bump_stamp_on_commit
 
 class Course(models.Model):
     title = models.CharField(max_length=200, verbose_name=_("title"))
@@ -75,4 +78,18 @@ class StudentProgress(models.Model):
         verbose_name_plural = _("student progress")
 
     def __str__(self):
-        return f"{self.user.username} - {self.course.title} - {'Completed' if self.completed else 'In Progress'}"
\ No newline at end of file
+        return f"{self.user.username} - {self.course.title} - {'Completed' if self.completed else 'In Progress'}"
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=LessonPart)
+@receiver(m2m_changed, sender=Course.classes.through)
+def invalidate_course_lists(sender, **kwargs):
+    bump_stamp_on_commit("courses")
+
+
+@receiver([post_save, post_delete], sender=StudentCourseAssignment)
+@receiver([post_save, post_delete], sender=StudentProgress)
+def invalidate_user_courses(sender, instance, **kwargs):
+    bump_stamp_on_commit("user", instance.user_id)
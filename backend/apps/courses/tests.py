@@ -1,3 +1,26 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.authentication.models import CustomUser
+from .models import Course, StudentCourseAssignment, StudentProgress
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CourseListConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="S1", password="x", role="student")
+        course = Course.objects.create(title="Algebra", description="")
+        StudentCourseAssignment.objects.create(user=self.user, course=course)
+        self.course = course
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get("/api/courses/")["ETag"]
+        self.assertEqual(self.client.get("/api/courses/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentProgress.objects.create(user=self.user, course=self.course, completed=True)
+        response = self.client.get("/api/courses/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()[0]["is_completed"])
@@ -11,6 +11,7 @@ from .serializers import CourseSerializer
 from apps.students.models import Student
 from apps.students.models import Enrollment
 from apps.classes.models import SchoolClass
+from apps.core.conditional import conditional_response, load_stamps
 
 class CourseViewSet(viewsets.ModelViewSet):
     serializer_class = CourseSerializer
@@ -46,6 +47,14 @@ class CourseViewSet(viewsets.ModelViewSet):
             ).distinct()
         return Course.objects.none()
 
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        return conditional_response(
+            request, load_stamps([("courses", ""), ("user", request.user.id)]),
+            lambda: super(CourseViewSet, self).list(request, *args, **kwargs),
+        )
+
     @action(detail=False, methods=['post'], url_path='complete-course')
     def complete_course(self, request):
         user = request.user
@@ -0,0 +1,76 @@
+"""
+Per-question item analytics of a quiz.
+
+The stored points and selections of every graded attempt are loaded in one
+bulk pass and reduced with NumPy into, per question, the difficulty (p-value:
+mean share of the points earned), the discrimination (point-biserial
+correlation between the question's score and the attempt total) and how often
+each option was selected. Results are cached under the quiz version and the
+quiz's results stamp.
+"""
+import numpy as np
+
+from .cache import get_results_versioned
+from .models import AnswerOption, Question, QuizAttempt
+from .scoring import load_answers
+
+
+def _round(value):
+    return None if value is None else round(float(value), 3)
+
+
+def build_item_analytics(quiz_id, version=None):
+    """Compute the item analytics of a quiz from its graded attempts."""
+    totals = dict(QuizAttempt.objects.filter(
+        quiz_id=quiz_id, completed_at__isnull=False
+    ).exclude(grading_status=QuizAttempt.GradingStatus.GRADING).values_list('id', 'score'))
+    answers = [answer for answer in load_answers(quiz_id) if answer.attempt_id in totals]
+
+    question_ids = np.array([answer.question_id for answer in answers], dtype=np.int64)
+    points = np.array([answer.points_earned or 0 for answer in answers], dtype=float)
+    attempt_totals = np.array([totals[answer.attempt_id] or 0 for answer in answers], dtype=float)
+    selected = np.fromiter(
+        (option_id for answer in answers for option_id in answer.selected_ids), dtype=np.int64
+    )
+    option_ids, option_counts = np.unique(selected, return_counts=True)
+    selection_counts = dict(zip(option_ids.tolist(), option_counts.tolist()))
+
+    options = {}
+    for option_id, question_id, text, is_correct in AnswerOption.objects.filter(
+        question__quiz_id=quiz_id
+    ).order_by('id').values_list('id', 'question_id', 'text', 'is_correct'):
+        options.setdefault(question_id, []).append({
+            'id': option_id,
+            'text': text,
+            'is_correct': is_correct,
+            'count': selection_counts.get(option_id, 0),
+        })
+
+    items = []
+    for number, (question_id, text, question_type, max_points) in enumerate(Question.objects.filter(
+        quiz_id=quiz_id
+    ).order_by('order', 'id').values_list('id', 'text', 'question_type', 'points'), start=1):
+        mask = question_ids == question_id
+        shares = points[mask] / max_points if max_points else np.zeros(mask.sum())
+        p_value = discrimination = None
+        if shares.size:
+            p_value = shares.mean()
+        # Undefined when every student scored the same on the question or overall
+        if shares.size > 1 and shares.std() > 0 and attempt_totals[mask].std() > 0:
+            discrimination = np.corrcoef(shares, attempt_totals[mask])[0, 1]
+        items.append({
+            'question_id': question_id,
+            'number': number,
+            'text': text,
+            'question_type': question_type,
+            'responses': int(mask.sum()),
+            'p_value': _round(p_value),
+            'discrimination': _round(discrimination),
+            'options': options.get(question_id, []),
+        })
+    return {'attempts': len(totals), 'items': items}
+
+
+def get_item_analytics(quiz_id):
+    """Return the cached item analytics of a quiz."""
+    return get_results_versioned("item_analytics", quiz_id, build_item_analytics)
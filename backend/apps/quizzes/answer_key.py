@@ -0,0 +1,101 @@
+"""
+Compiled, read-only answer keys used to score quiz attempts.
+
+An answer key holds everything scoring needs about a quiz (option id sets,
+points, question types and pre-tokenized SHORT keywords) so that grading an
+attempt does not have to touch the Question/AnswerOption tables.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from .cache import get_versioned
+from .khmer import normalize, tokenize
+from .models import Question, AnswerOption
+
+
+@dataclass(frozen=True)
+class QuestionKey:
+    id: int
+    question_type: str
+    points: int
+    option_ids: frozenset
+    correct_ids: frozenset
+    # SHORT answers: normalized correct texts (see khmer.normalize) for numeric
+    # and similarity matching and the words they are segmented into.
+    numeric_targets: tuple = ()
+    correct_texts: tuple = ()
+    keywords: tuple = ()
+
+    @property
+    def wrong_ids(self):
+        return self.option_ids - self.correct_ids
+
+
+class AnswerKey:
+    """Immutable answer key of one quiz at one version."""
+
+    __slots__ = ("quiz_id", "version", "questions")
+
+    def __init__(self, quiz_id, version, questions):
+        object.__setattr__(self, "quiz_id", quiz_id)
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "questions", MappingProxyType({q.id: q for q in questions}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AnswerKey is immutable")
+
+    def __reduce__(self):
+        return (AnswerKey, (self.quiz_id, self.version, tuple(self.questions.values())))
+
+    def __getitem__(self, question_id):
+        return self.questions[question_id]
+
+    def get(self, question_id, default=None):
+        return self.questions.get(question_id, default)
+
+    def __contains__(self, question_id):
+        return question_id in self.questions
+
+    def __len__(self):
+        return len(self.questions)
+
+
+def compile_answer_key(quiz_id, version=None):
+    """Build the answer key of a quiz from the database in two queries."""
+    options = {}
+    for option_id, question_id, is_correct, text in AnswerOption.objects.filter(
+        question__quiz_id=quiz_id
+    ).values_list("id", "question_id", "is_correct", "text"):
+        options.setdefault(question_id, []).append((option_id, is_correct, text or ""))
+
+    questions = []
+    for question_id, question_type, points in Question.objects.filter(
+        quiz_id=quiz_id
+    ).values_list("id", "question_type", "points"):
+        question_options = options.get(question_id, [])
+        correct = [(option_id, text) for option_id, is_correct, text in question_options if is_correct]
+        numeric_targets = correct_texts = keywords = ()
+        if question_type == "SHORT":
+            correct_texts = tuple(normalize(text) for _, text in correct)
+            numeric_targets = correct_texts
+            keywords = tuple(kw for text in correct_texts for kw in tokenize(text))
+        questions.append(QuestionKey(
+            id=question_id,
+            question_type=question_type,
+            points=points,
+            option_ids=frozenset(option_id for option_id, _, _ in question_options),
+            correct_ids=frozenset(option_id for option_id, _ in correct),
+            numeric_targets=numeric_targets,
+            correct_texts=correct_texts,
+            keywords=keywords,
+        ))
+    return AnswerKey(quiz_id, version, questions)
+
+
+def get_answer_key(quiz_id):
+    """
+    Return the compiled answer key of a quiz.
+    Keys are memoized in-process and in the shared cache under the quiz version,
+    which is bumped whenever a Question or AnswerOption of the quiz changes.
+    """
+    return get_versioned("answer_key", quiz_id, compile_answer_key)
@@ -0,0 +1,63 @@
+"""
+Version stamps for quiz-derived caches.
+
+Every cache entry computed from a quiz's questions and options is keyed by the
+quiz version, so bumping the version is all that is needed to invalidate them.
+Versions are database stamps, so a change saved by any process is seen by
+every other one on its next read.
+"""
+from functools import lru_cache
+
+from django.core.cache import cache
+
+from apps.core.conditional import bump_stamp, get_stamp, load_stamps
+
+QUIZ_SCOPE = "quiz"
+VERSIONED_CACHE_KEY = "quizzes:{name}:{quiz_id}:{version}"
+VERSIONED_TIMEOUT = 60 * 60 * 24
+# Stamp scope bumped whenever the graded attempts of a quiz change
+RESULTS_SCOPE = "quiz_results"
+
+
+def get_quiz_version(quiz_id):
+    """Return the current version stamp of a quiz, creating one if missing."""
+    return get_stamp(QUIZ_SCOPE, quiz_id)
+
+
+def bump_quiz_version(quiz_id):
+    """Invalidate every cached artefact of a quiz by issuing a new stamp."""
+    bump_stamp(QUIZ_SCOPE, quiz_id)
+
+
+@lru_cache(maxsize=512)
+def _load_versioned(name, quiz_id, version, build):
+    key = VERSIONED_CACHE_KEY.format(name=name, quiz_id=quiz_id, version=version)
+    value = cache.get(key)
+    if value is None:
+        value = build(quiz_id, version)
+        cache.set(key, value, timeout=VERSIONED_TIMEOUT)
+    return value
+
+
+def get_versioned(name, quiz_id, build):
+    """
+    Return `build(quiz_id, version)` for the current quiz version.
+    Results are memoized in-process and in the shared cache, so they must be
+    picklable and treated as read-only.
+    """
+    return _load_versioned(name, quiz_id, get_quiz_version(quiz_id), build)
+
+
+def get_results_versioned(name, quiz_id, build):
+    """
+    Like get_versioned, for artefacts that also depend on the graded attempts
+    of a quiz: they are keyed by the quiz version and the quiz's results stamp.
+    Only the shared cache is used, as results change with every submission.
+    """
+    version = ".".join(map(str, load_stamps([(QUIZ_SCOPE, quiz_id), (RESULTS_SCOPE, quiz_id)])))
+    key = VERSIONED_CACHE_KEY.format(name=name, quiz_id=quiz_id, version=version)
+    value = cache.get(key)
+    if value is None:
+        value = build(quiz_id, version)
+        cache.set(key, value, timeout=VERSIONED_TIMEOUT)
+    return value
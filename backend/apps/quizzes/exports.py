@@ -0,0 +1,128 @@
+"""
+Score exports written with openpyxl's write-only mode.
+
+Rows are streamed into the workbook as they are read from one annotated query
+per quiz, styled through shared named styles, so memory stays bounded whatever
+the number of attempts. Gradebooks are written from their pivoted matrix.
+"""
+import tempfile
+from datetime import datetime
+
+from django.db.models import OuterRef, Subquery
+from django.utils.translation import gettext as _
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, Side
+from openpyxl.utils import get_column_letter
+
+from apps.students.models import Enrollment, Student
+
+COLUMN_WIDTH = 20
+# Attempt rows fetched from the database at a time
+ROW_CHUNK_SIZE = 2000
+
+_thin = Side(style='thin')
+_border = Border(left=_thin, right=_thin, top=_thin, bottom=_thin)
+_center = Alignment(horizontal="center", vertical="center")
+STYLES = (
+    NamedStyle(name="quiz_title", font=Font(bold=True, size=14, name="Khmer OS"), alignment=Alignment(horizontal="center")),
+    NamedStyle(name="quiz_date", alignment=Alignment(horizontal="center")),
+    NamedStyle(name="quiz_header", font=Font(bold=True, name="Khmer OS"), alignment=_center, border=_border),
+    NamedStyle(name="quiz_cell", font=Font(name="Khmer OS Siemreap"), alignment=_center, border=_border),
+)
+
+
+def _cell(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+
+def score_rows(attempts, current_year):
+    """Yield one export row per attempt, resolving the students' classes in the same query."""
+    gender = dict(Student.Gender.choices)
+    unknown = _("មិនស្គាល់")
+    class_name = Enrollment.objects.filter(
+        student=OuterRef('student_id'), status=Enrollment.Status.ACTIVE, academic_year=current_year
+    ).values('school_class__name')[:1]
+    # Without a current year academic_year=None matches nothing and every class is unknown
+    rows = attempts.annotate(class_name=Subquery(class_name)).values_list(
+        'student__student_id', 'student__family_name', 'student__given_name', 'student__gender',
+        'student__date_of_birth', 'class_name', 'score',
+    )
+    for student_id, family_name, given_name, student_gender, date_of_birth, student_class, score in rows.iterator(
+        chunk_size=ROW_CHUNK_SIZE
+    ):
+        yield (
+            student_id,
+            f"{family_name} {given_name}",
+            str(gender.get(student_gender, student_gender)),
+            date_of_birth.strftime("%d-%m-%Y") if date_of_birth else "",
+            student_class or str(unknown),
+            score,
+        )
+
+
+def write_scores_workbook(quizzes, attempts_for, current_year):
+    """
+    Write one score sheet per quiz into a temporary file and return it, rewound.
+    `attempts_for(quiz)` returns the attempts queryset to export for a quiz.
+    """
+    wb = Workbook(write_only=True)
+    for style in STYLES:
+        wb.add_named_style(style)
+    headers = [
+        _("អត្តលេខសិស្ស"),
+        _("ឈ្មោះសិស្ស"),
+        _("ភេទ"),
+        _("ថ្ងៃខែឆ្នាំកំណើត"),
+        _("ថ្នាក់"),
+        _("ពិន្ទុសរុប"),
+    ]
+    today = datetime.now().strftime("%d-%m-%Y")
+
+    for quiz in quizzes:
+        ws = wb.create_sheet(title=quiz.title[:31])  # Sheet title limited to 31 chars
+        for letter in "ABCDEF":
+            ws.column_dimensions[letter].width = COLUMN_WIDTH
+        ws.merged_cells.add("A1:F1")
+        ws.merged_cells.add("A2:F2")
+        ws.freeze_panes = "A5"
+
+        ws.append([_cell(ws, _("របាយការណ៍ពិន្ទុសិស្សសម្រាប់កម្រងសំណួរ: {}").format(quiz.title), "quiz_title")])
+        ws.append([_cell(ws, _("កាលបរិច្ឆេទ: {}").format(today), "quiz_date")])
+        ws.append([])
+        ws.append([_cell(ws, str(header), "quiz_header") for header in headers])
+        for row in score_rows(attempts_for(quiz), current_year):
+            ws.append([_cell(ws, value, "quiz_cell") for value in row])
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def write_gradebook_workbook(gradebook, title):
+    """Write a gradebook into a temporary file as one sheet and return it, rewound."""
+    wb = Workbook(write_only=True)
+    for style in STYLES:
+        wb.add_named_style(style)
+    headers = [_("ល.រ"), _("អត្តលេខសិស្ស"), _("ឈ្មោះសិស្ស"), _("ថ្នាក់")]
+    headers += [quiz_title for _quiz_id, quiz_title in gradebook.quizzes] + [_("មធ្យមភាគ")]
+
+    ws = wb.create_sheet(title=str(title)[:31])
+    for i in range(len(headers)):
+        ws.column_dimensions[get_column_letter(i + 1)].width = COLUMN_WIDTH
+    ws.merged_cells.add(f"A1:{get_column_letter(len(headers))}1")
+    ws.freeze_panes = "E4"
+
+    ws.append([_cell(ws, str(title), "quiz_title")])
+    ws.append([_cell(ws, _("កាលបរិច្ឆេទ: {}").format(datetime.now().strftime("%d-%m-%Y")), "quiz_date")])
+    ws.append([_cell(ws, str(header), "quiz_header") for header in headers])
+    for number, code, name, class_name, scores, average in gradebook.rows():
+        ws.append([_cell(ws, value, "quiz_cell") for value in (number, code, name, class_name, *scores, average)])
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,100 @@
+"""
+Student × quiz gradebook of classes over an academic year.
+
+The best graded score of every enrolled student in every quiz of their classes
+is read with one aggregated query and pivoted into a NumPy matrix. Gradebooks
+are cached until an attempt of one of their quizzes is graded or rescored, a
+quiz changes or enrollments change.
+"""
+import hashlib
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max
+
+from apps.core.conditional import load_stamps
+from apps.students.models import Enrollment
+from .cache import RESULTS_SCOPE, VERSIONED_TIMEOUT
+from .models import Quiz, QuizAttempt
+
+GRADEBOOK_CACHE_KEY = "quizzes:gradebook:{year_id}:{digest}"
+
+
+@dataclass
+class Gradebook:
+    # (quiz id, title) per column
+    quizzes: list
+    # (student id, name, class name) per row
+    students: list
+    # scores[row, column]; NaN where the student has no graded attempt
+    scores: np.ndarray
+    averages: np.ndarray
+
+    def rows(self, start=0, stop=None):
+        """Yield (number, student id, name, class name, scores, average) per student, None for missing values."""
+        stop = len(self.students) if stop is None else min(stop, len(self.students))
+        for i in range(start, stop):
+            scores = tuple(None if np.isnan(score) else score for score in self.scores[i].tolist())
+            average = None if np.isnan(self.averages[i]) else round(float(self.averages[i]), 2)
+            yield (i + 1, *self.students[i], scores, average)
+
+
+def gradebook_quizzes(year, class_ids=None):
+    """Quizzes of the given classes (all classes by default) starting within an academic year."""
+    quizzes = Quiz.objects.filter(start_time__date__gte=year.start_date, start_time__date__lte=year.end_date)
+    if class_ids is not None:
+        quizzes = quizzes.filter(classes__in=class_ids)
+    return list(quizzes.distinct().order_by('start_time', 'id').values_list('id', 'title'))
+
+
+def build_gradebook(year, class_ids=None, quizzes=None):
+    """Build the gradebook of the students actively enrolled in the given classes (all by default) in a year."""
+    if quizzes is None:
+        quizzes = gradebook_quizzes(year, class_ids)
+    enrollments = Enrollment.objects.filter(academic_year=year, status=Enrollment.Status.ACTIVE)
+    if class_ids is not None:
+        enrollments = enrollments.filter(school_class_id__in=class_ids)
+
+    students, row = [], {}
+    for student_id, code, family_name, given_name, class_name in enrollments.order_by(
+        'school_class__name', 'student__family_name', 'student__given_name', 'student_id'
+    ).values_list('student_id', 'student__student_id', 'student__family_name', 'student__given_name', 'school_class__name'):
+        if student_id not in row:
+            row[student_id] = len(students)
+            students.append((code, f"{family_name} {given_name}", class_name))
+    column = {quiz_id: i for i, (quiz_id, _title) in enumerate(quizzes)}
+
+    best_scores = QuizAttempt.objects.filter(
+        quiz_id__in=list(column), student_id__in=enrollments.values('student_id'),
+        completed_at__isnull=False, score__isnull=False,
+    ).exclude(grading_status=QuizAttempt.GradingStatus.GRADING).values('student_id', 'quiz_id').annotate(
+        best=Max('score')
+    ).values_list('student_id', 'quiz_id', 'best')
+    rows, columns, values = [], [], []
+    for student_id, quiz_id, best in best_scores:
+        rows.append(row[student_id])
+        columns.append(column[quiz_id])
+        values.append(best)
+
+    scores = np.full((len(students), len(quizzes)), np.nan)
+    scores[rows, columns] = values
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # students without any score
+        averages = np.nanmean(scores, axis=1) if quizzes else np.full(len(students), np.nan)
+    return Gradebook(quizzes=quizzes, students=students, scores=scores, averages=averages)
+
+
+def get_gradebook(year, class_ids=None):
+    """Return the cached gradebook of the given classes (all by default) in a year."""
+    quizzes = gradebook_quizzes(year, class_ids)
+    stamps = load_stamps([("quizzes", ""), ("enrollments", "")] + [(RESULTS_SCOPE, quiz_id) for quiz_id, _ in quizzes])
+    classes = "all" if class_ids is None else ",".join(map(str, sorted(class_ids)))
+    digest = hashlib.md5(f"{classes}:{':'.join(map(str, stamps))}".encode()).hexdigest()
+    key = GRADEBOOK_CACHE_KEY.format(year_id=year.id, digest=digest)
+    gradebook = cache.get(key)
+    if gradebook is None:
+        gradebook = build_gradebook(year, class_ids, quizzes)
+        cache.set(key, gradebook, timeout=VERSIONED_TIMEOUT)
+    return gradebook
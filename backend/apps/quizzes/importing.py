@@ -0,0 +1,415 @@
+"""
+Column mapping and validation of the admin's quiz import sheet.
+
+A sheet lists quizzes, each followed by its questions, each followed by its
+options: a row with a quiz title starts a quiz, a row with question text adds
+a question to the current quiz and a row with option text adds an option to
+the current question.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import pandas as pd
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext as _
+
+from apps.classes.models import SchoolClass
+from apps.core.conditional import bump_stamp_on_commit
+from apps.core.import_jobs import SheetImporter
+from apps.core.importing import SheetValidator, map_unique, stripped
+from apps.core.sheets import SheetReader, canonical_column
+from apps.teachers.models import Teacher
+from .cache import bump_quiz_version
+from .models import AnswerOption, Question, Quiz, QuizAttempt, QuizCategory
+from .recalculation import enqueue_recalculation
+
+QUIZ_COLUMNS = (
+    "Category", "Quiz Title", "Description", "Classes", "Time Limit", "Start Time", "Status", "Allow Check Answer",
+    "Allow See Score", "Question Text", "Question Type", "Option Text", "Is Correct", "Teacher Name", "Points",
+    "Difficulty",
+)
+REQUIRED_COLUMNS = ("Quiz Title",)
+TIME_LIMIT_RE = r"\d+:[0-5]?\d:[0-5]?\d"
+
+
+def rename_quiz_columns(df):
+    """Rename the columns containing a known column name (case-insensitively) to that name."""
+    return df.rename(columns=lambda column: canonical_column(column, QUIZ_COLUMNS))
+
+
+def quiz_sheet_reader(file):
+    return SheetReader(file, QUIZ_COLUMNS, empty="")
+
+
+def missing_columns(columns):
+    return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+
+def _values(df, column):
+    return stripped(df[column]) if column in df else pd.Series("", index=df.index)
+
+
+def _parse_start_time(value):
+    if value is None or not str(value).strip():
+        return None
+    try:
+        return parse_datetime(str(value))
+    except ValueError:
+        return None
+
+
+class QuizSheetValidator(SheetValidator):
+    """
+    Validates a quiz sheet, with columns renamed by rename_quiz_columns.
+    Whether a quiz and a question were started in an earlier chunk is kept
+    for the question and option rows of the next.
+    """
+
+    def __init__(self, user):
+        super().__init__()
+        self.user = user
+        # Superusers name the teacher of each quiz; teachers import their own quizzes
+        if user.is_superuser:
+            self.teacher_names = set(Teacher.objects.values_list("given_name", flat=True))
+        else:
+            self.has_teacher = Teacher.objects.filter(user=user).exists()
+        self.class_names = set(SchoolClass.objects.values_list("name", flat=True))
+        self.in_quiz = self.in_question = False
+
+    def validate_rows(self, df):
+        report = self.report
+        quizzes = _values(df, "Quiz Title").ne("")
+        questions = _values(df, "Question Text").ne("")
+        options = _values(df, "Option Text").ne("")
+
+        if self.user.is_superuser:
+            report.choices(df, "Teacher Name", self.teacher_names, quizzes, _("រកមិនឃើញគ្រូ"))
+        elif not self.has_teacher:
+            report.add(quizzes, "Quiz Title", _("គ្មានទម្រង់គ្រូសម្រាប់អ្នកប្រើប្រាស់"))
+
+        classes = _values(df, "Classes").where(quizzes, "")
+        class_names = classes.str.split(",").explode().str.strip()
+        unknown = class_names[class_names.ne("") & ~class_names.isin(self.class_names)]
+        if len(unknown):
+            unknown = unknown.groupby(level=0).agg(", ".join)
+            report.add(df.index.to_series().isin(unknown.index), "Classes", _("រកមិនឃើញថ្នាក់"), unknown.reindex(df.index))
+
+        time_limits = _values(df, "Time Limit")
+        report.add(
+            quizzes & time_limits.ne("") & ~time_limits.str.fullmatch(TIME_LIMIT_RE), "Time Limit",
+            _("ទម្រង់កំណត់ពេលវេលាមិនត្រឹមត្រូវ"), time_limits,
+        )
+        start_times = _values(df, "Start Time")
+        report.add(
+            quizzes & start_times.ne("") & map_unique(start_times, _parse_start_time).isna(), "Start Time",
+            _("ទម្រង់ពេលវេលាចាប់ផ្តើមមិនត្រឹមត្រូវ"), start_times,
+        )
+        statuses = _values(df, "Status").str.upper()
+        report.add(
+            quizzes & statuses.ne("") & ~statuses.isin(dict(Quiz.STATUS_CHOICES)), "Status",
+            _("ស្ថានភាពមិនត្រឹមត្រូវ"), statuses,
+        )
+
+        in_quiz = quizzes.cummax() | self.in_quiz
+        report.add(questions & ~in_quiz, "Question Text", _("សំណួរគ្មានកម្រងសំណួរ"))
+        points = _values(df, "Points")
+        report.add(
+            questions & points.ne("") & pd.to_numeric(points, errors="coerce").isna(), "Points",
+            _("ពិន្ទុមិនត្រឹមត្រូវ"), points,
+        )
+        report.choices(df, "Question Type", dict(Question.QUESTION_TYPES), questions, _("ប្រភេទសំណួរមិនត្រឹមត្រូវ"))
+        report.choices(df, "Difficulty", dict(Question.DIFFICULTY_CHOICES), questions, _("កម្រិតលំបាកមិនត្រឹមត្រូវ"))
+        in_question = questions.cummax() | self.in_question
+        report.add(options & ~in_question, "Option Text", _("ចម្លើយគ្មានសំណួរ"))
+        self.in_quiz, self.in_question = bool(in_quiz.any()), bool(in_question.any())
+
+
+def validate_quizzes(chunks, user):
+    """
+    Validate the DataFrame chunks of a quiz sheet, with columns renamed by
+    rename_quiz_columns, without writing anything. Returns a ValidationReport.
+    """
+    return QuizSheetValidator(user).validate(chunks)
+
+
+@dataclass
+class QuizImportResult:
+    created: int = 0
+    updated: int = 0
+    # (line, message) of rows skipped or imported with defaults
+    notes: list = field(default_factory=list)
+
+
+@dataclass
+class QuestionRows:
+    line: int
+    points: int
+    # Option text -> is_correct, the last row of an option wins
+    options: dict = field(default_factory=dict)
+
+
+@dataclass
+class QuizRows:
+    line: int
+    title: str
+    category: str
+    teacher_name: str
+    defaults: dict
+    # Class names from the last quiz row naming classes; None leaves the classes alone
+    class_names: list = None
+    # (text, question_type, difficulty) -> QuestionRows
+    questions: dict = field(default_factory=dict)
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes')
+    return bool(value)
+
+
+def _parse_quiz(index, row, result):
+    time_limit = None
+    time_limit_str = row.get("Time Limit", "")
+    if time_limit_str:
+        try:
+            h, m, s = map(int, str(time_limit_str).split(":"))
+            if h < 0 or m < 0 or s < 0 or m > 59 or s > 59:
+                raise ValueError
+            time_limit = timedelta(hours=h, minutes=m, seconds=s)
+        except ValueError:
+            result.notes.append((index + 2, _("ទម្រង់កំណត់ពេលវេលាមិនត្រឹមត្រូវនៅជួរទី %d: %s") % (index + 2, time_limit_str)))
+
+    start_time = _parse_start_time(row.get("Start Time", ""))
+    if row.get("Start Time", "") and not start_time:
+        result.notes.append((index + 2, _("ទម្រង់ពេលវេលាចាប់ផ្តើមមិនត្រឹមត្រូវនៅជួរទី %d: %s") % (index + 2, row.get("Start Time"))))
+
+    status = str(row.get("Status", "DRAFT")).upper()
+    if status not in dict(Quiz.STATUS_CHOICES):
+        result.notes.append((index + 2, _("ស្ថានភាពមិនត្រឹមត្រូវនៅជួរទី %d: %s. ប្រើ DRAFT") % (index + 2, status)))
+        status = "DRAFT"
+
+    class_names = row.get("Classes", "")
+    return QuizRows(
+        line=index + 2,
+        title=row["Quiz Title"],
+        category=row.get("Category") or "Imported",
+        teacher_name=row.get("Teacher Name") or "",
+        defaults={
+            "description": row.get("Description", ""),
+            "time_limit": time_limit,
+            "start_time": start_time,
+            "status": status,
+            "allow_check_answer": _flag(row.get("Allow Check Answer", False)),
+            "allow_see_score": _flag(row.get("Allow See Score", False)),
+        },
+        class_names=[name.strip() for name in class_names.split(",")]
+        if isinstance(class_names, str) and class_names.strip() else None,
+    )
+
+
+def _parse_question(index, row, result):
+    points = row.get("Points", 1)
+    try:
+        points = int(float(points)) if points else 1
+    except (ValueError, TypeError):
+        points = 1
+        result.notes.append((index + 2, _("ពិន្ទុមិនត្រឹមត្រូវនៅជួរទី %d: %s. ប្រើ 1") % (index + 2, row.get("Points"))))
+    question_type = row.get("Question Type", "MCQ_SINGLE")
+    if question_type not in dict(Question.QUESTION_TYPES):
+        result.notes.append((index + 2, _("ប្រភេទសំណួរមិនត្រឹមត្រូវនៅជួរទី %d: %s. ប្រើ MCQ_SINGLE") % (index + 2, question_type)))
+        question_type = "MCQ_SINGLE"
+    # Set difficulty to MEDIUM by default for imported questions
+    difficulty = row.get("Difficulty", "MEDIUM")
+    if difficulty not in dict(Question.DIFFICULTY_CHOICES):
+        result.notes.append((index + 2, _("កម្រិតលំបាកមិនត្រឹមត្រូវនៅជួរទី %d: %s. ប្រើ MEDIUM") % (index + 2, difficulty)))
+        difficulty = "MEDIUM"
+    return (row["Question Text"], question_type, difficulty), QuestionRows(line=index + 2, points=points)
+
+
+def group_quiz_rows(df, result):
+    """Group the rows of a quiz sheet by quiz and question, in sheet order."""
+    quizzes = []
+    current_quiz = current_question = None
+    for index, row in zip(df.index, df.to_dict("records")):
+        if row.get("Quiz Title"):
+            current_quiz = _parse_quiz(index, row, result)
+            current_question = None
+            quizzes.append(current_quiz)
+        if row.get("Question Text") and current_quiz:
+            key, question = _parse_question(index, row, result)
+            current_question = current_quiz.questions.setdefault(key, question)
+        if row.get("Option Text") and current_question:
+            current_question.options[str(row["Option Text"]).strip()] = _flag(row.get("Is Correct", False))
+    return quizzes
+
+
+def _resolve_teachers(quizzes, user, result):
+    """Map quizzes to their teacher id; quizzes without a teacher are reported and left out."""
+    if user.is_superuser:
+        names = {quiz.teacher_name for quiz in quizzes if quiz.teacher_name}
+        by_name = {}
+        for teacher_id, name in Teacher.objects.filter(given_name__in=names).order_by("-id").values_list("id", "given_name"):
+            by_name[name] = teacher_id
+    else:
+        own = Teacher.objects.filter(user=user).values_list("id", flat=True).first()
+    teachers = {}
+    for quiz in quizzes:
+        if user.is_superuser:
+            teacher_id = by_name.get(quiz.teacher_name)
+            if quiz.teacher_name and teacher_id is None:
+                result.notes.append((quiz.line, _("គ្រូ '%s' មិនមាននៅក្នុងជួរទី %d") % (quiz.teacher_name, quiz.line)))
+                continue
+        else:
+            teacher_id = own
+            if teacher_id is None:
+                result.notes.append((quiz.line, _("គ្មានទម្រង់គ្រូសម្រាប់អ្នកប្រើប្រាស់នៅជួរទី %d") % quiz.line))
+                continue
+        teachers[id(quiz)] = teacher_id
+    return teachers
+
+
+def _categories(names):
+    QuizCategory.objects.bulk_create([QuizCategory(name=name) for name in sorted(names)], ignore_conflicts=True)
+    return dict(QuizCategory.objects.filter(name__in=names).values_list("name", "id"))
+
+
+def _set_classes(quizzes, result):
+    names = {name for _quiz, rows in quizzes for name in rows.class_names}
+    class_ids = {}
+    for class_id, name in SchoolClass.objects.filter(name__in=names).values_list("id", "name"):
+        class_ids.setdefault(name, []).append(class_id)
+    links = []
+    for quiz, quiz_rows in quizzes:
+        ids = {class_id for name in quiz_rows.class_names for class_id in class_ids.get(name, ())}
+        if not ids:
+            result.notes.append((quiz_rows.line, _("គ្មានថ្នាក់ត្រឹមត្រូវសម្រាប់ '%s' នៅជួរទី %d") % (", ".join(quiz_rows.class_names), quiz_rows.line)))
+            continue
+        links.extend(Quiz.classes.through(quiz_id=quiz.id, schoolclass_id=class_id) for class_id in ids)
+    linked = {link.quiz_id for link in links}
+    Quiz.classes.through.objects.filter(quiz_id__in=linked).delete()
+    Quiz.classes.through.objects.bulk_create(links)
+
+
+def import_quiz_rows(df, user):
+    """
+    Import rows of a quiz sheet, renamed by rename_quiz_columns, as `user`.
+    Rows are grouped by quiz and question first, then quizzes, questions and
+    options are matched against the database and written in bulk, with a
+    fixed number of queries whatever the number of rows.
+    """
+    result = QuizImportResult()
+    grouped = group_quiz_rows(df, result)
+    teachers = _resolve_teachers(grouped, user, result)
+    grouped = [quiz_rows for quiz_rows in grouped if id(quiz_rows) in teachers]
+    if not grouped:
+        return result
+    categories = _categories({quiz_rows.category for quiz_rows in grouped})
+
+    with transaction.atomic():
+        # Quizzes by (title, category, teacher); rows of the same quiz are merged into the first
+        existing = {}
+        for quiz in Quiz.objects.filter(title__in={quiz_rows.title for quiz_rows in grouped}).order_by("-id"):
+            existing[(quiz.title, quiz.category_id, quiz.teacher_id)] = quiz
+        quizzes, new_quizzes, updated = {}, [], set()
+        for quiz_rows in grouped:
+            key = (quiz_rows.title, categories[quiz_rows.category], teachers[id(quiz_rows)])
+            if key not in quizzes:
+                quiz = existing.get(key)
+                if quiz is None:
+                    quiz = Quiz(title=key[0], category_id=key[1], teacher_id=key[2], **quiz_rows.defaults)
+                    new_quizzes.append(quiz)
+                else:
+                    updated.add(quiz.id)
+                quizzes[key] = (quiz, [])
+            quizzes[key][1].append(quiz_rows)
+        Quiz.objects.bulk_create(new_quizzes)
+        result.created += len(new_quizzes)
+        result.updated += len(updated)
+
+        # The last rows naming classes of a quiz set them
+        _set_classes([
+            (quiz, next(rows for rows in reversed(all_rows) if rows.class_names))
+            for quiz, all_rows in quizzes.values() if any(rows.class_names for rows in all_rows)
+        ], result)
+
+        quiz_ids = [quiz.id for quiz, _all_rows in quizzes.values()]
+        questions = {}
+        counts = {}
+        for question in Question.objects.filter(quiz_id__in=quiz_ids).order_by("-id"):
+            questions[(question.quiz_id, question.text, question.question_type, question.difficulty)] = question
+            counts[question.quiz_id] = counts.get(question.quiz_id, 0) + 1
+        new_questions, question_rows = [], []
+        for quiz, all_rows in quizzes.values():
+            for quiz_rows in all_rows:
+                for (text, question_type, difficulty), rows in quiz_rows.questions.items():
+                    key = (quiz.id, text, question_type, difficulty)
+                    if key not in questions:
+                        counts[quiz.id] = counts.get(quiz.id, 0) + 1
+                        questions[key] = Question(
+                            quiz_id=quiz.id, text=text, question_type=question_type, difficulty=difficulty,
+                            points=rows.points, order=counts[quiz.id],
+                        )
+                        new_questions.append(questions[key])
+                    question_rows.append((questions[key], rows))
+        Question.objects.bulk_create(new_questions)
+
+        options = {}
+        for option in AnswerOption.objects.filter(question__quiz_id__in=quiz_ids).order_by("-id"):
+            options[(option.question_id, option.text)] = option
+        new_options, changed_options, changed_question_ids = [], {}, {}
+        for question, rows in question_rows:
+            for text, is_correct in rows.options.items():
+                option = options.get((question.id, text))
+                if option is None:
+                    options[(question.id, text)] = AnswerOption(question_id=question.id, text=text, is_correct=is_correct)
+                    new_options.append(options[(question.id, text)])
+                elif option.pk is None:
+                    option.is_correct = is_correct
+                elif option.is_correct != is_correct:
+                    option.is_correct = is_correct
+                    changed_options[option.pk] = option
+                    changed_question_ids.setdefault(question.quiz_id, set()).add(question.id)
+        changed_options = list(changed_options.values())
+        AnswerOption.objects.bulk_create(new_options)
+        AnswerOption.objects.bulk_update(changed_options, ["is_correct"])
+
+        content_type_id = ContentType.objects.get_for_model(AnswerOption).pk
+        LogEntry.objects.bulk_create([
+            LogEntry(
+                user_id=user.id,
+                content_type_id=content_type_id,
+                object_id=str(option.pk),
+                object_repr=str(option)[:200],
+                action_flag=CHANGE,
+                change_message=_("Changed is_correct to %s for option: %s") % (option.is_correct, option.text),
+            )
+            for option in changed_options
+        ])
+
+        # Bulk writes skip the model signals that invalidate the quizzes' caches
+        for quiz_id in quiz_ids:
+            transaction.on_commit(lambda quiz_id=quiz_id: bump_quiz_version(quiz_id))
+        bump_stamp_on_commit("quizzes")
+
+        attempted = set(QuizAttempt.objects.filter(quiz_id__in=list(changed_question_ids)).values_list("quiz_id", flat=True))
+        for quiz, _all_rows in quizzes.values():
+            if quiz.id in attempted:
+                enqueue_recalculation(quiz, user, question_ids=changed_question_ids[quiz.id])
+                result.notes.append((None, _("Score recalculation queued due to answer changes in import.")))
+    return result
+
+
+class QuizSheetImporter(SheetImporter):
+    def read(self, file):
+        return quiz_sheet_reader(file)
+
+    def chunks(self, reader, start):
+        """Chunks of whole quizzes, so every chunk starts at a quiz row."""
+        return reader.chunks(self.chunk_size, start, lambda row: bool(str(row.get("Quiz Title", "")).strip()))
+
+    def import_rows(self, df):
+        result = import_quiz_rows(df, self.job.requested_by)
+        return result.created, result.updated, result.notes
@@ -0,0 +1,120 @@
+"""
+Khmer-aware normalization and word segmentation for short-answer grading.
+
+Khmer is written without spaces between words and its vowel signs are not
+word characters to `\\w`, so a regex tokenizer cuts Khmer text into meaningless
+fragments. Text is normalized (NFC, zero-width characters removed, Khmer
+digits mapped to ASCII, lowercased) and Khmer runs are segmented into words by
+longest dictionary match over orthographic syllables; syllables not covered by
+the dictionary are kept together as one unknown word. Non-Khmer text is split
+on word characters as before.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+WORDLIST = Path(__file__).resolve().parent / "data" / "khmer_words.txt"
+
+# Khmer digits to ASCII; zero-width spaces and joiners removed
+_TRANSLATION = str.maketrans(
+    "\u17e0\u17e1\u17e2\u17e3\u17e4\u17e5\u17e6\u17e7\u17e8\u17e9", "0123456789", "\u200b\u200c\u200d\u2060\ufeff"
+)
+
+# A Khmer run, or a run of other word characters
+TOKEN_RE = re.compile(r"([\u1780-\u17d3\u17dd]+)|[^\W\u1780-\u17ff]+")
+# Orthographic syllable: base consonant or independent vowel with its subscripts, vowels and signs
+SYLLABLE_RE = re.compile(r"[\u1780-\u17b3](?:\u17d2[\u1780-\u17b3]|[\u17b4-\u17d1\u17d3\u17dd])*|.", re.S)
+
+_END = None
+
+
+def normalize(text):
+    """Stripped, lowercased NFC text without zero-width characters and with ASCII digits."""
+    if not text:
+        return text
+    return unicodedata.normalize("NFC", text).translate(_TRANSLATION).strip().lower()
+
+
+class Segmenter:
+    """Dictionary-trie word segmenter with memoized results."""
+
+    def __init__(self, words, cache_size=65536):
+        self.trie = {}
+        for word in words:
+            self.add(word)
+        self.tokenize = lru_cache(maxsize=cache_size)(self._tokenize)
+
+    def add(self, word):
+        word = normalize(word)
+        if not word:
+            return
+        node = self.trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = True
+
+    def _longest_match(self, syllables, start):
+        """End index (in syllables) of the longest dictionary word starting at `start`, or None."""
+        node, end = self.trie, None
+        for i in range(start, len(syllables)):
+            for char in syllables[i]:
+                node = node.get(char)
+                if node is None:
+                    return end
+            if _END in node:
+                end = i + 1
+        return end
+
+    def segment(self, run):
+        """Split a run of Khmer text into words."""
+        syllables = SYLLABLE_RE.findall(run)
+        words, unknown, i = [], "", 0
+        while i < len(syllables):
+            end = self._longest_match(syllables, i)
+            if end is None:
+                unknown += syllables[i]
+                i += 1
+                continue
+            if unknown:
+                words.append(unknown)
+                unknown = ""
+            words.append("".join(syllables[i:end]))
+            i = end
+        if unknown:
+            words.append(unknown)
+        return words
+
+    def _tokenize(self, text):
+        tokens = []
+        for match in TOKEN_RE.finditer(normalize(text) or ""):
+            if match.group(1):
+                tokens.extend(self.segment(match.group(1)))
+            else:
+                tokens.append(match.group())
+        return tuple(tokens)
+
+
+def _read_words(path):
+    with open(path, encoding="utf-8") as wordlist:
+        for line in wordlist:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+@lru_cache(maxsize=1)
+def get_segmenter():
+    """The segmenter built from the bundled wordlist and the optional KHMER_WORDLIST file."""
+    words = list(_read_words(WORDLIST))
+    extra = getattr(settings, "KHMER_WORDLIST", None)
+    if extra:
+        words.extend(_read_words(extra))
+    return Segmenter(words)
+
+
+def tokenize(text):
+    """Words of a text: Khmer runs segmented, other text split on word characters."""
+    return get_segmenter().tokenize(text)
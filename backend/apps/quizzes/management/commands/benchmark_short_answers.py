@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.quizzes.answer_key import AnswerKey, QuestionKey
+from apps.quizzes.khmer import get_segmenter, normalize, tokenize
+from apps.quizzes.scoring import Answer, get_short_answer_matcher, grade
+
+# Correct answers of typical Khmer short-answer questions
+CORRECT_ANSWERS = (
+    "រាជធានីនៃប្រទេសកម្ពុជាគឺភ្នំពេញ",
+    "ទឹកមានអ៊ីដ្រូសែននិងអុកស៊ីសែន",
+    "រុក្ខជាតិត្រូវការពន្លឺព្រះអាទិត្យទឹកនិងកាបូនឌីអុកស៊ីត",
+    "អង្គរវត្តជាប្រាសាទនៅខេត្តសៀមរាប",
+    "បេះដូងបូមឈាមទៅសរីរាង្គទាំងអស់",
+    "ទន្លេមេគង្គហូរកាត់ប្រទេសកម្ពុជា",
+    "ព្រះអាទិត្យជាផ្កាយ",
+    "៤២",
+)
+FILLERS = ("គឺ", "ជា", "ខ្ញុំគិតថា", "ប្រហែល", "មិនដឹង")
+
+
+def make_answer(rng, correct, other):
+    """A student answer: exact, partial, reordered, padded, spaced or wrong."""
+    words = list(tokenize(correct))
+    kind = rng.random()
+    if kind < 0.3:
+        text = correct
+    elif kind < 0.6:
+        text = "".join(rng.sample(words, rng.randint(1, len(words))))
+    elif kind < 0.75:
+        text = rng.choice(FILLERS) + " ".join(words)
+    elif kind < 0.85:
+        text = "\u200b".join(words)  # typed with zero-width spaces between words
+    else:
+        text = other
+    return text
+
+
+class Command(BaseCommand):
+    help = "Measure short-answer grading throughput over a generated corpus of Khmer answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--answers", type=int, default=50000, help="Number of answers to grade (default: 50000).")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        questions = []
+        for question_id, correct in enumerate(CORRECT_ANSWERS, start=1):
+            text = normalize(correct)
+            questions.append(QuestionKey(
+                id=question_id, question_type="SHORT", points=2,
+                option_ids=frozenset({question_id}), correct_ids=frozenset({question_id}),
+                numeric_targets=(text,), correct_texts=(text,), keywords=tokenize(text),
+            ))
+        answer_key = AnswerKey(0, 0, questions)
+        answers = []
+        for i in range(options["answers"]):
+            question_id = rng.randint(1, len(CORRECT_ANSWERS))
+            other = rng.choice(CORRECT_ANSWERS)
+            answers.append(Answer(
+                attempt_id=i, question_id=question_id,
+                text_answer=make_answer(rng, CORRECT_ANSWERS[question_id - 1], other),
+            ))
+        distinct = len({(answer.question_id, normalize(answer.text_answer)) for answer in answers})
+
+        get_short_answer_matcher.cache_clear()
+        get_segmenter.cache_clear()
+        for label in ("cold", "warm"):
+            started = time.perf_counter()
+            result = grade(answer_key, answers)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label}: {len(answers)} answers ({distinct} distinct) in {elapsed:.3f}s, "
+                f"{len(answers) / elapsed:,.0f} answers/s, mean {result.points.mean():.2f} points"
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.quizzes.models import Quiz
+from apps.quizzes.provisioning import provision_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        "Create attempts and question selections for every enrolled student ahead of a quiz's start_time. "
+        "Run it from cron every few minutes, or with --quiz for specific quizzes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quiz", type=int, action="append", dest="quiz_ids", help="Quiz id (repeatable).")
+        parser.add_argument(
+            "--minutes", type=int, default=15,
+            help="Provision published quizzes starting within this many minutes (default: 15).",
+        )
+
+    def handle(self, *args, **options):
+        if options["quiz_ids"]:
+            quizzes = Quiz.objects.filter(id__in=options["quiz_ids"])
+        else:
+            now = timezone.now()
+            quizzes = Quiz.objects.filter(
+                status="PUBLISH",
+                start_time__gte=now - timedelta(minutes=options["minutes"]),
+                start_time__lte=now + timedelta(minutes=options["minutes"]),
+            )
+
+        total = 0
+        for quiz in quizzes:
+            created = provision_attempts(quiz)
+            total += created
+            self.stdout.write(f"{quiz.title} (#{quiz.id}): {created} attempt(s) provisioned")
+        self.stdout.write(self.style.SUCCESS(f"Provisioned {total} attempt(s)."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.quizzes.models import Quiz
+from apps.quizzes.stats import rebuild_quiz_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the score statistics of quizzes from their graded attempts (every quiz by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--quiz", type=int, action="append", dest="quiz_ids", help="Quiz id (repeatable).")
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.order_by("id")
+        if options["quiz_ids"]:
+            quizzes = quizzes.filter(id__in=options["quiz_ids"])
+
+        total = 0
+        for quiz in quizzes:
+            counted = rebuild_quiz_stats(quiz.id)
+            total += counted
+            self.stdout.write(f"{quiz.title} (#{quiz.id}): {counted} attempt(s) counted")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics from {total} attempt(s)."))
@@ -0,0 +1,234 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:29
+
+import django.db.models.deletion
+import django_ckeditor_5.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+        ('quizzes', '0001_initial'),
+        ('students', '0001_initial'),
+        ('teachers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='answeroption',
+            options={'verbose_name': 'ជម្រើសចម្លើយ', 'verbose_name_plural': 'ជម្រើសចម្លើយ'},
+        ),
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ('quiz', 'order'), 'verbose_name': 'សំណួរ', 'verbose_name_plural': 'សំណួរ'},
+        ),
+        migrations.AlterModelOptions(
+            name='quiz',
+            options={'verbose_name': 'កម្រងតេស្ត', 'verbose_name_plural': 'កម្រងតេស្ត'},
+        ),
+        migrations.AlterModelOptions(
+            name='quizattempt',
+            options={'verbose_name': 'ការប្រឡងតេស្ត', 'verbose_name_plural': 'ការប្រឡងតេស្ត'},
+        ),
+        migrations.AlterModelOptions(
+            name='quizcategory',
+            options={'verbose_name': 'ប្រភេទតេស្ត', 'verbose_name_plural': 'ប្រភេទតេស្ត'},
+        ),
+        migrations.AlterModelOptions(
+            name='studentresponse',
+            options={'verbose_name': 'ចម្លើយសិស្ស', 'verbose_name_plural': 'ចម្លើយសិស្ស'},
+        ),
+        migrations.RemoveField(
+            model_name='studentresponse',
+            name='quiz',
+        ),
+        migrations.RemoveField(
+            model_name='studentresponse',
+            name='student',
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.CharField(choices=[('EASY', 'ស្រួល'), ('MEDIUM', 'មធ្យម'), ('HARD', 'ពិបាក')], default='MEDIUM', max_length=10, verbose_name='កម្រិតសំណួរ'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='num_easy_questions',
+            field=models.PositiveIntegerField(default=0, help_text='ចំនួនសំណួរស្រួលដែលត្រូវជ្រើសដោយចៃដន្យសម្រាប់ការប្រឡងនីមួយៗ។', verbose_name='ចំនួនសំណួរស្រួល'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='num_hard_questions',
+            field=models.PositiveIntegerField(default=0, help_text='ចំនួនសំណួរពិបាកដែលត្រូវជ្រើសដោយចៃដន្យសម្រាប់ការប្រឡងនីមួយៗ។', verbose_name='ចំនួនសំណួរពិបាក'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='num_medium_questions',
+            field=models.PositiveIntegerField(default=0, help_text='ចំនួនសំណួរមធ្យមដែលត្រូវជ្រើសដោយចៃដន្យសម្រាប់ការប្រឡងនីមួយៗ។', verbose_name='ចំនួនសំណួរមធ្យម'),
+        ),
+        migrations.AddField(
+            model_name='studentresponse',
+            name='attempt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='quizzes.quizattempt', verbose_name='ការប្រឡង'),
+        ),
+        migrations.AlterField(
+            model_name='answeroption',
+            name='is_correct',
+            field=models.BooleanField(default=False, verbose_name='ត្រឹមត្រូវ'),
+        ),
+        migrations.AlterField(
+            model_name='answeroption',
+            name='text',
+            field=models.CharField(max_length=255, verbose_name='ចម្លើយ'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='order',
+            field=models.PositiveIntegerField(default=0, verbose_name='លំដាប់'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='points',
+            field=models.PositiveIntegerField(default=1, verbose_name='ពិន្ទុ'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='question_type',
+            field=models.CharField(choices=[('MCQ_SINGLE', 'Multiple Choice (Single Answer)'), ('MCQ_MULTI', 'Multiple Choice (Multiple Answers)'), ('SHORT', 'Short Answer')], max_length=20, verbose_name='ប្រភេទសំណួរ'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='quizzes.quiz', verbose_name='កម្រងតេស្ត'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='text',
+            field=django_ckeditor_5.fields.CKEditor5Field(blank=True, null=True, verbose_name='សំណួរ'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='allow_check_answer',
+            field=models.BooleanField(default=False, help_text='Allow students to view their answers after submission.', verbose_name='បើកអោយមើលចម្លើយ'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='allow_see_score',
+            field=models.BooleanField(default=False, help_text='Allow students to see their score after submission.', verbose_name='បើកអោយមើលពិន្ទុ'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quizzes', to='quizzes.quizcategory', verbose_name='ប្រភេទ'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='classes',
+            field=models.ManyToManyField(related_name='quizzes', to='classes.schoolclass', verbose_name='ចាត់ថ្នាក់រៀន'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='description',
+            field=models.TextField(blank=True, null=True, verbose_name='ពិពណ៌នា'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='start_time',
+            field=models.DateTimeField(blank=True, help_text='When the quiz becomes available.', null=True, verbose_name='ពេលចាប់ផ្ដើម'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'ព្រាង'), ('RELEASE', 'ប្រកាស'), ('PUBLISH', 'ផ្សព្វផ្សាយ'), ('ENDED', 'បានបញ្ចប់')], default='DRAFT', max_length=20, verbose_name='ស្ថានភាព'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='teacher',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quizzes', to='teachers.teacher', verbose_name='គ្រូបង្រៀន'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='time_limit',
+            field=models.DurationField(blank=True, help_text='Time limit for the quiz (e.g., 30 minutes).', null=True, verbose_name='រយៈពេល'),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='title',
+            field=models.CharField(max_length=200, verbose_name='ចំណងជើង'),
+        ),
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='បញ្ចប់នៅ'),
+        ),
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='quizzes.quiz', verbose_name='កម្រងតេស្ត'),
+        ),
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='score',
+            field=models.FloatField(null=True, verbose_name='ពិន្ទុ'),
+        ),
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to='students.student', verbose_name='សិស្ស'),
+        ),
+        migrations.AlterField(
+            model_name='quizcategory',
+            name='description',
+            field=models.TextField(blank=True, null=True, verbose_name='ពិពណ៌នា'),
+        ),
+        migrations.AlterField(
+            model_name='quizcategory',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='ឈ្មោះ'),
+        ),
+        migrations.AlterField(
+            model_name='studentresponse',
+            name='points_earned',
+            field=models.FloatField(blank=True, null=True, verbose_name='ពិន្ទុទទួលបាន'),
+        ),
+        migrations.AlterField(
+            model_name='studentresponse',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='quizzes.question', verbose_name='សំណួរ'),
+        ),
+        migrations.AlterField(
+            model_name='studentresponse',
+            name='selected_options',
+            field=models.ManyToManyField(blank=True, to='quizzes.answeroption', verbose_name='ជម្រើសដែលបានជ្រើស'),
+        ),
+        migrations.AlterField(
+            model_name='studentresponse',
+            name='submitted_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='ដាក់ស្នើនៅ'),
+        ),
+        migrations.AlterField(
+            model_name='studentresponse',
+            name='text_answer',
+            field=models.TextField(blank=True, null=True, verbose_name='ចម្លើយសរសេរ'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='quizattempt',
+            unique_together={('student', 'quiz')},
+        ),
+        migrations.CreateModel(
+            name='QuizAttemptQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField(default=0, verbose_name='លំដាប់')),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selected_questions', to='quizzes.quizattempt', verbose_name='ការប្រឡង')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quizzes.question', verbose_name='សំណួរ')),
+            ],
+            options={
+                'verbose_name': 'សំណួរក្នុងការប្រឡង',
+                'verbose_name_plural': 'សំណួរក្នុងការប្រឡង',
+                'ordering': ('order',),
+                'unique_together': {('attempt', 'question')},
+            },
+        ),
+    ]
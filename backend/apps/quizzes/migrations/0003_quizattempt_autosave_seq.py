@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_alter_answeroption_options_alter_question_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='autosave_seq',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='លេខលំដាប់រក្សាទុក'),
+        ),
+    ]
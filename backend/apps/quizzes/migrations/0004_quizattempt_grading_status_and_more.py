@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0003_quizattempt_autosave_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='grading_status',
+            field=models.CharField(blank=True, choices=[('GRADING', 'កំពុងដាក់ពិន្ទុ'), ('GRADED', 'បានដាក់ពិន្ទុ')], max_length=10, null=True, verbose_name='ស្ថានភាពដាក់ពិន្ទុ'),
+        ),
+        migrations.AddField(
+            model_name='quizattempt',
+            name='submitted_answers',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_quizattempt_grading_status_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecalculationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_ids', models.JSONField(blank=True, editable=False, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'កំពុងរង់ចាំ'), ('RUNNING', 'កំពុងដំណើរការ'), ('DONE', 'បានបញ្ចប់'), ('FAILED', 'បរាជ័យ')], default='PENDING', max_length=10, verbose_name='ស្ថានភាព')),
+                ('rerun', models.BooleanField(default=False, editable=False)),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='បានដំណើរការ')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='បានធ្វើបច្ចុប្បន្នភាព')),
+                ('errors', models.TextField(blank=True, verbose_name='កំហុស')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='បង្កើតនៅ')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='បញ្ចប់នៅ')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recalculation_jobs', to='quizzes.quiz', verbose_name='កម្រងតេស្ត')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ស្នើដោយ')),
+            ],
+            options={
+                'verbose_name': 'ការគណនាពិន្ទុឡើងវិញ',
+                'verbose_name_plural': 'ការគណនាពិន្ទុឡើងវិញ',
+                'ordering': ('-created_at',),
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('quiz',), name='quizzes_one_active_recalculation_per_quiz')],
+            },
+        ),
+    ]
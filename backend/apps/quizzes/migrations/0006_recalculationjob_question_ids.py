@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_recalculationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recalculationjob',
+            name='question_ids',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
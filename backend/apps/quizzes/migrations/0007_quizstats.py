@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classes', '0001_initial'),
+        ('quizzes', '0006_recalculationjob_question_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='ចំនួនដាក់ស្នើ')),
+                ('total', models.FloatField(default=0)),
+                ('total_squares', models.FloatField(default=0)),
+                ('min_score', models.FloatField(blank=True, null=True, verbose_name='ពិន្ទុទាបបំផុត')),
+                ('max_score', models.FloatField(blank=True, null=True, verbose_name='ពិន្ទុខ្ពស់បំផុត')),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='quizzes.quiz', verbose_name='កម្រងតេស្ត')),
+                ('school_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='classes.schoolclass', verbose_name='ថ្នាក់')),
+            ],
+            options={
+                'verbose_name': 'ស្ថិតិកម្រងតេស្ត',
+                'verbose_name_plural': 'ស្ថិតិកម្រងតេស្ត',
+                'constraints': [models.UniqueConstraint(fields=('quiz', 'school_class'), name='quizzes_unique_class_stats'), models.UniqueConstraint(condition=models.Q(('school_class__isnull', True)), fields=('quiz',), name='quizzes_unique_quiz_stats')],
+            },
+        ),
+    ]
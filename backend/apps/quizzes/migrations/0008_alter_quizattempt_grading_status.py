@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_quizstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='grading_status',
+            field=models.CharField(blank=True, choices=[('GRADING', 'កំពុងដាក់ពិន្ទុ'), ('GRADED', 'បានដាក់ពិន្ទុ'), ('FAILED', 'ដាក់ពិន្ទុបរាជ័យ')], max_length=10, null=True, verbose_name='ស្ថានភាពដាក់ពិន្ទុ'),
+        ),
+    ]
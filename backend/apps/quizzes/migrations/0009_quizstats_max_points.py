@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0008_alter_quizattempt_grading_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizstats',
+            name='max_points',
+            field=models.FloatField(default=0, verbose_name='ពិន្ទុអតិបរមា'),
+        ),
+    ]
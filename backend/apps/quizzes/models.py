@@ -1,10 +1,15 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django_ckeditor_5.fields import CKEditor5Field
 from apps.teachers.models import Teacher
 from apps.classes.models import SchoolClass
 from apps.students.models import Student
+from apps.core.conditional import bump_stamp_on_commit
+from .cache import RESULTS_SCOPE
 
 class QuizCategory(models.Model):
     name = models.CharField(_("ឈ្មោះ"), max_length=100, unique=True)
@@ -136,6 +141,12 @@ class AnswerOption(models.Model):
 
 
 class QuizAttempt(models.Model):
+    class GradingStatus(models.TextChoices):
+        GRADING = "GRADING", _("កំពុងដាក់ពិន្ទុ")
+        GRADED = "GRADED", _("បានដាក់ពិន្ទុ")
+        # Grading raised; the submitted answers are kept so the attempt can be queued again
+        FAILED = "FAILED", _("ដាក់ពិន្ទុបរាជ័យ")
+
     student = models.ForeignKey(
         Student, on_delete=models.CASCADE, related_name="quiz_attempts", verbose_name=_("សិស្ស")
     )
@@ -145,6 +156,13 @@ class QuizAttempt(models.Model):
     start_time = models.DateTimeField(null=True, blank=True)
     score = models.FloatField(_("ពិន្ទុ"), null=True)
     completed_at = models.DateTimeField(_("បញ្ចប់នៅ"), null=True, blank=True)
+    # Highest client sequence number applied by autosave; older writes are dropped
+    autosave_seq = models.PositiveIntegerField(_("លេខលំដាប់រក្សាទុក"), default=0, editable=False)
+    # Submitted answers are kept here until a grading worker has stored and scored them
+    grading_status = models.CharField(
+        _("ស្ថានភាពដាក់ពិន្ទុ"), max_length=10, choices=GradingStatus.choices, null=True, blank=True
+    )
+    submitted_answers = models.JSONField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = _("ការប្រឡងតេស្ត")
@@ -158,42 +176,12 @@ class QuizAttempt(models.Model):
         """
         Randomly select questions for this attempt based on quiz settings.
         Call this when creating/starting the attempt (e.g., in a view).
-        Returns a list of selected Question instances in random order.
+        Returns the selected question ids in presentation order; the selection
+        is seeded by the attempt id and therefore reproducible.
         """
-        from random import sample, shuffle
-
-        selected = []
-
-        # Easy questions
-        easy_qs = list(self.quiz.questions.filter(difficulty="EASY"))
-        num_easy = min(self.quiz.num_easy_questions, len(easy_qs)) if self.quiz.num_easy_questions > 0 else 0
-        if num_easy > 0:
-            selected.extend(sample(easy_qs, num_easy))
-
-        # Medium questions
-        medium_qs = list(self.quiz.questions.filter(difficulty="MEDIUM"))
-        num_medium = min(self.quiz.num_medium_questions, len(medium_qs)) if self.quiz.num_medium_questions > 0 else 0
-        if num_medium > 0:
-            selected.extend(sample(medium_qs, num_medium))
+        from .sampling import assign_questions
 
-        # Hard questions
-        hard_qs = list(self.quiz.questions.filter(difficulty="HARD"))
-        num_hard = min(self.quiz.num_hard_questions, len(hard_qs)) if self.quiz.num_hard_questions > 0 else 0
-        if num_hard > 0:
-            selected.extend(sample(hard_qs, num_hard))
-
-        # Shuffle the combined list for random presentation order
-        shuffle(selected)
-
-        # Create QuizAttemptQuestion instances for this attempt
-        for i, question in enumerate(selected):
-            QuizAttemptQuestion.objects.get_or_create(
-                attempt=self,
-                question=question,
-                defaults={"order": i + 1}
-            )
-
-        return selected
+        return assign_questions(self.quiz, [self.id])[self.id]
 
 
 class QuizAttemptQuestion(models.Model):
@@ -252,4 +240,191 @@ class StudentResponse(models.Model):
 
     @property
     def quiz(self):
-        return self.attempt.quiz if self.attempt else self.quiz
\ No newline at end of file
+        return self.attempt.quiz if self.attempt else self.quiz
+
+
+class RecalculationJob(models.Model):
+    """A background score recalculation of one quiz, run by a celery worker."""
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", _("កំពុងរង់ចាំ")
+        RUNNING = "RUNNING", _("កំពុងដំណើរការ")
+        DONE = "DONE", _("បានបញ្ចប់")
+        FAILED = "FAILED", _("បរាជ័យ")
+
+    ACTIVE = (Status.PENDING, Status.RUNNING)
+
+    quiz = models.ForeignKey(
+        Quiz, on_delete=models.CASCADE, related_name="recalculation_jobs", verbose_name=_("កម្រងតេស្ត")
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="+", verbose_name=_("ស្នើដោយ")
+    )
+    # Attempts to recalculate; empty means every attempt of the quiz
+    attempt_ids = models.JSONField(null=True, blank=True, editable=False)
+    # Questions whose answers changed; empty means every question is rescored
+    question_ids = models.JSONField(null=True, blank=True, editable=False)
+    status = models.CharField(_("ស្ថានភាព"), max_length=10, choices=Status.choices, default=Status.PENDING)
+    # Set when another recalculation is requested while this one is running
+    rerun = models.BooleanField(default=False, editable=False)
+    processed = models.PositiveIntegerField(_("បានដំណើរការ"), default=0)
+    updated = models.PositiveIntegerField(_("បានធ្វើបច្ចុប្បន្នភាព"), default=0)
+    errors = models.TextField(_("កំហុស"), blank=True)
+    created_at = models.DateTimeField(_("បង្កើតនៅ"), auto_now_add=True)
+    finished_at = models.DateTimeField(_("បញ្ចប់នៅ"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("ការគណនាពិន្ទុឡើងវិញ")
+        verbose_name_plural = _("ការគណនាពិន្ទុឡើងវិញ")
+        ordering = ("-created_at",)
+        constraints = [
+            # Per-quiz lock: at most one queued or running recalculation
+            models.UniqueConstraint(
+                fields=["quiz"], condition=models.Q(status__in=["PENDING", "RUNNING"]),
+                name="quizzes_one_active_recalculation_per_quiz",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz} - {self.get_status_display()}"
+
+
+class QuizStats(models.Model):
+    """
+    Running score aggregates of the graded attempts of a quiz, overall
+    (school_class is null) or of one of its classes. Kept up to date when
+    attempts are graded, rescored or deleted; see apps.quizzes.stats.
+    """
+
+    # Histogram buckets of a tenth of max_points each: [0%, 10%), [10%, 20%), ... and everything from 90% up
+    HISTOGRAM_BUCKETS = 10
+
+    quiz = models.ForeignKey(
+        Quiz, on_delete=models.CASCADE, related_name="stats", verbose_name=_("កម្រងតេស្ត")
+    )
+    school_class = models.ForeignKey(
+        SchoolClass, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="+", verbose_name=_("ថ្នាក់")
+    )
+    count = models.PositiveIntegerField(_("ចំនួនដាក់ស្នើ"), default=0)
+    total = models.FloatField(default=0)
+    total_squares = models.FloatField(default=0)
+    min_score = models.FloatField(_("ពិន្ទុទាបបំផុត"), null=True, blank=True)
+    max_score = models.FloatField(_("ពិន្ទុខ្ពស់បំផុត"), null=True, blank=True)
+    histogram = models.JSONField(default=list)
+    # Most points an attempt could score when the histogram was built; see stats.get_max_points
+    max_points = models.FloatField(_("ពិន្ទុអតិបរមា"), default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("ស្ថិតិកម្រងតេស្ត")
+        verbose_name_plural = _("ស្ថិតិកម្រងតេស្ត")
+        constraints = [
+            models.UniqueConstraint(fields=["quiz", "school_class"], name="quizzes_unique_class_stats"),
+            models.UniqueConstraint(
+                fields=["quiz"], condition=models.Q(school_class__isnull=True), name="quizzes_unique_quiz_stats",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quiz} - {self.school_class or _('ទាំងអស់')}"
+
+    def bucket(self, score):
+        if self.max_points <= 0:
+            return 0 if score <= 0 else self.HISTOGRAM_BUCKETS - 1
+        return min(max(int(score * self.HISTOGRAM_BUCKETS // self.max_points), 0), self.HISTOGRAM_BUCKETS - 1)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        if not self.count:
+            return None
+        return max(self.total_squares / self.count - self.mean ** 2, 0) ** 0.5
+
+    def add(self, score):
+        if len(self.histogram) != self.HISTOGRAM_BUCKETS:
+            self.histogram = [0] * self.HISTOGRAM_BUCKETS
+        self.count += 1
+        self.total += score
+        self.total_squares += score * score
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        self.histogram[self.bucket(score)] += 1
+
+    def remove(self, score):
+        """Take a score out; returns True when min/max may no longer hold and must be recomputed."""
+        self.count -= 1
+        self.total -= score
+        self.total_squares -= score * score
+        self.histogram[self.bucket(score)] -= 1
+        if not self.count:
+            self.total = self.total_squares = 0
+            self.min_score = self.max_score = None
+            return False
+        return score in (self.min_score, self.max_score)
+
+
+# -----------------------------
+# Signal: Invalidate cached answer keys when questions or options change
+# -----------------------------
+def _bump_quiz_version_on_commit(quiz_id):
+    from .cache import bump_quiz_version
+    transaction.on_commit(lambda: bump_quiz_version(quiz_id))
+    # Quiz lists show question counts
+    bump_stamp_on_commit("quizzes")
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def invalidate_quiz_on_change(sender, instance, **kwargs):
+    _bump_quiz_version_on_commit(instance.id)
+
+
+@receiver(m2m_changed, sender=Quiz.classes.through)
+def invalidate_quiz_lists_on_classes_change(sender, **kwargs):
+    bump_stamp_on_commit("quizzes")
+
+
+@receiver([post_save, post_delete], sender=QuizCategory)
+def invalidate_quiz_lists_on_category_change(sender, **kwargs):
+    bump_stamp_on_commit("quizzes")
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_quiz_on_question_change(sender, instance, **kwargs):
+    _bump_quiz_version_on_commit(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=AnswerOption)
+def invalidate_quiz_on_option_change(sender, instance, **kwargs):
+    try:
+        quiz_id = instance.question.quiz_id
+    except Question.DoesNotExist:
+        return
+    _bump_quiz_version_on_commit(quiz_id)
+
+
+@receiver([post_save, post_delete], sender=QuizAttempt)
+def invalidate_attempt_on_change(sender, instance, **kwargs):
+    bump_stamp_on_commit("attempt", instance.id)
+    # has_attempted in the student's quiz list
+    bump_stamp_on_commit("student", instance.student_id)
+    bump_stamp_on_commit(RESULTS_SCOPE, instance.quiz_id)
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def remove_deleted_attempt_from_stats(sender, instance, origin=None, **kwargs):
+    # The statistics of a deleted quiz go with it
+    if isinstance(origin, Quiz) or getattr(origin, "model", None) is Quiz:
+        return
+    from .stats import counts_towards_stats, record_score_changes
+    if counts_towards_stats(instance):
+        record_score_changes(instance.quiz_id, [(instance.student_id, instance.score, None)])
+
+
+@receiver([post_save, post_delete], sender=StudentResponse)
+def invalidate_attempt_on_response_change(sender, instance, **kwargs):
+    bump_stamp_on_commit("attempt", instance.attempt_id)
@@ -0,0 +1,59 @@
+"""
+Pre-rendered student-facing quiz payloads.
+
+Questions are serialized once per quiz version into JSON fragments (never
+including is_correct or SHORT answer texts); a start response is then assembled by joining the
+fragments in the attempt's order, without per-question serialization.
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_versioned
+from .models import Question, AnswerOption
+
+
+def build_question_fragments(quiz_id, version=None):
+    """
+    Map each question id to its JSON object minus the closing brace, so the
+    per-attempt presentation order can be appended when the payload is assembled.
+    """
+    options = {}
+    for option_id, question_id, text in AnswerOption.objects.filter(
+        question__quiz_id=quiz_id
+    ).order_by("id").values_list("id", "question_id", "text"):
+        options.setdefault(question_id, []).append({"id": option_id, "text": text})
+
+    fragments = {}
+    for question_id, text, question_type, difficulty, points in Question.objects.filter(
+        quiz_id=quiz_id
+    ).values_list("id", "text", "question_type", "difficulty", "points"):
+        question_data = {
+            "id": question_id,
+            "text": text or "",
+            "question_type": question_type,
+            "difficulty": difficulty,
+            "points": points,
+            # SHORT options are the accepted answers, so they are never sent to students
+            "options": [] if question_type == "SHORT" else options.get(question_id, []),
+        }
+        fragments[question_id] = json.dumps(question_data, ensure_ascii=False, separators=(",", ":")).encode()[:-1]
+    return fragments
+
+
+def get_question_fragments(quiz_id):
+    return get_versioned("question_fragments", quiz_id, build_question_fragments)
+
+
+def render_start_payload(quiz_id, header, question_ids):
+    """
+    Render `header` (a non-empty dict) as JSON bytes with a `questions` list
+    assembled from the cached fragments of `question_ids`, in that order.
+    """
+    fragments = get_question_fragments(quiz_id)
+    questions = b",".join(
+        fragments[question_id] + b',"order":%d}' % order
+        for order, question_id in enumerate((qid for qid in question_ids if qid in fragments), start=1)
+    )
+    body = JSONRenderer().render(header)
+    return body[:-1] + b',"questions":[' + questions + b"]}"
@@ -0,0 +1,45 @@
+"""
+Pre-materialization of quiz attempts.
+
+Creating every student's attempt and question selection before a quiz opens
+turns the start-time spike into read-only lookups in StartQuizView.
+"""
+import logging
+
+from django.db import transaction
+
+from apps.students.models import Enrollment
+from .models import QuizAttempt
+from .sampling import assign_questions
+
+logger = logging.getLogger(__name__)
+
+
+def provision_attempts(quiz):
+    """
+    Bulk-create the attempts and question selections of every actively enrolled
+    student of the quiz's classes. Students who already have an attempt are
+    skipped. Returns the number of attempts created.
+    """
+    student_ids = set(Enrollment.objects.filter(
+        school_class__in=quiz.classes.all(), status=Enrollment.Status.ACTIVE
+    ).values_list('student_id', flat=True))
+    student_ids -= set(QuizAttempt.objects.filter(quiz=quiz).values_list('student_id', flat=True))
+    if not student_ids:
+        return 0
+
+    with transaction.atomic():
+        # score stays empty until the student actually starts, so absentees are distinguishable
+        QuizAttempt.objects.bulk_create(
+            [QuizAttempt(quiz=quiz, student_id=student_id, score=None, start_time=quiz.start_time)
+             for student_id in student_ids],
+            ignore_conflicts=True,
+        )
+        attempt_ids = list(QuizAttempt.objects.filter(
+            quiz=quiz, student_id__in=student_ids, selected_questions__isnull=True
+        ).values_list('id', flat=True))
+
+        assign_questions(quiz, attempt_ids)
+
+    logger.info(f"Provisioned {len(attempt_ids)} attempt(s) for quiz {quiz.id}")
+    return len(attempt_ids)
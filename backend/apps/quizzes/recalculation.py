@@ -0,0 +1,249 @@
+"""
+Set-based score recalculation for the admin.
+
+All responses and selections of the attempts being recalculated are loaded in a
+few queries, graded in memory and only the points and scores that actually
+changed are written back, with bulk updates. When only some answers of a quiz
+were corrected, just the responses to those questions are rescored and the
+attempt totals shifted by the difference. Admin-triggered recalculations run
+as RecalculationJobs in a celery worker, chunk by chunk, reporting progress.
+"""
+import logging
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Concat, Round
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from apps.core.conditional import bump_stamp_on_commit
+from .answer_key import compile_answer_key
+from .cache import RESULTS_SCOPE
+from .models import Quiz, QuizAttempt, RecalculationJob, StudentResponse
+from .scoring import grade, load_answers
+from .stats import counts_towards_stats, record_score_changes
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 500
+# Attempts recalculated between two progress updates of a job
+JOB_CHUNK_SIZE = 200
+
+
+@dataclass
+class Recalculation:
+    total: int = 0
+    # (attempt, old score) of every attempt whose score changed
+    changed: list = field(default_factory=list)
+
+
+def recalculate_scores(quiz, attempts=None, user_id=None, answer_key=None, question_ids=None):
+    """
+    Re-score a queryset of attempts of a quiz (all of them by default) from
+    their stored responses. With `question_ids`, only the responses to those
+    questions are rescored and attempt totals are adjusted by the difference.
+    With `user_id`, every changed score is recorded in the admin log.
+    """
+    all_attempts = attempts is None
+    if all_attempts:
+        attempts = QuizAttempt.objects.filter(quiz=quiz)
+    if answer_key is None:
+        # Compiled straight from the database: the cached key of the quiz is only
+        # invalidated once the admin transaction that edited the answers commits.
+        answer_key = compile_answer_key(quiz.id)
+    if question_ids is not None:
+        return _recalculate_questions(quiz, attempts, all_attempts, answer_key, question_ids, user_id)
+
+    attempts = list(attempts.select_related('student', 'quiz'))
+    if not attempts:
+        return Recalculation()
+    attempt_ids = None if all_attempts else [attempt.id for attempt in attempts]
+    result = grade(answer_key, load_answers(quiz.id, attempt_ids=attempt_ids))
+
+    recalculation = Recalculation(total=len(attempts))
+    for attempt in attempts:
+        if attempt.id not in result.attempt_totals and attempt.score is None:
+            continue  # never started; keep it distinguishable from a zero score
+        new_score = result.attempt_totals.get(attempt.id, 0)
+        if attempt.score != new_score:
+            recalculation.changed.append((attempt, attempt.score))
+            attempt.score = new_score
+
+    with transaction.atomic():
+        changed_points = _save_points(result)
+        changed_attempts = [attempt for attempt, _old in recalculation.changed]
+        QuizAttempt.objects.bulk_update(changed_attempts, ['score'], batch_size=BULK_BATCH_SIZE)
+        _record_changes(quiz, changed_points, recalculation, user_id)
+    return recalculation
+
+
+def _recalculate_questions(quiz, attempts, all_attempts, answer_key, question_ids, user_id):
+    attempt_ids = None if all_attempts else list(attempts.values_list('id', flat=True))
+    total = attempts.count() if all_attempts else len(attempt_ids)
+    result = grade(answer_key, load_answers(quiz.id, attempt_ids=attempt_ids, question_ids=question_ids))
+
+    deltas = {}
+    for answer, points in result.changed():
+        deltas[answer.attempt_id] = deltas.get(answer.attempt_id, 0) + points - (answer.points_earned or 0)
+    # A correction usually moves many attempts by the same amount: one UPDATE per distinct delta
+    by_delta = {}
+    for attempt_id, delta in deltas.items():
+        if round(delta, 2):
+            by_delta.setdefault(round(delta, 2), []).append(attempt_id)
+
+    changed_attempts = list(QuizAttempt.objects.filter(
+        id__in=[attempt_id for ids in by_delta.values() for attempt_id in ids]
+    ).select_related('student', 'quiz'))
+    recalculation = Recalculation(total=total)
+    for attempt in changed_attempts:
+        recalculation.changed.append((attempt, attempt.score))
+        attempt.score = round((attempt.score or 0) + deltas[attempt.id], 2)
+
+    with transaction.atomic():
+        changed_points = _save_points(result)
+        for delta, ids in by_delta.items():
+            QuizAttempt.objects.filter(id__in=ids).update(score=Round(Coalesce(F('score'), 0.0) + delta, 2))
+        _record_changes(quiz, changed_points, recalculation, user_id)
+    return recalculation
+
+
+def _save_points(result):
+    """Write back the points that changed; returns the attempt ids they belong to."""
+    changed = list(result.changed())
+    StudentResponse.objects.bulk_update([
+        StudentResponse(id=answer.response_id, points_earned=points) for answer, points in changed
+    ], ['points_earned'], batch_size=BULK_BATCH_SIZE)
+    return {answer.attempt_id for answer, _points in changed}
+
+
+def _record_changes(quiz, changed_points, recalculation, user_id):
+    changed_attempts = [attempt for attempt, _old in recalculation.changed]
+    record_score_changes(quiz.id, [
+        (attempt.student_id, old, attempt.score) for attempt, old in recalculation.changed
+        if counts_towards_stats(attempt)
+    ])
+    # Bulk writes skip the model signals that keep review and list ETags fresh
+    for attempt_id in changed_points | {attempt.id for attempt in changed_attempts}:
+        bump_stamp_on_commit("attempt", attempt_id)
+    for attempt in changed_attempts:
+        bump_stamp_on_commit("student", attempt.student_id)
+    if changed_points or changed_attempts:
+        bump_stamp_on_commit(RESULTS_SCOPE, quiz.id)
+
+    if user_id and changed_attempts:
+        content_type_id = ContentType.objects.get_for_model(QuizAttempt).pk
+        LogEntry.objects.bulk_create([
+            LogEntry(
+                user_id=user_id,
+                content_type_id=content_type_id,
+                object_id=str(attempt.pk),
+                object_repr=str(attempt)[:200],
+                action_flag=CHANGE,
+                change_message=_("គណនាពិន្ទុឡើងវិញទៅ %s សម្រាប់កម្រងសំណួរ: %s") % (attempt.score, quiz.title),
+            )
+            for attempt in changed_attempts
+        ], batch_size=BULK_BATCH_SIZE)
+
+
+def _merge(current, requested):
+    """Union of two id lists where None means everything."""
+    if current is None or requested is None:
+        return None
+    return sorted(set(current) | set(requested))
+
+
+def enqueue_recalculation(quiz, user=None, attempt_ids=None, question_ids=None):
+    """
+    Queue a recalculation of a quiz, limited to `attempt_ids` and to the
+    responses to `question_ids` when given.
+    Returns (job, created). While a job of the quiz is queued or running no
+    other one is created: the active job is widened to cover the request and,
+    if already running, makes another pass once done.
+    """
+    with transaction.atomic():
+        # Lock the quiz row so concurrent requests cannot both create a job
+        Quiz.objects.select_for_update().filter(pk=quiz.pk).first()
+        job = RecalculationJob.objects.filter(quiz=quiz, status__in=RecalculationJob.ACTIVE).first()
+        if job:
+            # The worker clears `rerun` when it claims the job, so only a running job makes another pass
+            if RecalculationJob.objects.filter(pk=job.pk, status__in=RecalculationJob.ACTIVE).update(
+                attempt_ids=_merge(job.attempt_ids, attempt_ids),
+                question_ids=_merge(job.question_ids, question_ids),
+                rerun=True,
+            ):
+                return job, False
+
+        job = RecalculationJob.objects.create(
+            quiz=quiz, requested_by=user,
+            attempt_ids=None if attempt_ids is None else sorted(attempt_ids),
+            question_ids=None if question_ids is None else sorted(question_ids),
+        )
+        transaction.on_commit(lambda: _dispatch(job.id))
+    return job, True
+
+
+def _dispatch(job_id):
+    if settings.QUIZ_ASYNC_RECALCULATION:
+        from .tasks import run_recalculation
+
+        run_recalculation.delay(job_id)
+    else:
+        run_recalculation_job(job_id)
+
+
+def _run_pass(job):
+    attempts = QuizAttempt.objects.filter(quiz_id=job.quiz_id)
+    if job.attempt_ids is not None:
+        attempts = attempts.filter(id__in=job.attempt_ids)
+    attempt_ids = list(attempts.order_by('id').values_list('id', flat=True))
+    answer_key = compile_answer_key(job.quiz_id)
+
+    failed = False
+    for start in range(0, len(attempt_ids), JOB_CHUNK_SIZE):
+        chunk = attempt_ids[start:start + JOB_CHUNK_SIZE]
+        updated, error = 0, ""
+        try:
+            recalculation = recalculate_scores(
+                job.quiz, QuizAttempt.objects.filter(id__in=chunk),
+                user_id=job.requested_by_id, answer_key=answer_key, question_ids=job.question_ids,
+            )
+            updated = len(recalculation.changed)
+        except Exception as e:
+            logger.exception(f"Recalculation job {job.id} failed for attempts {chunk[0]}-{chunk[-1]}")
+            error = f"attempts {chunk[0]}-{chunk[-1]}: {e}\n"
+            failed = True
+        RecalculationJob.objects.filter(pk=job.pk).update(
+            processed=F('processed') + len(chunk), updated=F('updated') + updated,
+            errors=Concat(F('errors'), Value(error)),
+        )
+    return not failed
+
+
+def run_recalculation_job(job_id):
+    """Run a queued job to completion. Jobs that are not queued are ignored."""
+    if not RecalculationJob.objects.filter(
+        pk=job_id, status=RecalculationJob.Status.PENDING
+    ).update(status=RecalculationJob.Status.RUNNING, rerun=False):
+        return
+    job = RecalculationJob.objects.select_related('quiz').get(pk=job_id)
+    succeeded = True
+    try:
+        while True:
+            succeeded = _run_pass(job) and succeeded
+            # Finish unless another recalculation was requested meanwhile
+            if RecalculationJob.objects.filter(pk=job.pk, rerun=False).update(
+                status=RecalculationJob.Status.DONE if succeeded else RecalculationJob.Status.FAILED,
+                finished_at=timezone.now(),
+            ):
+                break
+            RecalculationJob.objects.filter(pk=job.pk).update(rerun=False)
+            job.refresh_from_db(fields=['attempt_ids', 'question_ids'])
+    except Exception as e:
+        logger.exception(f"Recalculation job {job_id} failed")
+        RecalculationJob.objects.filter(pk=job_id).update(
+            status=RecalculationJob.Status.FAILED, finished_at=timezone.now(), errors=Concat(F('errors'), Value(f"{e}\n")),
+        )
@@ -0,0 +1,73 @@
+"""
+Student × question response matrix for the admin response report.
+
+The responses of a page of attempts are loaded in a fixed number of queries
+into a grid of indexes into a table of distinct answer labels, and rendered
+from precomputed row tuples.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.utils.translation import gettext as _
+
+from .models import AnswerOption, QuizAttempt
+from .scoring import load_answers
+
+NO_ANSWER = 0
+
+
+@dataclass
+class ResponseMatrix:
+    headers: list
+    students: list
+    scores: list
+    # cells[row, column] indexes `labels`; NO_ANSWER where nothing was answered
+    cells: np.ndarray
+    labels: list
+
+    def rows(self, start=1):
+        """Yield (number, student name, answer labels, score) per student."""
+        for i, (name, score) in enumerate(zip(self.students, self.scores)):
+            yield start + i, name, tuple(self.labels[index] for index in self.cells[i]), score
+
+
+def build_response_matrix(quiz, attempt_ids):
+    """Build the matrix of the given attempts of a quiz, in the given order."""
+    attempt_ids = list(attempt_ids)
+    question_ids = list(quiz.questions.order_by('order', 'id').values_list('id', flat=True))
+    column = {question_id: i for i, question_id in enumerate(question_ids)}
+    attempts = {
+        attempt_id: (f"{family_name} {given_name}", score)
+        for attempt_id, family_name, given_name, score in QuizAttempt.objects.filter(id__in=attempt_ids).values_list(
+            'id', 'student__family_name', 'student__given_name', 'score'
+        )
+    }
+    attempt_ids = [attempt_id for attempt_id in attempt_ids if attempt_id in attempts]
+    row = {attempt_id: i for i, attempt_id in enumerate(attempt_ids)}
+
+    answers = load_answers(quiz.id, attempt_ids=attempt_ids)
+    option_text = dict(AnswerOption.objects.filter(
+        id__in={option_id for answer in answers for option_id in answer.selected_ids}
+    ).values_list('id', 'text'))
+
+    labels = [_("No answer")]
+    label_index = {}
+    cells = np.full((len(attempt_ids), len(question_ids)), NO_ANSWER, dtype=np.int32)
+    for answer in answers:
+        if answer.question_id not in column:
+            continue
+        label = answer.text_answer or ', '.join(option_text.get(option_id, '') for option_id in sorted(answer.selected_ids))
+        if not label:
+            continue
+        if label not in label_index:
+            label_index[label] = len(labels)
+            labels.append(label)
+        cells[row[answer.attempt_id], column[answer.question_id]] = label_index[label]
+
+    return ResponseMatrix(
+        headers=[f"Q{i + 1}" for i in range(len(question_ids))],
+        students=[attempts[attempt_id][0] for attempt_id in attempt_ids],
+        scores=[attempts[attempt_id][1] for attempt_id in attempt_ids],
+        cells=cells,
+        labels=labels,
+    )
@@ -0,0 +1,66 @@
+"""
+Stratified question sampling for quiz attempts.
+
+The question ids of a quiz are loaded per difficulty in one query and cached
+under the quiz version. Each attempt samples from them with a generator seeded
+by its own id, so any attempt's selection can be reproduced for audits.
+"""
+from random import Random
+
+from .cache import get_versioned
+from .models import Question, QuizAttemptQuestion
+
+DIFFICULTIES = ("EASY", "MEDIUM", "HARD")
+
+
+def build_question_strata(quiz_id, version=None):
+    """Return {difficulty: sorted question ids} of a quiz in one query."""
+    strata = {}
+    for question_id, difficulty in Question.objects.filter(quiz_id=quiz_id).order_by("id").values_list(
+        "id", "difficulty"
+    ):
+        strata.setdefault(difficulty, []).append(question_id)
+    return {difficulty: tuple(question_ids) for difficulty, question_ids in strata.items()}
+
+
+def get_question_strata(quiz_id):
+    """Cached question strata of the quiz's current version."""
+    return get_versioned("question_strata", quiz_id, build_question_strata)
+
+
+def sample_questions(quiz, attempt_id, strata=None):
+    """
+    Pick the question ids of an attempt, in presentation order.
+    The same attempt id and question bank always yield the same selection.
+    """
+    if strata is None:
+        strata = get_question_strata(quiz.id)
+    quotas = {
+        "EASY": quiz.num_easy_questions,
+        "MEDIUM": quiz.num_medium_questions,
+        "HARD": quiz.num_hard_questions,
+    }
+    rng = Random(attempt_id)
+    selected = []
+    for difficulty in DIFFICULTIES:
+        pool = strata.get(difficulty, ())
+        quota = quotas[difficulty]
+        if quota > 0 and pool:
+            selected.extend(rng.sample(pool, min(quota, len(pool))))
+    rng.shuffle(selected)
+    return selected
+
+
+def assign_questions(quiz, attempt_ids):
+    """
+    Sample and store the questions of several attempts of a quiz with a single
+    bulk insert. Returns {attempt_id: [question ids in order]}.
+    """
+    strata = get_question_strata(quiz.id)
+    selections = {attempt_id: sample_questions(quiz, attempt_id, strata) for attempt_id in attempt_ids}
+    QuizAttemptQuestion.objects.bulk_create([
+        QuizAttemptQuestion(attempt_id=attempt_id, question_id=question_id, order=i + 1)
+        for attempt_id, question_ids in selections.items()
+        for i, question_id in enumerate(question_ids)
+    ], ignore_conflicts=True)
+    return selections
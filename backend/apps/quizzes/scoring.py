@@ -0,0 +1,244 @@
+"""
+Scoring engine shared by quiz submission and admin recalculation.
+
+A batch of answers (any number of attempts of one quiz) is graded against the
+quiz's compiled answer key in a single in-memory pass: MCQ set arithmetic is
+done with NumPy over flat selection arrays, SHORT answers with a compiled
+matcher per question that scores each distinct answer once.
+"""
+import copy
+import difflib
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .khmer import normalize
+from .models import StudentResponse, QuizAttemptQuestion
+
+MCQ_SINGLE, MCQ_MULTI, SHORT = 0, 1, 2
+TYPE_CODES = {"MCQ_SINGLE": MCQ_SINGLE, "MCQ_MULTI": MCQ_MULTI, "SHORT": SHORT}
+
+SelectedOption = StudentResponse.selected_options.through
+
+
+class Answer(NamedTuple):
+    """One student answer to one question, as fed to the engine."""
+    attempt_id: int
+    question_id: int
+    selected_ids: frozenset = frozenset()
+    text_answer: Optional[str] = None
+    response_id: Optional[int] = None
+    points_earned: Optional[float] = None
+
+
+@dataclass
+class ScoringResult:
+    answers: list
+    points: np.ndarray
+    attempt_totals: dict
+
+    def __iter__(self):
+        """Yield (answer, points) pairs."""
+        return zip(self.answers, self.points.tolist())
+
+    def changed(self):
+        """Yield (answer, points) pairs whose stored points_earned differ from the new value."""
+        return ((answer, points) for answer, points in self if answer.points_earned != points)
+
+
+@lru_cache(maxsize=64)
+def _option_table(answer_key):
+    """Sorted option ids of the quiz with their question id and correctness."""
+    rows = sorted(
+        (option_id, question.id, option_id in question.correct_ids)
+        for question in answer_key.questions.values()
+        for option_id in question.option_ids
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+    option_ids, question_ids, correct = zip(*rows)
+    return np.array(option_ids, dtype=np.int64), np.array(question_ids, dtype=np.int64), np.array(correct, dtype=bool)
+
+
+NUMBER_RE = re.compile(r'\d+')
+
+
+class ShortAnswerMatcher:
+    """
+    Compiled grader of one SHORT question: numeric targets as a set, keywords
+    with their multiplicity and similarity matchers that keep the correct
+    texts' analysis between calls. Answers are scored on their normalized
+    text (see khmer.normalize), which grade_many scores once per distinct value.
+    """
+
+    def __init__(self, question):
+        self.points = question.points
+        self.numeric_targets = frozenset(question.numeric_targets)
+        self.keyword_counts = tuple(Counter(question.keywords).items())
+        self.points_per_keyword = question.points / len(question.keywords) if question.keywords else 0
+        self.similarity = []
+        for text in question.correct_texts:
+            matcher = difflib.SequenceMatcher(None)
+            matcher.set_seq2(text)
+            self.similarity.append(matcher)
+
+    @staticmethod
+    def normalize(text_answer):
+        """Scoring key of an answer; None for a missing answer."""
+        return normalize(text_answer) if text_answer else None
+
+    def score_normalized(self, student_text):
+        """Numeric match, then keyword share, then similarity to the correct texts."""
+        if student_text is None:
+            return 0
+        if self.numeric_targets and not self.numeric_targets.isdisjoint(NUMBER_RE.findall(student_text)):
+            return self.points
+        if self.keyword_counts:
+            match_count = sum(count for keyword, count in self.keyword_counts if keyword in student_text)
+            return round(self.points_per_keyword * match_count, 2)
+        if self.similarity:
+            similarity_scores = []
+            for template in self.similarity:
+                # Shallow copies share the indexed correct text; matchers are shared between threads
+                matcher = copy.copy(template)
+                matcher.set_seq1(student_text)
+                similarity_scores.append(matcher.ratio())
+            return round(self.points * max(similarity_scores), 2)
+        return 0
+
+    def score(self, text_answer):
+        return self.score_normalized(self.normalize(text_answer))
+
+    def grade_many(self, text_answers):
+        """Score a batch of answers to the question; identical normalized answers are scored once."""
+        scores = {}
+        results = []
+        for text_answer in text_answers:
+            student_text = self.normalize(text_answer)
+            if student_text not in scores:
+                scores[student_text] = self.score_normalized(student_text)
+            results.append(scores[student_text])
+        return results
+
+
+@lru_cache(maxsize=1024)
+def get_short_answer_matcher(question):
+    """Matcher of a SHORT QuestionKey, compiled once per answer key version."""
+    return ShortAnswerMatcher(question)
+
+
+def score_short_answer(question, text_answer):
+    """Numeric match, then keyword share, then similarity to the correct texts."""
+    return get_short_answer_matcher(question).score(text_answer)
+
+
+def grade(answer_key, answers):
+    """
+    Compute points_earned for every answer and the total of every attempt.
+
+    Rules:
+    - MCQ_SINGLE: full points when exactly one option is selected and it is correct.
+    - MCQ_MULTI: points * (correct selected / correct) - points * (wrong selected / wrong), clamped to [0, points].
+    - SHORT: see score_short_answer.
+    Answers to questions missing from the key score 0.
+    """
+    answers = list(answers)
+    n = len(answers)
+    if not n:
+        return ScoringResult(answers, np.zeros(0), {})
+
+    questions = [answer_key.get(answer.question_id) for answer in answers]
+    types = np.array([TYPE_CODES.get(q.question_type, -1) if q else -1 for q in questions], dtype=np.int8)
+    max_points = np.array([q.points if q else 0 for q in questions], dtype=float)
+    num_correct = np.array([len(q.correct_ids) if q else 0 for q in questions], dtype=float)
+    num_wrong = np.array([len(q.option_ids) - len(q.correct_ids) if q else 0 for q in questions], dtype=float)
+    question_ids = np.array([answer.question_id for answer in answers], dtype=np.int64)
+
+    # Flatten every selection into (answer index, option id) and look the options up in the key
+    sel_index = np.fromiter(
+        (i for i, answer in enumerate(answers) for _ in answer.selected_ids), dtype=np.int64
+    )
+    sel_option = np.fromiter(
+        (option_id for answer in answers for option_id in answer.selected_ids), dtype=np.int64
+    )
+    option_ids, option_questions, option_correct = _option_table(answer_key)
+    if len(option_ids) and len(sel_option):
+        pos = np.clip(np.searchsorted(option_ids, sel_option), 0, len(option_ids) - 1)
+        valid = (option_ids[pos] == sel_option) & (option_questions[pos] == question_ids[sel_index])
+        selected = np.bincount(sel_index[valid], minlength=n).astype(float)
+        correct_selected = np.bincount(sel_index[valid], weights=option_correct[pos[valid]], minlength=n)
+    else:
+        selected = correct_selected = np.zeros(n)
+    wrong_selected = selected - correct_selected
+
+    points = np.zeros(n)
+
+    single_correct = (types == MCQ_SINGLE) & (selected == 1) & (correct_selected == 1)
+    points[single_correct] = max_points[single_correct]
+
+    multi = types == MCQ_MULTI
+    score_from_correct = np.divide(max_points * correct_selected, num_correct, out=np.zeros(n), where=num_correct > 0)
+    penalty_from_wrong = np.divide(max_points * wrong_selected, num_wrong, out=np.zeros(n), where=num_wrong > 0)
+    points[multi] = np.clip(score_from_correct - penalty_from_wrong, 0, max_points)[multi]
+
+    # SHORT answers are graded question by question so repeated answers are matched once
+    short_by_question = {}
+    for i in np.flatnonzero(types == SHORT).tolist():
+        short_by_question.setdefault(answers[i].question_id, []).append(i)
+    for question_id, indexes in short_by_question.items():
+        matcher = get_short_answer_matcher(questions[indexes[0]])
+        points[indexes] = matcher.grade_many([answers[i].text_answer for i in indexes])
+
+    attempt_ids, attempt_index = np.unique(
+        np.array([answer.attempt_id for answer in answers], dtype=np.int64), return_inverse=True
+    )
+    totals = np.bincount(attempt_index, weights=points, minlength=len(attempt_ids))
+    attempt_totals = {
+        attempt_id: round(total, 2) for attempt_id, total in zip(attempt_ids.tolist(), totals.tolist())
+    }
+    return ScoringResult(answers, points, attempt_totals)
+
+
+def load_answers(quiz_id, attempt_ids=None, question_ids=None):
+    """
+    Load the stored answers of a quiz's attempts (optionally only those to
+    `question_ids`) in three queries. Only the first response per (attempt,
+    selected question) is returned, matching what an attempt is scored on.
+    """
+    selected_questions = QuizAttemptQuestion.objects.filter(attempt__quiz_id=quiz_id)
+    responses = StudentResponse.objects.filter(attempt__quiz_id=quiz_id)
+    selections = SelectedOption.objects.filter(studentresponse__attempt__quiz_id=quiz_id)
+    if attempt_ids is not None:
+        selected_questions = selected_questions.filter(attempt_id__in=attempt_ids)
+        responses = responses.filter(attempt_id__in=attempt_ids)
+        selections = selections.filter(studentresponse__attempt_id__in=attempt_ids)
+    if question_ids is not None:
+        selected_questions = selected_questions.filter(question_id__in=question_ids)
+        responses = responses.filter(question_id__in=question_ids)
+        selections = selections.filter(studentresponse__question_id__in=question_ids)
+
+    wanted = set(selected_questions.values_list("attempt_id", "question_id"))
+    options_by_response = {}
+    for response_id, option_id in selections.values_list("studentresponse_id", "answeroption_id"):
+        options_by_response.setdefault(response_id, set()).add(option_id)
+
+    answers = []
+    for response_id, attempt_id, question_id, text_answer, points_earned in responses.order_by("id").values_list(
+        "id", "attempt_id", "question_id", "text_answer", "points_earned"
+    ):
+        if (attempt_id, question_id) not in wanted:
+            continue
+        wanted.discard((attempt_id, question_id))
+        answers.append(Answer(
+            attempt_id=attempt_id,
+            question_id=question_id,
+            selected_ids=frozenset(options_by_response.get(response_id, ())),
+            text_answer=text_answer,
+            response_id=response_id,
+            points_earned=points_earned,
+        ))
+    return answers
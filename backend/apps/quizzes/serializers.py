@@ -1,6 +1,6 @@
 import logging
 from rest_framework import serializers
-from .models import Quiz, Question, AnswerOption, StudentResponse, QuizAttempt
+from .models import Quiz, Question, AnswerOption, StudentResponse, QuizAttempt, QuizStats
 from apps.classes.models import SchoolClass
 from apps.students.models import Student
 from django.utils import timezone
@@ -56,7 +56,7 @@ class QuizAttemptSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = QuizAttempt
-        fields = ['id', 'quiz', 'student', 'score', 'start_time', 'completed_at', 'selected_questions']
+        fields = ['id', 'quiz', 'student', 'score', 'start_time', 'completed_at', 'grading_status', 'selected_questions']
     
     def get_quiz(self, obj):
         return QuizSerializer(obj.quiz, context=self.context).data
@@ -103,6 +103,32 @@ class QuizSerializer(serializers.ModelSerializer):
     def get_total_questions_per_attempt(self, obj):
         return obj.total_questions_per_attempt
 
+# Quiz list entry; has_attempted and question_count are annotated by QuizViewSet's queryset
+class QuizListSerializer(QuizSerializer):
+    questions = None
+    has_attempted = serializers.BooleanField(read_only=True)
+    question_count = serializers.IntegerField(read_only=True)
+
+    class Meta(QuizSerializer.Meta):
+        fields = [field for field in QuizSerializer.Meta.fields if field != 'questions'] + ['question_count']
+
+# Quiz metadata without questions; StartQuizView appends the cached student-facing question payload
+class QuizStartSerializer(QuizSerializer):
+    questions = None
+
+    class Meta(QuizSerializer.Meta):
+        fields = [field for field in QuizSerializer.Meta.fields if field != 'questions']
+
+# Score statistics of a quiz, overall (school_class is null) or per class
+class QuizStatsSerializer(serializers.ModelSerializer):
+    class_name = serializers.CharField(source='school_class.name', read_only=True, default=None)
+    mean = serializers.FloatField(read_only=True)
+    stddev = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = QuizStats
+        fields = ['school_class', 'class_name', 'count', 'mean', 'stddev', 'min_score', 'max_score', 'max_points', 'histogram', 'updated_at']
+
 # Serializer for QuizReview (updated for new structure: use attempt.responses)
 class QuizReviewSerializer(serializers.ModelSerializer):
     questions = QuestionSerializer(source='selected_questions__question', many=True, read_only=True)  # Only selected questions, fixed source
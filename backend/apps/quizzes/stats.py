@@ -0,0 +1,147 @@
+"""
+Incrementally maintained score aggregates of quizzes.
+
+Every graded attempt counts towards the QuizStats row of its quiz and of the
+quiz class the student is enrolled in. Grading, rescoring and deleting
+attempts feed (student, old score, new score) changes to record_score_changes,
+which applies them under a row lock, so dashboards read count, mean, spread,
+min/max and the histogram of a quiz without scanning its attempts.
+
+Histograms bucket scores by share of the most points an attempt can score.
+When that maximum changes with the quiz's questions, the statistics of the
+quiz are rebuilt.
+"""
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from apps.students.models import Enrollment
+from .cache import get_versioned
+from .models import Question, Quiz, QuizAttempt, QuizStats
+from .sampling import DIFFICULTIES
+
+
+def build_max_points(quiz_id, version=None):
+    """Most points an attempt can score: the highest-scoring questions of each difficulty's quota."""
+    quiz = Quiz.objects.only('num_easy_questions', 'num_medium_questions', 'num_hard_questions').get(pk=quiz_id)
+    quotas = {
+        "EASY": quiz.num_easy_questions,
+        "MEDIUM": quiz.num_medium_questions,
+        "HARD": quiz.num_hard_questions,
+    }
+    points = {}
+    for difficulty, question_points in Question.objects.filter(quiz_id=quiz_id).values_list('difficulty', 'points'):
+        points.setdefault(difficulty, []).append(question_points)
+    return float(sum(
+        sum(sorted(points.get(difficulty, ()), reverse=True)[:max(quotas[difficulty], 0)])
+        for difficulty in DIFFICULTIES
+    ))
+
+
+def get_max_points(quiz_id):
+    """Maximum points of the quiz's current version."""
+    return get_versioned("max_points", quiz_id, build_max_points)
+
+
+def counts_towards_stats(attempt):
+    """Whether an attempt is graded and part of its quiz's statistics."""
+    return (
+        attempt.completed_at is not None
+        and attempt.score is not None
+        and attempt.grading_status != QuizAttempt.GradingStatus.GRADING
+    )
+
+
+def graded_attempts(quiz_id):
+    return QuizAttempt.objects.filter(quiz_id=quiz_id, completed_at__isnull=False, score__isnull=False).exclude(
+        grading_status=QuizAttempt.GradingStatus.GRADING
+    )
+
+
+def student_classes(quiz_id, student_ids=None):
+    """Map students to the class of the quiz they are enrolled in."""
+    enrollments = Enrollment.objects.filter(status=Enrollment.Status.ACTIVE, school_class__quizzes=quiz_id)
+    if student_ids is not None:
+        enrollments = enrollments.filter(student_id__in=student_ids)
+    classes = {}
+    for student_id, class_id in enrollments.order_by('-id').values_list('student_id', 'school_class_id'):
+        classes.setdefault(student_id, class_id)
+    return classes
+
+
+def _refresh_bounds(row):
+    attempts = graded_attempts(row.quiz_id)
+    if row.school_class_id is not None:
+        students = [
+            student_id for student_id, class_id in student_classes(row.quiz_id).items()
+            if class_id == row.school_class_id
+        ]
+        attempts = attempts.filter(student_id__in=students)
+    bounds = attempts.aggregate(min_score=Min('score'), max_score=Max('score'))
+    row.min_score, row.max_score = bounds['min_score'], bounds['max_score']
+
+
+def record_score_changes(quiz_id, changes):
+    """
+    Apply (student_id, old score, new score) changes of a quiz's graded
+    attempts to its statistics. An old score of None adds an attempt, a new
+    score of None removes one.
+    """
+    changes = [(student_id, old, new) for student_id, old, new in changes if old != new]
+    if not changes:
+        return
+    classes = student_classes(quiz_id, {student_id for student_id, _old, _new in changes})
+    by_class = {}
+    for student_id, old, new in changes:
+        by_class.setdefault(None, []).append((old, new))
+        if student_id in classes:
+            by_class.setdefault(classes[student_id], []).append((old, new))
+
+    class_ids = [class_id for class_id in by_class if class_id is not None]
+    max_points = get_max_points(quiz_id)
+    with transaction.atomic():
+        QuizStats.objects.bulk_create([
+            QuizStats(quiz_id=quiz_id, school_class_id=class_id, max_points=max_points) for class_id in by_class
+        ], ignore_conflicts=True)
+        rows = list(QuizStats.objects.select_for_update().filter(
+            Q(school_class__isnull=True) | Q(school_class_id__in=class_ids), quiz_id=quiz_id,
+        ).order_by('id'))
+        if any(row.max_points != max_points for row in rows):
+            # The histograms were built for other questions; the attempts already hold the new scores
+            rebuild_quiz_stats(quiz_id)
+            return
+        for row in rows:
+            stale = False
+            for old, new in by_class[row.school_class_id]:
+                if old is not None:
+                    stale = row.remove(old) or stale
+                if new is not None:
+                    row.add(new)
+            if stale:
+                _refresh_bounds(row)
+            row.updated_at = timezone.now()
+        QuizStats.objects.bulk_update(
+            rows, ['count', 'total', 'total_squares', 'min_score', 'max_score', 'histogram', 'updated_at'],
+        )
+
+
+def rebuild_quiz_stats(quiz_id):
+    """Recompute the statistics of a quiz from its attempts. Returns the number of attempts counted."""
+    with transaction.atomic():
+        # Hold off concurrent updates until the rebuilt rows are in place
+        list(QuizStats.objects.select_for_update().filter(quiz_id=quiz_id))
+        classes = student_classes(quiz_id)
+        max_points = get_max_points(quiz_id)
+        rows = {None: QuizStats(quiz_id=quiz_id, max_points=max_points)}
+        count = 0
+        for student_id, score in graded_attempts(quiz_id).values_list('student_id', 'score').iterator():
+            rows[None].add(score)
+            class_id = classes.get(student_id)
+            if class_id is not None:
+                rows.setdefault(
+                    class_id, QuizStats(quiz_id=quiz_id, school_class_id=class_id, max_points=max_points),
+                ).add(score)
+            count += 1
+        QuizStats.objects.filter(quiz_id=quiz_id).delete()
+        QuizStats.objects.bulk_create(rows.values())
+    return count
@@ -0,0 +1,246 @@
+"""
+Batched write path for quiz submissions and autosave.
+
+Answers are validated against the compiled answer key and written with a fixed
+number of bulk queries, so neither an autosave nor a submit grows in cost with
+the number of questions in the quiz. Submits can also be queued and graded in
+batches by celery workers (see tasks.py).
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.conditional import bump_stamp_on_commit
+from .answer_key import get_answer_key
+from .cache import RESULTS_SCOPE
+from .models import QuizAttempt, QuizAttemptQuestion, StudentResponse
+from .scoring import grade, load_answers
+from .stats import record_score_changes
+
+logger = logging.getLogger(__name__)
+
+SelectedOption = StudentResponse.selected_options.through
+
+# Attempts graded per transaction by the grading workers
+GRADING_BATCH_SIZE = 100
+
+
+def normalize_answers(answer_key, question_ids, answers_data, partial=False):
+    """
+    Map the raw `answers` payload onto the attempt's questions.
+    Returns {question_id: (selected_option_ids, text_answer)}; option ids that
+    do not belong to the question are dropped and logged. With `partial`, only
+    questions present in the payload are returned.
+    """
+    answers = {}
+    for question_id in question_ids:
+        question = answer_key.get(question_id)
+        if question is None or (partial and str(question_id) not in answers_data):
+            continue
+        user_answer = answers_data.get(str(question_id))
+        if question.question_type == 'SHORT':
+            answers[question_id] = (frozenset(), str(user_answer) if user_answer else '')
+            continue
+
+        raw_ids = user_answer if isinstance(user_answer, list) else ([user_answer] if user_answer else [])
+        selected = set()
+        for raw_id in raw_ids:
+            try:
+                option_id = int(raw_id)
+            except (TypeError, ValueError):
+                option_id = None
+            if option_id not in question.option_ids:
+                logger.error(f"Invalid AnswerOption ID {raw_id} for question {question_id}")
+                continue
+            selected.add(option_id)
+        answers[question_id] = (frozenset(selected), None)
+    return answers
+
+
+def save_responses(attempt, answers, points=None):
+    """
+    Upsert the StudentResponse rows and their selected options for `answers`
+    ({question_id: (selected_option_ids, text_answer)}) in bulk.
+    `points` optionally maps question ids to points_earned.
+    """
+    points = points or {}
+    existing = {}
+    for response in StudentResponse.objects.filter(
+        attempt=attempt, question_id__in=list(answers)
+    ).only('id', 'question_id', 'text_answer', 'points_earned'):
+        existing.setdefault(response.question_id, response)
+
+    to_create, to_update = [], []
+    for question_id, (_, text_answer) in answers.items():
+        response = existing.get(question_id)
+        if response is None:
+            response = StudentResponse(attempt=attempt, question_id=question_id)
+            to_create.append(response)
+        else:
+            to_update.append(response)
+        response.text_answer = text_answer
+        response.points_earned = points.get(question_id, response.points_earned)
+
+    with transaction.atomic():
+        if to_create:
+            StudentResponse.objects.bulk_create(to_create)
+        if to_update:
+            StudentResponse.objects.bulk_update(to_update, ['text_answer', 'points_earned'])
+
+        responses = to_create + to_update
+        SelectedOption.objects.filter(studentresponse_id__in=[r.id for r in to_update]).delete()
+        SelectedOption.objects.bulk_create([
+            SelectedOption(studentresponse_id=response.id, answeroption_id=option_id)
+            for response in responses
+            for option_id in answers[response.question_id][0]
+        ])
+        # Bulk writes skip the model signals that keep review ETags fresh
+        bump_stamp_on_commit("attempt", attempt.id)
+    return responses
+
+
+def autosave_answers(attempt, seq, answers_data):
+    """
+    Store the changed answers of an in-progress attempt.
+    Returns False (and writes nothing) when `seq` is not newer than the last
+    applied autosave or the attempt is already completed.
+    """
+    with transaction.atomic():
+        # The conditional update also locks the attempt row, serializing concurrent autosaves
+        applied = QuizAttempt.objects.filter(
+            pk=attempt.pk, completed_at__isnull=True, autosave_seq__lt=seq
+        ).update(autosave_seq=seq)
+        if not applied:
+            return False
+        answer_key = get_answer_key(attempt.quiz_id)
+        question_ids = attempt.selected_questions.values_list('question_id', flat=True)
+        save_responses(attempt, normalize_answers(answer_key, question_ids, answers_data, partial=True))
+    attempt.autosave_seq = seq
+    return True
+
+
+def queue_submission(attempt, answers_data=None):
+    """
+    Durably record a submit: the raw answers are stored on the attempt, which
+    is completed and left for a grading worker.
+    """
+    attempt.submitted_answers = answers_data or {}
+    attempt.grading_status = QuizAttempt.GradingStatus.GRADING
+    attempt.completed_at = timezone.now()
+    attempt.score = None
+    attempt.save(update_fields=['submitted_answers', 'grading_status', 'completed_at', 'score'])
+
+
+def _grade_quiz_submissions(quiz_id, attempts):
+    answer_key = get_answer_key(quiz_id)
+    attempt_ids = [attempt.id for attempt in attempts]
+    question_ids = {}
+    for attempt_id, question_id in QuizAttemptQuestion.objects.filter(
+        attempt_id__in=attempt_ids
+    ).values_list('attempt_id', 'question_id'):
+        if question_id in answer_key:
+            question_ids.setdefault(attempt_id, []).append(question_id)
+    stored = {(answer.attempt_id, answer.question_id) for answer in load_answers(quiz_id, attempt_ids)}
+
+    with transaction.atomic():
+        # Store the submitted answers; unanswered questions get an empty response
+        for attempt in attempts:
+            attempt_question_ids = question_ids.get(attempt.id, [])
+            incoming = normalize_answers(answer_key, attempt_question_ids, attempt.submitted_answers or {}, partial=True)
+            for question_id in attempt_question_ids:
+                if question_id not in incoming and (attempt.id, question_id) not in stored:
+                    incoming[question_id] = (frozenset(), '' if answer_key[question_id].question_type == 'SHORT' else None)
+            if incoming:
+                save_responses(attempt, incoming)
+
+        result = grade(answer_key, load_answers(quiz_id, attempt_ids))
+        changed_responses = [
+            StudentResponse(id=answer.response_id, points_earned=points) for answer, points in result.changed()
+        ]
+        if changed_responses:
+            StudentResponse.objects.bulk_update(changed_responses, ['points_earned'])
+
+        for attempt in attempts:
+            attempt.score = result.attempt_totals.get(attempt.id, 0)
+            attempt.grading_status = QuizAttempt.GradingStatus.GRADED
+            attempt.submitted_answers = None
+        QuizAttempt.objects.bulk_update(attempts, ['score', 'grading_status', 'submitted_answers'])
+        # Queued attempts carry no score, so each one is a new entry in the statistics
+        record_score_changes(quiz_id, [(attempt.student_id, None, attempt.score) for attempt in attempts])
+        for attempt in attempts:
+            bump_stamp_on_commit("attempt", attempt.id)
+            bump_stamp_on_commit("student", attempt.student_id)
+        bump_stamp_on_commit(RESULTS_SCOPE, quiz_id)
+
+
+def grade_submissions(attempts):
+    """Store and score queued attempts in bulk, one pass per quiz. Returns the number graded."""
+    by_quiz = {}
+    for attempt in attempts:
+        by_quiz.setdefault(attempt.quiz_id, []).append(attempt)
+    for quiz_id, quiz_attempts in by_quiz.items():
+        _grade_quiz_submissions(quiz_id, quiz_attempts)
+    return len(attempts)
+
+
+def _grade_claimed(quiz_id, attempts):
+    """
+    Grade claimed attempts of a quiz in one savepoint. If that raises, grade
+    them one by one, each in its own savepoint, and mark the ones that still
+    fail as FAILED so they are not claimed again. Returns the number graded.
+    """
+    try:
+        with transaction.atomic():
+            _grade_quiz_submissions(quiz_id, attempts)
+        return len(attempts)
+    except Exception:
+        logger.exception(f"Grading {len(attempts)} submission(s) of quiz {quiz_id} failed, grading them one by one")
+
+    graded = 0
+    # Fresh copies: the failed pass may have changed the instances
+    for attempt in QuizAttempt.objects.filter(pk__in=[attempt.pk for attempt in attempts]):
+        try:
+            with transaction.atomic():
+                _grade_quiz_submissions(quiz_id, [attempt])
+            graded += 1
+        except Exception:
+            logger.exception(f"Grading of attempt {attempt.id} failed")
+            QuizAttempt.objects.filter(pk=attempt.pk).update(grading_status=QuizAttempt.GradingStatus.FAILED)
+            bump_stamp_on_commit("attempt", attempt.id)
+    return graded
+
+
+def grade_pending_submissions(batch_size=GRADING_BATCH_SIZE):
+    """
+    Grade every queued submission, batch by batch. Rows are claimed with
+    SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never grade the
+    same attempt twice. An attempt that cannot be graded is marked FAILED
+    instead of holding up the queue. Returns the number of attempts graded.
+    """
+    graded = 0
+    while True:
+        with transaction.atomic():
+            batch = list(QuizAttempt.objects.select_for_update(skip_locked=True).filter(
+                grading_status=QuizAttempt.GradingStatus.GRADING
+            ).order_by('completed_at')[:batch_size])
+            if not batch:
+                return graded
+            by_quiz = {}
+            for attempt in batch:
+                by_quiz.setdefault(attempt.quiz_id, []).append(attempt)
+            batch_graded = sum(_grade_claimed(quiz_id, attempts) for quiz_id, attempts in by_quiz.items())
+            graded += batch_graded
+            logger.info(f"Graded {batch_graded} of {len(batch)} queued submission(s)")
+
+
+def submit_attempt(attempt, answers_data=None):
+    """
+    Complete and grade an attempt in-process and return its total score.
+    Answers sent with the submit are stored first; everything stored for the
+    attempt is then scored. Unanswered questions get an empty response.
+    """
+    with transaction.atomic():
+        queue_submission(attempt, answers_data)
+        grade_submissions([attempt])
+    return attempt.score
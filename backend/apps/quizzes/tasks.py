@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from .recalculation import run_recalculation_job
+from .submission import grade_pending_submissions
+
+
+@shared_task(ignore_result=True)
+def grade_queued_submissions():
+    """Grade every submission waiting in the queue."""
+    return grade_pending_submissions()
+
+
+@shared_task(ignore_result=True)
+def run_recalculation(job_id):
+    """Run a queued score recalculation job."""
+    run_recalculation_job(job_id)
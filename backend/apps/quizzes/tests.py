@@ -1,3 +1,855 @@
-from django.test import TestCase
+import datetime
+import difflib
+import io
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from openpyxl import load_workbook
+
+from django.contrib.admin.models import LogEntry
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F, Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.authentication.models import CustomUser
+from apps.classes.models import ClassLevel, SchoolClass
+from apps.core.import_jobs import start_import
+from apps.core.models import AcademicYear, ImportJob, Stamp
+from apps.students.models import Student, Enrollment
+from apps.teachers.models import Teacher, Position
+from .admin import QuizAdmin
+from .analytics import get_item_analytics
+from .answer_key import AnswerKey, QuestionKey, get_answer_key
+from .cache import get_quiz_version
+from .exports import write_scores_workbook
+from .gradebook import get_gradebook
+from .importing import QuizSheetImporter, import_quiz_rows, rename_quiz_columns, validate_quizzes
+from .khmer import normalize, tokenize
+from .models import (
+    QuizCategory, Quiz, Question, AnswerOption, QuizAttempt, QuizAttemptQuestion, StudentResponse, RecalculationJob,
+    QuizStats,
+)
+from .provisioning import provision_attempts
+from .recalculation import enqueue_recalculation, recalculate_scores, run_recalculation_job
+from .response_matrix import build_response_matrix
+from .sampling import sample_questions
+from .scoring import Answer, ShortAnswerMatcher, grade
+from .stats import rebuild_quiz_stats
+from .submission import grade_pending_submissions, queue_submission, save_responses, submit_attempt
+
+
+class QuizTestMixin:
+    """Builds a published quiz with one enrolled student."""
+
+    def setUp(self):
+        cache.clear()
+        self.year = AcademicYear.objects.create(
+            name="2025-2026", status=True,
+            start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2026, 1, 1),
+        )
+        self.school_class = SchoolClass.objects.create(name="12A", level=ClassLevel.objects.create(name="12"))
+        teacher = Teacher.objects.create(
+            tid="T1", family_name="Mok", given_name="Kong", id_card_number="1",
+            date_of_birth=datetime.date(1990, 1, 1), email="teacher@school.local", gender="Male",
+            phone_number="1", position=Position.objects.create(name="Teacher"),
+            enrolled_date=datetime.date(2020, 1, 1),
+        )
+        self.category = QuizCategory.objects.create(name="Math")
+        self.teacher = teacher
+        user = CustomUser.objects.create_user(username="S1", password="x", role="student")
+        self.student = Student.objects.create(
+            student_id="S1", family_name="Sok", given_name="Dara", gender="M", student_type="ពេញម៉ោង", user=user,
+        )
+        Enrollment.objects.create(
+            student=self.student, school_class=self.school_class, academic_year=self.year,
+            enrolled_date=datetime.date(2025, 1, 1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def make_quiz(self, num_questions, title="Quiz"):
+        quiz = Quiz.objects.create(
+            title=title, category=self.category, teacher=self.teacher, status="PUBLISH",
+            start_time=timezone.now() - datetime.timedelta(minutes=1), time_limit=datetime.timedelta(hours=1),
+            num_medium_questions=num_questions,
+        )
+        quiz.classes.add(self.school_class)
+        for i in range(num_questions):
+            question_type = ("MCQ_SINGLE", "MCQ_MULTI", "SHORT")[i % 3]
+            question = Question.objects.create(
+                quiz=quiz, text=f"Question {i}", question_type=question_type, difficulty="MEDIUM", order=i, points=2,
+            )
+            if question_type == "SHORT":
+                AnswerOption.objects.create(question=question, text="42", is_correct=True)
+            else:
+                AnswerOption.objects.create(question=question, text="A", is_correct=True)
+                AnswerOption.objects.create(question=question, text="B", is_correct=question_type == "MCQ_MULTI")
+                AnswerOption.objects.create(question=question, text="C", is_correct=False)
+        return quiz
+
+    def make_attempt(self, quiz):
+        attempt = QuizAttempt.objects.create(quiz=quiz, student=self.student, score=0, start_time=timezone.now())
+        QuizAttemptQuestion.objects.bulk_create([
+            QuizAttemptQuestion(attempt=attempt, question=question, order=i + 1)
+            for i, question in enumerate(quiz.questions.all())
+        ])
+        return attempt
+
+    def correct_answers(self, quiz):
+        answers = {}
+        for question in quiz.questions.prefetch_related("options"):
+            correct = [option.id for option in question.options.all() if option.is_correct]
+            if question.question_type == "SHORT":
+                answers[str(question.id)] = "the answer is 42"
+            elif question.question_type == "MCQ_MULTI":
+                answers[str(question.id)] = correct
+            else:
+                answers[str(question.id)] = correct[0]
+        return answers
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SubmitQuizViewTests(QuizTestMixin, TestCase):
+    def submit(self, quiz, attempt, answers):
+        return self.client.post(
+            f"/api/quizzes/{quiz.id}/submit/", {"attempt_id": attempt.id, "answers": answers}, format="json",
+        )
+
+    def count_submit_queries(self, num_questions):
+        quiz = self.make_quiz(num_questions, title=f"Quiz {num_questions}")
+        attempt = self.make_attempt(quiz)
+        answers = self.correct_answers(quiz)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.submit(quiz, attempt, answers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def test_submit_scores_and_stores_answers(self):
+        quiz = self.make_quiz(6)
+        attempt = self.make_attempt(quiz)
+        response = self.submit(quiz, attempt, self.correct_answers(quiz))
+        self.assertEqual(response.status_code, 200, response.content)
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, 12)
+        self.assertIsNotNone(attempt.completed_at)
+        self.assertEqual(StudentResponse.objects.filter(attempt=attempt).count(), 6)
+        self.assertEqual(StudentResponse.selected_options.through.objects.filter(studentresponse__attempt=attempt).count(), 6)
+
+    def test_submit_ignores_options_of_other_questions(self):
+        quiz = self.make_quiz(3)
+        attempt = self.make_attempt(quiz)
+        single, multi, short = quiz.questions.order_by("order")
+        foreign_option = multi.options.first()
+        response = self.submit(quiz, attempt, {str(single.id): foreign_option.id})
+        self.assertEqual(response.status_code, 200, response.content)
+
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, 0)
+        self.assertFalse(StudentResponse.objects.get(attempt=attempt, question=single).selected_options.exists())
+
+    def test_submit_query_count_is_independent_of_quiz_size(self):
+        self.assertEqual(self.count_submit_queries(3), self.count_submit_queries(30))
+
+    def test_answer_key_follows_versions_bumped_by_other_processes(self):
+        quiz = self.make_quiz(3)
+        single = quiz.questions.get(order=0)
+        self.assertEqual(get_answer_key(quiz.id)[single.id].correct_ids, {single.options.get(text="A").id})
+
+        # Another worker changes the key: this process's caches only see the version stamp move
+        single.options.update(is_correct=Q(text="C"))
+        Stamp.objects.filter(scope="quiz", key=str(quiz.id)).update(value=F("value") + 1)
+        self.assertEqual(get_answer_key(quiz.id)[single.id].correct_ids, {single.options.get(text="C").id})
+
+
+@override_settings(QUIZ_ASYNC_GRADING=True, SECURE_SSL_REDIRECT=False)
+class QueuedGradingTests(QuizTestMixin, TestCase):
+    def test_submit_is_queued_and_graded_by_worker(self):
+        quiz = self.make_quiz(6)
+        attempt = self.make_attempt(quiz)
+        # The task is published to the in-memory broker configured for tests
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/quizzes/{quiz.id}/submit/",
+                {"attempt_id": attempt.id, "answers": self.correct_answers(quiz)}, format="json",
+            )
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()["grading_status"], "GRADING")
+        self.assertIsNone(response.json()["score"])
+        self.assertFalse(StudentResponse.objects.filter(attempt=attempt).exists())
+
+        self.assertEqual(grade_pending_submissions(), 1)
+        data = self.client.get(f"/api/quiz-attempts/{attempt.id}/").json()
+        self.assertEqual(data["grading_status"], "GRADED")
+        self.assertEqual(data["score"], 12)
+        attempt.refresh_from_db()
+        self.assertIsNone(attempt.submitted_answers)
+        self.assertEqual(StudentResponse.objects.filter(attempt=attempt).count(), 6)
+
+    def test_failing_submission_does_not_hold_up_the_queue(self):
+        quiz = self.make_quiz(3)
+        first = self.make_attempt(quiz)
+        other = Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង")
+        second = QuizAttempt.objects.create(quiz=quiz, student=other, score=0, start_time=timezone.now())
+        for attempt in (first, second):
+            queue_submission(attempt, self.correct_answers(quiz))
+
+        def fail_first(attempt, *args, **kwargs):
+            if attempt.pk == first.pk:
+                raise ValueError("broken answers")
+            return save_responses(attempt, *args, **kwargs)
+
+        with mock.patch("apps.quizzes.submission.save_responses", fail_first), \
+                self.assertLogs("apps.quizzes.submission", "ERROR"):
+            self.assertEqual(grade_pending_submissions(), 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.grading_status, second.grading_status), ("FAILED", "GRADED"))
+        self.assertIsNotNone(first.submitted_answers)
+        self.assertEqual(grade_pending_submissions(), 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AutosaveQuizViewTests(QuizTestMixin, TestCase):
+    def autosave(self, quiz, attempt, seq, answers):
+        return self.client.patch(
+            f"/api/quizzes/{quiz.id}/autosave/",
+            {"attempt_id": attempt.id, "seq": seq, "answers": answers}, format="json",
+        )
+
+    def test_stale_writes_are_dropped(self):
+        quiz = self.make_quiz(3)
+        attempt = self.make_attempt(quiz)
+        short = quiz.questions.get(question_type="SHORT")
+
+        self.assertEqual(self.autosave(quiz, attempt, 2, {str(short.id): "new"}).json()["status"], "saved")
+        self.assertEqual(self.autosave(quiz, attempt, 1, {str(short.id): "old"}).json()["status"], "stale")
+        self.assertEqual(StudentResponse.objects.get(attempt=attempt, question=short).text_answer, "new")
+
+    def test_submit_scores_autosaved_answers(self):
+        quiz = self.make_quiz(6)
+        attempt = self.make_attempt(quiz)
+        answers = list(self.correct_answers(quiz).items())
+        self.autosave(quiz, attempt, 1, dict(answers[:3]))
+        self.autosave(quiz, attempt, 2, dict(answers[3:]))
+
+        response = self.client.post(f"/api/quizzes/{quiz.id}/submit/", {"attempt_id": attempt.id}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.score, 12)
+        self.assertEqual(StudentResponse.objects.filter(attempt=attempt).count(), 6)
+
+
+class ScoringEngineTests(SimpleTestCase):
+    answer_key = AnswerKey(1, 1, [
+        QuestionKey(id=1, question_type="MCQ_SINGLE", points=2, option_ids=frozenset({10, 11}), correct_ids=frozenset({10})),
+        QuestionKey(id=2, question_type="MCQ_MULTI", points=4, option_ids=frozenset({20, 21, 22, 23}), correct_ids=frozenset({20, 21})),
+        QuestionKey(
+            id=3, question_type="SHORT", points=2, option_ids=frozenset({30}), correct_ids=frozenset({30}),
+            numeric_targets=("water h2o",), correct_texts=("water h2o",), keywords=("water", "h2o"),
+        ),
+    ])
+
+    def test_rules(self):
+        result = grade(self.answer_key, [
+            Answer(attempt_id=1, question_id=1, selected_ids=frozenset({10})),
+            Answer(attempt_id=1, question_id=2, selected_ids=frozenset({20, 21, 22})),
+            Answer(attempt_id=1, question_id=3, text_answer="It is water"),
+            Answer(attempt_id=2, question_id=1, selected_ids=frozenset({10, 11})),
+            Answer(attempt_id=2, question_id=2, selected_ids=frozenset({20, 22, 23})),
+            Answer(attempt_id=2, question_id=3, text_answer=""),
+        ])
+        self.assertEqual(result.points.tolist(), [2, 2, 1, 0, 0, 0])
+        self.assertEqual(result.attempt_totals, {1: 5, 2: 0})
+
+    def test_options_of_other_questions_are_ignored(self):
+        result = grade(self.answer_key, [Answer(attempt_id=1, question_id=1, selected_ids=frozenset({20}))])
+        self.assertEqual(result.points.tolist(), [0])
+
+    def test_short_answers_are_matched_once_per_distinct_text(self):
+        matcher = ShortAnswerMatcher(self.answer_key[3])
+        texts = ["It is water", " it is WATER ", "H2O and water", "42", None, "it is water"]
+        with mock.patch.object(ShortAnswerMatcher, "score_normalized", wraps=matcher.score_normalized) as scored:
+            self.assertEqual(matcher.grade_many(texts), [1, 1, 2, 0, 0, 1])
+        self.assertEqual(scored.call_count, 4)
+
+    def test_similarity_fallback_matches_difflib(self):
+        question = QuestionKey(
+            id=4, question_type="SHORT", points=3, option_ids=frozenset({40}), correct_ids=frozenset({40}),
+            numeric_targets=("?!",), correct_texts=("?!",), keywords=(),
+        )
+        expected = round(3 * difflib.SequenceMatcher(None, "!?!", "?!").ratio(), 2)
+        self.assertEqual(ShortAnswerMatcher(question).grade_many(["!?!", "!?!"]), [expected, expected])
+
+
+class KhmerTextTests(SimpleTestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize(" ចម្លើយ\u200b ៤២ H2O "), "ចម្លើយ 42 h2o")
+
+    def test_tokenize_segments_khmer_words(self):
+        self.assertEqual(tokenize("ទឹកមានអ៊ីដ្រូសែននិងអុកស៊ីសែន"), ("ទឹក", "មាន", "អ៊ីដ្រូសែន", "និង", "អុកស៊ីសែន"))
+        self.assertEqual(tokenize("ព្រះ\u200bអាទិត្យ and water"), ("ព្រះអាទិត្យ", "and", "water"))
+
+    def test_unknown_syllables_stay_together(self):
+        self.assertEqual(tokenize("ទឹកសរីរាង្គ"), ("ទឹក", "សរីរាង្គ"))
+
+    def test_khmer_keywords_give_partial_credit(self):
+        text = normalize("ទឹកនិងអុកស៊ីសែន")
+        question = QuestionKey(
+            id=5, question_type="SHORT", points=3, option_ids=frozenset({50}), correct_ids=frozenset({50}),
+            numeric_targets=(text,), correct_texts=(text,), keywords=tokenize(text),
+        )
+        self.assertEqual(ShortAnswerMatcher(question).grade_many(["អុកស៊ីសែន", "ទឹក និង អុកស៊ីសែន", "ភ្លើង"]), [1, 3, 0])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RecalculationTests(QuizTestMixin, TestCase):
+    def test_admin_recalculation_matches_submit(self):
+        quiz = self.make_quiz(6)
+        attempt = self.make_attempt(quiz)
+        self.client.post(
+            f"/api/quizzes/{quiz.id}/submit/",
+            {"attempt_id": attempt.id, "answers": self.correct_answers(quiz)}, format="json",
+        )
+        attempt.refresh_from_db()
+        submitted_score = attempt.score
+
+        StudentResponse.objects.filter(attempt=attempt).update(points_earned=None)
+        QuizAttempt.objects.filter(pk=attempt.pk).update(score=0)
+        attempt.refresh_from_db()
+        self.assertEqual(QuizAdmin(Quiz, None).recalculate_quiz_attempt_score(attempt), submitted_score)
+        self.assertFalse(StudentResponse.objects.filter(attempt=attempt, points_earned__isnull=True).exists())
+
+    def submit_for_students(self, quiz, count):
+        students = [self.student] + [
+            Student.objects.create(student_id=f"S{i}", family_name="Sok", given_name=f"{i}", gender="M", student_type="ពេញម៉ោង")
+            for i in range(2, count + 1)
+        ]
+        for student in students:
+            attempt = QuizAttempt.objects.create(quiz=quiz, student=student, score=0, start_time=timezone.now())
+            QuizAttemptQuestion.objects.bulk_create([
+                QuizAttemptQuestion(attempt=attempt, question=question, order=i + 1)
+                for i, question in enumerate(quiz.questions.all())
+            ])
+            submit_attempt(attempt, self.correct_answers(quiz))
+
+    def test_bulk_recalculation_writes_only_changes(self):
+        quiz = self.make_quiz(6)
+        self.submit_for_students(quiz, 5)
+
+        self.assertEqual(recalculate_scores(quiz).changed, [])
+
+        single = quiz.questions.get(question_type="MCQ_SINGLE", order=0)
+        single.options.update(is_correct=False)
+        with CaptureQueriesContext(connection) as queries:
+            recalculation = recalculate_scores(quiz)
+        self.assertEqual(recalculation.total, 5)
+        self.assertEqual(len(recalculation.changed), 5)
+        self.assertEqual(set(QuizAttempt.objects.values_list("score", flat=True)), {10})
+        self.assertLessEqual(len(queries), 18)
+
+    def test_delta_recalculation_rescores_changed_questions_only(self):
+        quiz = self.make_quiz(6)
+        self.submit_for_students(quiz, 5)
+        single = quiz.questions.get(question_type="MCQ_SINGLE", order=0)
+        single.options.update(is_correct=False)
+        StudentResponse.objects.exclude(question=single).update(points_earned=0)  # must stay untouched
+
+        with CaptureQueriesContext(connection) as queries:
+            recalculation = recalculate_scores(quiz, question_ids=[single.id])
+        self.assertEqual(len(recalculation.changed), 5)
+        self.assertEqual(set(QuizAttempt.objects.values_list("score", flat=True)), {10})
+        self.assertEqual(set(StudentResponse.objects.filter(question=single).values_list("points_earned", flat=True)), {0})
+        self.assertFalse(StudentResponse.objects.exclude(question=single).exclude(points_earned=0).exists())
+        update_queries = [q for q in queries.captured_queries if q["sql"].startswith('UPDATE "quizzes_quizattempt"')]
+        self.assertEqual(len(update_queries), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class StartQuizViewTests(QuizTestMixin, TestCase):
+    def test_start_payload_hides_answer_key(self):
+        quiz = self.make_quiz(6)
+        attempt = self.make_attempt(quiz)
+        short = quiz.questions.get(question_type="SHORT", order=2)
+        self.client.patch(
+            f"/api/quizzes/{quiz.id}/autosave/",
+            {"attempt_id": attempt.id, "seq": 1, "answers": {str(short.id): "forty two"}}, format="json",
+        )
+
+        response = self.client.get(f"/api/quizzes/{quiz.id}/start/")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotIn(b"is_correct", response.content)
+        data = response.json()
+        self.assertEqual(data["attempt_id"], attempt.id)
+        self.assertEqual(data["answers"], {str(short.id): "forty two"})
+        self.assertEqual([q["order"] for q in data["questions"]], list(range(1, 7)))
+        self.assertTrue(all(q["options"] == [] for q in data["questions"] if q["question_type"] == "SHORT"))
+
+    def test_provisioned_attempt_without_questions_is_sampled_on_start(self):
+        quiz = self.make_quiz(0)
+        self.assertEqual(provision_attempts(quiz), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Question.objects.create(quiz=quiz, text=f"Late {i}", question_type="SHORT", difficulty="MEDIUM", order=i)
+            quiz.num_medium_questions = 3
+            quiz.save()
+
+        response = self.client.get(f"/api/quizzes/{quiz.id}/start/")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()["questions"]), 3)
+        attempt = QuizAttempt.objects.get(quiz=quiz)
+        self.assertEqual((attempt.score, attempt.selected_questions.count()), (0, 3))
+
+
+class QuestionSamplingTests(QuizTestMixin, TestCase):
+    def count_select_queries(self, num_questions):
+        quiz = self.make_quiz(num_questions, title=f"Quiz {num_questions}")
+        quiz.num_medium_questions = 3
+        quiz.save()
+        attempt = QuizAttempt.objects.create(quiz=quiz, student=self.student, score=0, start_time=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            selected = attempt.select_questions()
+        self.assertEqual(len(selected), 3)
+        self.assertEqual(list(attempt.selected_questions.order_by("order").values_list("question_id", flat=True)), selected)
+        attempt.delete()
+        return len(queries)
+
+    def test_selection_is_reproducible_from_attempt_id(self):
+        quiz = self.make_quiz(30)
+        quiz.num_medium_questions = 5
+        self.assertEqual(sample_questions(quiz, 7), sample_questions(quiz, 7))
+        self.assertNotEqual(sample_questions(quiz, 7), sample_questions(quiz, 8))
+
+    def test_query_count_is_independent_of_bank_size(self):
+        self.assertEqual(self.count_select_queries(3), self.count_select_queries(60))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class QuizListTests(QuizTestMixin, TestCase):
+    def list_quizzes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/quizzes/")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), len(queries)
+
+    def test_list_is_annotated(self):
+        quiz = self.make_quiz(4)
+        attempt = self.make_attempt(quiz)
+        QuizAttempt.objects.filter(pk=attempt.pk).update(completed_at=timezone.now())
+        self.make_quiz(2, title="Other")
+
+        data, _ = self.list_quizzes()
+        entries = {entry["title"]: entry for entry in data}
+        self.assertEqual(entries["Quiz"]["question_count"], 4)
+        self.assertTrue(entries["Quiz"]["has_attempted"])
+        self.assertEqual(entries["Other"]["question_count"], 2)
+        self.assertFalse(entries["Other"]["has_attempted"])
+        self.assertNotIn("questions", entries["Quiz"])
+
+    def test_query_count_is_independent_of_quiz_count(self):
+        self.make_quiz(1)
+        self.list_quizzes()  # creates the stamps
+        _, few = self.list_quizzes()
+        for i in range(10):
+            self.make_quiz(3, title=f"Quiz {i}")
+        data, many = self.list_quizzes()
+        self.assertEqual(len(data), 11)
+        self.assertEqual(few, many)
+
+
+
+
+class ResponseMatrixTests(QuizTestMixin, TestCase):
+    def test_rows_and_constant_queries(self):
+        quiz = self.make_quiz(6)
+        attempt = self.make_attempt(quiz)
+        single, multi, short = list(quiz.questions.order_by("order"))[:3]
+        answers = self.correct_answers(quiz)
+        submit_attempt(attempt, {key: answers[key] for key in (str(single.id), str(multi.id), str(short.id))})
+
+        with CaptureQueriesContext(connection) as queries:
+            matrix = build_response_matrix(quiz, [attempt.id])
+        (number, name, cells, score), = matrix.rows()
+        self.assertEqual((number, name, score), (1, "Sok Dara", 6))
+        self.assertEqual(cells[:3], ("A", "A, B", "the answer is 42"))
+        self.assertEqual(set(cells[3:]), {"No answer"})
+
+        other = Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង")
+        second = QuizAttempt.objects.create(quiz=quiz, student=other, score=0, start_time=timezone.now())
+        submit_attempt(second, answers)
+        with self.assertNumQueries(len(queries)):
+            matrix = build_response_matrix(quiz, [attempt.id, second.id])
+        self.assertEqual(matrix.students, ["Sok Dara", "Chan Mony"])
+
+
+class ScoreExportTests(QuizTestMixin, TestCase):
+    def test_classes_are_resolved_in_the_row_query(self):
+        quiz = self.make_quiz(3)
+        submit_attempt(self.make_attempt(quiz), self.correct_answers(quiz))
+        other = Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង")
+        QuizAttempt.objects.create(quiz=quiz, student=other, score=3, start_time=timezone.now())
+
+        with self.assertNumQueries(1):
+            output = write_scores_workbook([quiz], lambda quiz: quiz.attempts.order_by("id"), self.year)
+        rows = list(load_workbook(output).active.iter_rows(min_row=5, values_only=True))
+        self.assertEqual([row[0] for row in rows], ["S1", "S2"])
+        self.assertEqual([row[4] for row in rows], ["12A", "មិនស្គាល់"])
+        self.assertEqual([row[5] for row in rows], [6, 3])
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ItemAnalyticsTests(QuizTestMixin, TestCase):
+    def test_difficulty_discrimination_and_distractors(self):
+        quiz = self.make_quiz(3)
+        single = quiz.questions.get(question_type="MCQ_SINGLE")
+        wrong = single.options.get(text="C")
+        answers = self.correct_answers(quiz)
+        other = Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង")
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(self.make_attempt(quiz), answers)
+            attempt = QuizAttempt.objects.create(quiz=quiz, student=other, score=0, start_time=timezone.now())
+            QuizAttemptQuestion.objects.bulk_create([
+                QuizAttemptQuestion(attempt=attempt, question=question, order=i + 1)
+                for i, question in enumerate(quiz.questions.all())
+            ])
+            submit_attempt(attempt, {**answers, str(single.id): wrong.id})
+
+        analytics = get_item_analytics(quiz.id)
+        self.assertEqual(analytics["attempts"], 2)
+        single_item, multi_item, short_item = analytics["items"]
+        self.assertEqual((single_item["p_value"], single_item["discrimination"]), (0.5, 1.0))
+        self.assertEqual({option["text"]: option["count"] for option in single_item["options"]}, {"A": 1, "B": 0, "C": 1})
+        self.assertEqual((multi_item["p_value"], multi_item["discrimination"]), (1.0, None))
+        with self.assertNumQueries(1):  # the stamps
+            self.assertEqual(get_item_analytics(quiz.id), analytics)
+
+        # A regraded attempt invalidates the cached analytics
+        with self.captureOnCommitCallbacks(execute=True):
+            single.options.update(is_correct=False)
+            recalculate_scores(quiz)
+        self.assertEqual(get_item_analytics(quiz.id)["items"][0]["p_value"], 0.0)
+
+    def test_api_is_limited_to_staff(self):
+        quiz = self.make_quiz(3)
+        self.assertEqual(self.client.get(f"/api/quizzes/{quiz.id}/analytics/").status_code, 403)
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.get(f"/api/quizzes/{quiz.id}/analytics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["attempts"], 0)
+        self.assertEqual(len(response.json()["items"]), 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class QuizStatsTests(QuizTestMixin, TestCase):
+    def stats(self, quiz):
+        return {
+            row.school_class_id: (row.count, row.mean, row.min_score, row.max_score, row.histogram)
+            for row in QuizStats.objects.filter(quiz=quiz)
+        }
+
+    def test_stats_follow_grading_rescoring_and_deletion(self):
+        quiz = self.make_quiz(6)
+        answers = self.correct_answers(quiz)
+        single = quiz.questions.get(question_type="MCQ_SINGLE", order=0)
+        submit_attempt(self.make_attempt(quiz), answers)
+        other = Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង")
+        attempt = QuizAttempt.objects.create(quiz=quiz, student=other, score=0, start_time=timezone.now())
+        QuizAttemptQuestion.objects.bulk_create([
+            QuizAttemptQuestion(attempt=attempt, question=question, order=i + 1)
+            for i, question in enumerate(quiz.questions.all())
+        ])
+        submit_attempt(attempt, {**answers, str(single.id): single.options.get(text="C").id})
+
+        # 10 and 12 of 12 points
+        self.assertEqual(self.stats(quiz), {
+            None: (2, 11, 10, 12, [0] * 8 + [1, 1]),
+            self.school_class.id: (1, 12, 12, 12, [0] * 9 + [1]),
+        })
+
+        single.options.update(is_correct=False)
+        recalculate_scores(quiz)
+        self.assertEqual(self.stats(quiz)[None][:4], (2, 10, 10, 10))
+        attempt.delete()
+        self.assertEqual(self.stats(quiz)[None][:4], (1, 10, 10, 10))
+
+        maintained = self.stats(quiz)
+        self.assertEqual(rebuild_quiz_stats(quiz.id), 1)
+        self.assertEqual(self.stats(quiz), maintained)
+
+    def test_attempt_finished_by_a_late_start_is_counted(self):
+        quiz = self.make_quiz(3)
+        submit_attempt(self.make_attempt(quiz), self.correct_answers(quiz))
+        other = CustomUser.objects.create_user(username="S2", password="x", role="student")
+        Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង", user=other)
+        self.client.force_authenticate(other)
+
+        with mock.patch("apps.quizzes.views.timezone.now", return_value=quiz.start_time + quiz.time_limit):
+            response = self.client.get(f"/api/quizzes/{quiz.id}/start/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats(quiz)[None][:4], (2, 3, 0, 6))
+
+        maintained = self.stats(quiz)
+        self.assertEqual(rebuild_quiz_stats(quiz.id), 2)
+        self.assertEqual(self.stats(quiz), maintained)
+
+    def test_api_reads_the_aggregates(self):
+        quiz = self.make_quiz(3)
+        submit_attempt(self.make_attempt(quiz), self.correct_answers(quiz))
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        self.client.force_authenticate(admin)
+        response = self.client.get(f"/api/quizzes/{quiz.id}/stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["quiz"]["count"], response.json()["quiz"]["mean"]), (1, 6))
+        self.assertEqual([row["class_name"] for row in response.json()["classes"]], ["12A"])
+
+    def test_histogram_is_rebuilt_when_the_maximum_changes(self):
+        quiz = self.make_quiz(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(self.make_attempt(quiz), self.correct_answers(quiz))
+        self.assertEqual(self.stats(quiz)[None][4], [0] * 9 + [1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(quiz=quiz, text="Bonus", question_type="SHORT", difficulty="MEDIUM", order=3, points=14)
+            quiz.num_medium_questions = 4
+            quiz.save()
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        self.client.force_authenticate(admin)
+        data = self.client.get(f"/api/quizzes/{quiz.id}/stats/").json()["quiz"]
+        # 6 of 20 points
+        self.assertEqual((data["max_points"], data["histogram"]), (20, [0, 0, 0, 1] + [0] * 6))
+
+
+class GradebookTests(QuizTestMixin, TestCase):
+    def test_pivot_is_built_in_constant_queries_and_cached(self):
+        first, second = self.make_quiz(3, title="First"), self.make_quiz(6, title="Second")
+        Quiz.objects.filter(pk__in=[first.pk, second.pk]).update(start_time=timezone.make_aware(datetime.datetime(2025, 6, 1)))
+        other = Student.objects.create(student_id="S2", family_name="Chan", given_name="Mony", gender="F", student_type="ពេញម៉ោង")
+        Enrollment.objects.create(
+            student=other, school_class=self.school_class, academic_year=self.year, enrolled_date=datetime.date(2025, 1, 1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(self.make_attempt(first), self.correct_answers(first))
+
+        with self.assertNumQueries(6):  # 3, and 3 to create the missing stamps
+            gradebook = get_gradebook(self.year, [self.school_class.pk])
+        self.assertEqual(gradebook.quizzes, [(first.pk, "First"), (second.pk, "Second")])
+        self.assertEqual(list(gradebook.rows()), [
+            (1, "S2", "Chan Mony", "12A", (None, None), None),
+            (2, "S1", "Sok Dara", "12A", (6.0, None), 6.0),
+        ])
+        with self.assertNumQueries(2):
+            get_gradebook(self.year, [self.school_class.pk])
+
+        attempt = QuizAttempt.objects.create(quiz=second, student=other, score=0, start_time=timezone.now())
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(attempt, {})
+        rows = list(get_gradebook(self.year, [self.school_class.pk]).rows())
+        self.assertEqual(rows[0][4:], ((None, 0.0), 0.0))
+
+
+class RecalculationJobTests(QuizTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = self.make_quiz(3)
+        attempt = self.make_attempt(self.quiz)
+        submit_attempt(attempt, self.correct_answers(self.quiz))
+        self.quiz.questions.get(question_type="MCQ_SINGLE").options.update(is_correct=False)
+
+    @override_settings(QUIZ_ASYNC_RECALCULATION=True)
+    def test_one_active_job_per_quiz(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job, created = enqueue_recalculation(self.quiz)
+        self.assertTrue(created)
+        self.assertEqual(job.status, RecalculationJob.Status.PENDING)
+        again, created = enqueue_recalculation(self.quiz)
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+
+        run_recalculation_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecalculationJob.Status.DONE)
+        self.assertEqual((job.processed, job.updated, job.errors), (1, 1, ""))
+        self.assertEqual(QuizAttempt.objects.get().score, 4)
+        self.assertTrue(enqueue_recalculation(self.quiz)[1])
+
+    def test_runs_inline_without_workers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job, _created = enqueue_recalculation(self.quiz)
+        job.refresh_from_db()
+        self.assertEqual(job.status, RecalculationJob.Status.DONE)
+        self.assertEqual(QuizAttempt.objects.get().score, 4)
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTests(QuizTestMixin, TestCase):
+    def test_quiz_list_revalidates_until_an_attempt_completes(self):
+        quiz = self.make_quiz(3)
+        attempt = self.make_attempt(quiz)
+        response = self.client.get("/api/quizzes/")
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/quizzes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 2)  # only the student lookup and the stamps
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.completed_at = timezone.now()
+            attempt.save()
+        response = self.client.get("/api/quizzes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()[0]["has_attempted"])
+
+    def test_review_of_finished_quiz_is_revalidated(self):
+        quiz = self.make_quiz(3)
+        attempt = self.make_attempt(quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/quizzes/{quiz.id}/submit/", {"attempt_id": attempt.id}, format="json")
+        url = f"/api/quizzes/{quiz.id}/review/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        Quiz.objects.filter(pk=quiz.pk).update(start_time=timezone.now() - datetime.timedelta(days=1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        # Scores still change after the quiz ends
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt.refresh_from_db()
+            attempt.score = 1
+            attempt.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            quiz.questions.first().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+
+class QuizImportValidationTests(QuizTestMixin, TestCase):
+    def test_quiz_sheet_errors_are_reported_per_row(self):
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        rows = [
+            ["Math", "Kong", "Quiz 1", "12A, 13Z", "00:30:00", "2025-09-18 09:00:00", "PUBLISH", "What?", "MCQ_SINGLE", "4", 1],
+            ["", "", "", "", "", "", "", "", "", "3", ""],
+            ["Math", "Nobody", "Quiz 2", "12A", "0:75:00", "someday", "LIVE", "Why?", "ESSAY", "", "many"],
+            ["", "", "", "", "", "", "", "", "", "", ""],
+        ]
+        df = rename_quiz_columns(pd.DataFrame(rows, columns=[
+            "Category ", "Teacher Name", "Quiz Title", "Classes", "Time Limit", "Start Time", "Status",
+            "question text", "Question Type", "Option Text", "Points",
+        ]))
+
+        report = validate_quizzes([df], admin)
+
+        errors = report.errors
+        self.assertEqual(set(errors["line"]), {2, 4})
+        self.assertEqual(errors[errors["line"] == 2]["value"].tolist(), ["13Z"])
+        self.assertEqual(
+            sorted(errors[errors["line"] == 4]["column"]),
+            ["Points", "Question Type", "Start Time", "Status", "Teacher Name", "Time Limit"],
+        )
+
+    def test_teacher_without_profile_cannot_import(self):
+        user = CustomUser.objects.create_user(username="T9", password="x", is_staff=True)
+        df = rename_quiz_columns(pd.DataFrame([["Quiz", "", "", ""], ["", "Q?", "", ""], ["", "", "A", ""]], columns=[
+            "Quiz Title", "Question Text", "Option Text", "Is Correct",
+        ]))
+        self.assertEqual(validate_quizzes([df], user).error_lines, [2])
+        # The quiz and question of earlier chunks carry over
+        self.assertEqual(validate_quizzes([df[:1], df[1:2], df[2:]], user).error_lines, [2])
+        df.loc[0, "Quiz Title"] = ""
+        self.assertEqual(validate_quizzes([df], user).error_lines, [3])
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMPORT_ASYNC=False)
+    def test_import_job_chunks_whole_quizzes(self):
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        columns = ["Category", "Teacher Name", "Quiz Title", "Classes", "Question Text", "Question Type", "Option Text", "Is Correct", "Points"]
+        df = pd.DataFrame([
+            ["Math", "Kong", "Quiz 1", "12A", "2 + 2?", "MCQ_SINGLE", "4", True, 1],
+            ["", "", "", "", "", "", "3", False, ""],
+            ["", "", "", "", "Name a prime", "SHORT", "7", True, 2],
+            ["Math", "Kong", "Quiz 2", "12A", "3 + 3?", "MCQ_SINGLE", "6", True, 1],
+            ["", "", "", "", "", "", "5", False, ""],
+        ], columns=columns)
+        upload = io.BytesIO()
+        df.to_excel(upload, index=False)
+        importer_chunks = []
+        chunks = QuizSheetImporter.chunks
+
+        def record_chunks(importer, sheet, start):
+            for chunk in chunks(importer, sheet, start):
+                importer_chunks.append((chunk.index[0], chunk.index[-1] + 1))
+                yield chunk
+
+        with mock.patch.object(QuizSheetImporter, "chunk_size", 2), \
+                mock.patch.object(QuizSheetImporter, "chunks", record_chunks), \
+                self.captureOnCommitCallbacks(execute=True):
+            job = start_import(ImportJob.Kind.QUIZZES, SimpleUploadedFile("quizzes.xlsx", upload.getvalue()), admin)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created), (ImportJob.Status.DONE, 5, 2))
+        self.assertEqual(importer_chunks, [(0, 3), (3, 5)])
+        quiz = Quiz.objects.get(title="Quiz 1")
+        self.assertEqual(quiz.teacher, self.teacher)
+        self.assertEqual(list(quiz.classes.all()), [self.school_class])
+        self.assertEqual(
+            sorted(quiz.questions.values_list("text", "options__text", "options__is_correct")),
+            [("2 + 2?", "3", False), ("2 + 2?", "4", True), ("Name a prime", "7", True)],
+        )
+        self.assertEqual(Quiz.objects.get(title="Quiz 2").questions.get().options.count(), 2)
+
+    def bank_sheet(self, quizzes, questions):
+        rows = []
+        for q in range(quizzes):
+            for n in range(questions):
+                rows.append([f"Bank {q}" if n == 0 else "", "Math", "Kong", "12A", f"{n} + {n}?", "MCQ_SINGLE", str(n * 2), True])
+                rows.append(["", "", "", "", "", "", str(n * 2 + 1), False])
+        return rename_quiz_columns(pd.DataFrame(rows, columns=[
+            "Quiz Title", "Category", "Teacher Name", "Classes", "Question Text", "Question Type", "Option Text", "Is Correct",
+        ]))
+
+    def test_bank_import_runs_a_fixed_number_of_queries(self):
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        counts, created = [], []
+        for quizzes, questions in ((1, 2), (4, 25)):
+            with CaptureQueriesContext(connection) as queries:
+                created.append(import_quiz_rows(self.bank_sheet(quizzes, questions), admin).created)
+            counts.append(len(queries))
+
+        self.assertEqual(created, [1, 3])
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Quiz.objects.filter(title__startswith="Bank").count(), 4)
+        bank = Quiz.objects.get(title="Bank 3")
+        self.assertEqual(list(bank.classes.all()), [self.school_class])
+        self.assertEqual(list(bank.questions.values_list("order", flat=True)), list(range(1, 26)))
+        self.assertEqual(AnswerOption.objects.filter(question__quiz=bank, is_correct=True).count(), 25)
+
+    def test_bank_reimport_logs_changed_answers_and_invalidates_the_quiz(self):
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        df = self.bank_sheet(1, 3)
+        import_quiz_rows(df, admin)
+        quiz = Quiz.objects.get(title="Bank 0")
+        version = get_quiz_version(quiz.id)
+
+        df.loc[2:3, "Is Correct"] = [False, True]
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_quiz_rows(df, admin)
+
+        self.assertEqual((result.created, result.updated), (0, 1))
+        self.assertEqual(quiz.questions.count(), 3)
+        question = quiz.questions.get(text="1 + 1?")
+        self.assertEqual(list(question.options.filter(is_correct=True).values_list("text", flat=True)), ["3"])
+        self.assertEqual(
+            sorted(LogEntry.objects.values_list("object_id", flat=True)),
+            sorted(str(pk) for pk in question.options.values_list("pk", flat=True)),
+        )
+        self.assertNotEqual(get_quiz_version(quiz.id), version)
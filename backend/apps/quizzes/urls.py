@@ -1,7 +1,7 @@
 # quizzes/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QuizViewSet, StudentResponseViewSet, QuizAttemptViewSet, StartQuizView, SubmitQuizView, QuizReviewView
+from .views import QuizViewSet, StudentResponseViewSet, QuizAttemptViewSet, StartQuizView, SubmitQuizView, AutosaveQuizView, QuizReviewView, QuizAnalyticsView, QuizStatsView
 
 router = DefaultRouter()
 router.register(r'quizzes', QuizViewSet, basename='quiz')
@@ -12,6 +12,9 @@ urlpatterns = [
     path('', include(router.urls)),
     path('quizzes/<int:quiz_id>/start/', StartQuizView.as_view(), name='start-quiz'),
     path('quizzes/<int:quiz_id>/submit/', SubmitQuizView.as_view(), name='submit-quiz'),
+    path('quizzes/<int:quiz_id>/autosave/', AutosaveQuizView.as_view(), name='autosave-quiz'),
     path('quizzes/<int:quiz_id>/review/', QuizReviewView.as_view(), name='quiz-review'),
+    path('quizzes/<int:quiz_id>/analytics/', QuizAnalyticsView.as_view(), name='quiz-analytics'),
+    path('quizzes/<int:quiz_id>/stats/', QuizStatsView.as_view(), name='quiz-stats'),
 
 ]
@@ -2,17 +2,25 @@ from rest_framework import viewsets, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
-from django.db import models
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
 from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponse
 from django.utils import timezone
-from datetime import timedelta
-from django.utils.translation import gettext_lazy as _
-import difflib
-import re
 import logging
 
-from .models import Quiz, QuizAttempt, StudentResponse, Question, AnswerOption, QuizAttemptQuestion
-from .serializers import QuizSerializer, QuizAttemptSerializer, StudentResponseSerializer, QuizReviewSerializer
+from .models import Quiz, QuizAttempt, StudentResponse, QuizStats
+from .serializers import QuizSerializer, QuizAttemptSerializer, StudentResponseSerializer, QuizReviewSerializer, QuizStartSerializer, QuizListSerializer, QuizStatsSerializer
+from .analytics import get_item_analytics
+from .answer_key import get_answer_key
+from .cache import QUIZ_SCOPE
+from .payloads import render_start_payload
+from .scoring import load_answers
+from .stats import get_max_points, rebuild_quiz_stats, record_score_changes
+from .submission import submit_attempt, autosave_answers, queue_submission
+from .tasks import grade_queued_submissions
+from apps.core.conditional import conditional_response, load_stamps
 from apps.students.models import Student
 from apps.classes.models import SchoolClass
 
@@ -22,22 +30,42 @@ class QuizViewSet(viewsets.ModelViewSet):
     serializer_class = QuizSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_student(self):
+        """Resolve the requesting student once per request."""
+        if not hasattr(self, '_student'):
+            self._student = get_object_or_404(Student, user=self.request.user)
+        return self._student
+
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return Quiz.objects.none()
-        try:
-            student = get_object_or_404(Student, user=user)
-            active_classes = SchoolClass.objects.filter(
-                enrollment__student=student, enrollment__status='ACTIVE'
-            ).distinct()
-            quizzes = Quiz.objects.filter(
-                classes__in=active_classes, status="PUBLISH"
-            ).distinct()
-            return quizzes
-        except Student.DoesNotExist:
-            logger.error("Student not found for user in QuizViewSet")
-            return Quiz.objects.none()
+        student = self.get_student()
+        active_classes = SchoolClass.objects.filter(
+            enrollment__student=student, enrollment__status='ACTIVE'
+        )
+        # Filter through a subquery so the question count is not multiplied by class joins
+        quiz_ids = Quiz.classes.through.objects.filter(schoolclass__in=active_classes).values('quiz_id')
+        return Quiz.objects.filter(id__in=quiz_ids, status="PUBLISH").select_related(
+            'category', 'teacher'
+        ).prefetch_related('classes').annotate(
+            has_attempted=Exists(QuizAttempt.objects.filter(
+                quiz=OuterRef('pk'), student=student, completed_at__isnull=False
+            )),
+            question_count=Count('questions'),
+        )
+
+    def list(self, request, *args, **kwargs):
+        student = self.get_student()
+        return conditional_response(
+            request, load_stamps([("quizzes", ""), ("student", student.id)]),
+            lambda: super(QuizViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return QuizListSerializer
+        return QuizSerializer
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -49,15 +77,18 @@ class StartQuizView(APIView):
 
     def get(self, request, quiz_id):
         try:
-            quiz = get_object_or_404(Quiz, id=quiz_id, status="PUBLISH")
+            quiz = get_object_or_404(
+                Quiz.objects.select_related('category', 'teacher').prefetch_related('classes'),
+                id=quiz_id, status="PUBLISH",
+            )
             student = get_object_or_404(Student, user=request.user)
             
+            # Attempts are usually pre-provisioned, so starting is a plain lookup
+            in_progress_attempt = QuizAttempt.objects.filter(quiz=quiz, student=student).first()
+
             # Check for a completed attempt
-            completed_attempt = QuizAttempt.objects.filter(
-                quiz=quiz, student=student, completed_at__isnull=False
-            ).first()
-            if completed_attempt:
-                serializer = QuizAttemptSerializer(completed_attempt, context={'request': request})
+            if in_progress_attempt and in_progress_attempt.completed_at:
+                serializer = QuizAttemptSerializer(in_progress_attempt, context={'request': request})
                 return Response(serializer.data, status=status.HTTP_200_OK)
 
             # Check quiz timing
@@ -76,19 +107,21 @@ class StartQuizView(APIView):
                         "status": "finished"
                     }, status=status.HTTP_403_FORBIDDEN)
 
-            # Get or create an in-progress attempt
-            in_progress_attempt, created = QuizAttempt.objects.get_or_create(
-                quiz=quiz,
-                student=student,
-                completed_at__isnull=True,
-                defaults={'score': 0, 'start_time': now}
-            )
+            # Get or create an in-progress attempt for students that were not provisioned
+            created = False
+            if in_progress_attempt is None:
+                in_progress_attempt, created = QuizAttempt.objects.get_or_create(
+                    quiz=quiz,
+                    student=student,
+                    completed_at__isnull=True,
+                    defaults={'score': 0, 'start_time': now}
+                )
 
-            if created:
+            if created or in_progress_attempt.score is None:
+                # Provisioned attempts keep an empty score until the student starts
                 in_progress_attempt.start_time = now
-                in_progress_attempt.save()
-                # Auto-select questions for this new attempt
-                in_progress_attempt.select_questions()
+                in_progress_attempt.score = 0
+                in_progress_attempt.save(update_fields=['start_time', 'score'])
 
             # Calculate remaining time
             remaining_time = None
@@ -96,53 +129,44 @@ class StartQuizView(APIView):
                 time_elapsed = now - quiz.start_time
                 remaining_time = quiz.time_limit.total_seconds() - time_elapsed.total_seconds()
                 if remaining_time <= 0:
-                    in_progress_attempt.completed_at = now
-                    in_progress_attempt.score = 0
-                    in_progress_attempt.save()
+                    with transaction.atomic():
+                        in_progress_attempt.completed_at = now
+                        in_progress_attempt.score = 0
+                        in_progress_attempt.save()
+                        # An unfinished attempt was not part of the statistics yet
+                        record_score_changes(quiz.id, [(student.id, None, 0)])
                     serializer = QuizAttemptSerializer(in_progress_attempt, context={'request': request})
                     return Response(serializer.data, status=status.HTTP_200_OK)
             
-            # Fetch selected questions for this attempt (ordered by presentation order), prefetch options to ensure they load
-            selected_attempt_questions = in_progress_attempt.selected_questions.prefetch_related('question__options').order_by('order')
-            selected_questions = [aq.question for aq in selected_attempt_questions]
-            
+            # Selected questions for this attempt, in presentation order
+            question_ids = list(
+                in_progress_attempt.selected_questions.order_by('order').values_list('question_id', flat=True)
+            )
+            if not question_ids:
+                # New attempt, or provisioned before the quiz had questions or whose selection was deleted since
+                question_ids = in_progress_attempt.select_questions()
+
             # Fetch saved responses for this attempt
-            responses = StudentResponse.objects.filter(attempt=in_progress_attempt)
+            answer_key = get_answer_key(quiz.id)
             answers = {}
-            for response in responses:
-                if response.question.question_type == 'MCQ_MULTI':
-                    answers[str(response.question.id)] = [opt.id for opt in response.selected_options.all()]
+            for answer in load_answers(quiz.id, attempt_ids=[in_progress_attempt.id]):
+                question = answer_key.get(answer.question_id)
+                if question and question.question_type == 'MCQ_MULTI':
+                    answers[str(answer.question_id)] = sorted(answer.selected_ids)
                 else:
-                    answers[str(response.question.id)] = (
-                        response.selected_options.first().id 
-                        if response.selected_options.first() 
-                        else response.text_answer
+                    answers[str(answer.question_id)] = (
+                        min(answer.selected_ids) if answer.selected_ids else answer.text_answer
                     )
-            
-            # Build quiz data with only selected questions
-            quiz_data = QuizSerializer(quiz, context={'request': request}).data
+
+            # Quiz data plus the cached, answer-free fragments of the selected questions
+            quiz_data = QuizStartSerializer(quiz, context={'request': request}).data
             quiz_data['attempt_id'] = in_progress_attempt.id
+            quiz_data['autosave_seq'] = in_progress_attempt.autosave_seq
             quiz_data['answers'] = answers
             quiz_data['remaining_time'] = remaining_time
-            quiz_data['questions'] = []
-            for i, question in enumerate(selected_questions):
-                # Ensure options are loaded and include is_correct for review if needed (but hide for taking quiz)
-                options_list = [{'id': opt.id, 'text': opt.text} for opt in question.options.all()]
-                question_data = {
-                    'id': question.id,
-                    'text': question.text or "",
-                    'question_type': question.question_type,
-                    'difficulty': question.difficulty,
-                    'points': question.points,
-                    'order': i + 1,  # Presentation order
-                    'options': options_list
-                }
-                # For SHORT questions, still include options if any (e.g., as hints or correct answers for review)
-                if question.question_type == 'SHORT' and not options_list:
-                    question_data['options'] = []  # Explicit empty for clarity
-                quiz_data['questions'].append(question_data)
-            
-            return Response(quiz_data)
+            return HttpResponse(
+                render_start_payload(quiz.id, quiz_data, question_ids), content_type='application/json'
+            )
         
         except (Quiz.DoesNotExist, Student.DoesNotExist) as e:
             logger.error(f"Error in StartQuizView: {str(e)}")
@@ -156,7 +180,11 @@ class SubmitQuizView(APIView):
 
     def post(self, request, quiz_id):
         try:
-            quiz = get_object_or_404(Quiz, id=quiz_id)
+            # Prefetch what QuizAttemptSerializer renders so the response stays constant-query
+            quiz = get_object_or_404(
+                Quiz.objects.select_related('category', 'teacher').prefetch_related('classes', 'questions__options'),
+                id=quiz_id,
+            )
             student = get_object_or_404(Student, user=request.user)
             attempt_id = request.data.get('attempt_id')
             answers_data = request.data.get('answers', {})
@@ -167,113 +195,20 @@ class SubmitQuizView(APIView):
             attempt = get_object_or_404(
                 QuizAttempt, id=attempt_id, student=student, quiz=quiz, completed_at__isnull=True
             )
+            attempt.quiz = quiz
+            if not isinstance(answers_data, dict):
+                return Response({"error": "Answers must be an object."}, status=status.HTTP_400_BAD_REQUEST)
 
-            total_score = 0
-            # Loop over selected questions for this attempt, prefetch options for scoring
-            selected_attempt_questions = attempt.selected_questions.prefetch_related('question__options').all()
-            questions = [aq.question for aq in selected_attempt_questions]
-
-            for question in questions:
-                user_answer = answers_data.get(str(question.id))
-                # if user_answer is None:
-                #     continue  # skip unanswered questions
-
-                # Create or update student response for this attempt and question
-                response, _ = StudentResponse.objects.get_or_create(
-                    attempt=attempt,
-                    question=question,
-                    defaults={'text_answer': '' if question.question_type == 'SHORT' else None}
-                )
+            if settings.QUIZ_ASYNC_GRADING:
+                # Persist the raw answers and let a worker grade them; clients poll the attempt for the score
+                with transaction.atomic():
+                    queue_submission(attempt, answers_data)
+                    transaction.on_commit(grade_queued_submissions.delay)
+                serializer = QuizAttemptSerializer(attempt, context={'request': request})
+                return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
-                # Clear previous selections for MCQ
-                if question.question_type in ['MCQ_SINGLE', 'MCQ_MULTI']:
-                    response.selected_options.clear()
-
-                # Save submitted answers
-                if question.question_type in ['MCQ_SINGLE', 'MCQ_MULTI']:
-                    try:
-                        if isinstance(user_answer, list):
-                            for answer_id in user_answer:
-                                option = AnswerOption.objects.get(id=answer_id)
-                                response.selected_options.add(option)
-                        elif user_answer:
-                            option = AnswerOption.objects.get(id=user_answer)
-                            response.selected_options.add(option)
-                        response.save()
-                    except AnswerOption.DoesNotExist:
-                        logger.error(f"Invalid AnswerOption ID: {user_answer}")
-                        continue
-                elif question.question_type == 'SHORT':
-                    response.text_answer = user_answer if user_answer else ''
-                    response.save()
-
-                # ----------------- SCORING -----------------
-                points_earned = 0
-
-                # MCQ_SINGLE
-                if question.question_type == 'MCQ_SINGLE':
-                    correct_option = question.options.filter(is_correct=True).first()
-                    if correct_option and response.selected_options.filter(id=correct_option.id).exists():
-                        points_earned = question.points
-
-                # MCQ_MULTI (strict partial credit with penalty)
-                elif question.question_type == 'MCQ_MULTI':
-                    all_options = set(question.options.values_list('id', flat=True))
-                    correct_options = set(question.options.filter(is_correct=True).values_list('id', flat=True))
-                    wrong_options = all_options - correct_options
-                    user_answers = set(response.selected_options.values_list('id', flat=True))
-
-                    num_correct = len(correct_options)
-                    num_wrong = len(wrong_options)
-
-                    num_correct_selected = len(user_answers & correct_options)
-                    num_wrong_selected = len(user_answers & wrong_options)
-
-                    score_from_correct = (question.points * num_correct_selected / num_correct) if num_correct else 0
-                    penalty_from_wrong = (question.points * num_wrong_selected / num_wrong) if num_wrong else 0
-
-                    points_earned = score_from_correct - penalty_from_wrong
-                    points_earned = max(0, min(points_earned, question.points))
-
-                # SHORT answer
-                elif question.question_type == 'SHORT' and response.text_answer:
-                    correct_options = question.options.filter(is_correct=True)
-                    student_text = response.text_answer.strip().lower()
-
-                    numeric_match = False
-                    for opt in correct_options:
-                        numbers = re.findall(r'\d+', student_text)
-                        if str(opt.text.strip()) in numbers:
-                            numeric_match = True
-                            break
-
-                    if numeric_match:
-                        points_earned = question.points
-                    else:
-                        keywords = []
-                        for opt in correct_options:
-                            keywords.extend(re.findall(r'\w+', opt.text.strip().lower()))
-                        if keywords:
-                            points_per_keyword = question.points / len(keywords)
-                            match_count = sum(1 for kw in keywords if kw in student_text)
-                            points_earned = round(points_per_keyword * match_count, 2)
-                        else:
-                            if correct_options.exists():
-                                similarity_scores = [
-                                    difflib.SequenceMatcher(None, student_text, opt.text.strip().lower()).ratio()
-                                    for opt in correct_options
-                                ]
-                                points_earned = round(question.points * max(similarity_scores), 2)
-
-                # Save points earned per question
-                response.points_earned = points_earned
-                response.save(update_fields=['points_earned'])
-                total_score += points_earned
-
-            # Save attempt score
-            attempt.score = round(total_score, 2)
-            attempt.completed_at = timezone.now()
-            attempt.save(update_fields=['score', 'completed_at'])
+            # Validate, store and score all answers with a constant number of queries
+            submit_attempt(attempt, answers_data)
 
             serializer = QuizAttemptSerializer(attempt, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -285,6 +220,47 @@ class SubmitQuizView(APIView):
             # logger.error(f"Unexpected error: {str(e)}", exc_info=True)
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class AutosaveQuizView(APIView):
+    """
+    Incrementally store answers of an in-progress attempt.
+    Body: {"attempt_id": int, "seq": int, "answers": {question_id: answer}} with
+    only the answers changed since the last autosave. Writes carrying a `seq`
+    not greater than the last applied one are dropped as stale.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def patch(self, request, quiz_id):
+        try:
+            attempt_id = request.data.get('attempt_id')
+            answers_data = request.data.get('answers') or {}
+            try:
+                seq = int(request.data.get('seq'))
+            except (TypeError, ValueError):
+                return Response({"error": "A numeric seq is required."}, status=status.HTTP_400_BAD_REQUEST)
+            if not attempt_id or not isinstance(answers_data, dict):
+                return Response({"error": "Attempt ID and answers are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+            attempt = get_object_or_404(
+                QuizAttempt.objects.select_related('quiz'),
+                id=attempt_id, quiz_id=quiz_id, student__user=request.user, completed_at__isnull=True,
+            )
+            quiz = attempt.quiz
+            if quiz.start_time and quiz.time_limit and timezone.now() > quiz.start_time + quiz.time_limit:
+                return Response({
+                    "error": "This quiz has already finished.",
+                    "status": "finished"
+                }, status=status.HTTP_403_FORBIDDEN)
+
+            if not autosave_answers(attempt, seq, answers_data):
+                return Response({"status": "stale", "seq": seq}, status=status.HTTP_200_OK)
+            return Response({"status": "saved", "seq": seq}, status=status.HTTP_200_OK)
+
+        except Http404 as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Unexpected error in AutosaveQuizView: {str(e)}", exc_info=True)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class QuizReviewView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -295,9 +271,17 @@ class QuizReviewView(APIView):
             attempt = get_object_or_404(
                 QuizAttempt, quiz=quiz, student=student, completed_at__isnull=False
             )
-            serializer = QuizReviewSerializer(attempt, context={'request': request})
-            # logger.info(f"Quiz review data for quiz_id {quiz_id}: {serializer.data}")
-            return Response(serializer.data, status=status.HTTP_200_OK)
+
+            def build():
+                serializer = QuizReviewSerializer(attempt, context={'request': request})
+                # logger.info(f"Quiz review data for quiz_id {quiz_id}: {serializer.data}")
+                return Response(serializer.data, status=status.HTTP_200_OK)
+
+            # Grading, recalculations and the quiz's review settings change a review even after the
+            # quiz ends, so browsers always revalidate it
+            return conditional_response(
+                request, load_stamps([(QUIZ_SCOPE, quiz.id), ("attempt", attempt.id)]), build,
+            )
         except (Quiz.DoesNotExist, Student.DoesNotExist, QuizAttempt.DoesNotExist) as e:
             # logger.error(f"Not found error in QuizReviewView: {str(e)}")
             return Response(
@@ -311,6 +295,37 @@ class QuizReviewView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class QuizAnalyticsView(APIView):
+    """Per-question item analytics of a quiz, for superusers and the quiz's teacher."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, quiz_id):
+        quizzes = Quiz.objects.all()
+        if not request.user.is_superuser:
+            quizzes = quizzes.filter(teacher__user=request.user)
+        quiz = get_object_or_404(quizzes, id=quiz_id)
+        return Response(get_item_analytics(quiz.id), status=status.HTTP_200_OK)
+
+class QuizStatsView(APIView):
+    """Score statistics of a quiz and of each of its classes, read from the maintained aggregates."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, quiz_id):
+        quizzes = Quiz.objects.all()
+        if not request.user.is_superuser:
+            quizzes = quizzes.filter(teacher__user=request.user)
+        quiz = get_object_or_404(quizzes, id=quiz_id)
+        stats = list(quiz.stats.select_related('school_class').order_by('school_class__name'))
+        if any(row.max_points != get_max_points(quiz.id) for row in stats):
+            # The quiz's questions changed since its last graded attempt
+            rebuild_quiz_stats(quiz.id)
+            stats = list(quiz.stats.select_related('school_class').order_by('school_class__name'))
+        overall = next((row for row in stats if row.school_class_id is None), QuizStats(quiz=quiz))
+        return Response({
+            'quiz': QuizStatsSerializer(overall).data,
+            'classes': QuizStatsSerializer([row for row in stats if row.school_class_id is not None], many=True).data,
+        }, status=status.HTTP_200_OK)
+
 class StudentResponseViewSet(viewsets.ModelViewSet):
     queryset = StudentResponse.objects.all()
     serializer_class = StudentResponseSerializer
@@ -13,11 +13,15 @@ import io
 from django.http import FileResponse
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment
-from datetime import datetime
 
 from .models import Student, Enrollment, Parent
+from .importing import validate_students
+from apps.core.import_jobs import IMPORT_CHUNK_SIZE, redirect_to_job, requested_job, start_import
+from apps.core.importing import check_sheet
+from apps.core.models import ImportJob
+from apps.core.sheets import SheetReader
 from apps.classes.models import SchoolClass
-from apps.core.models import AcademicYear, Semester, Major
+from apps.core.models import AcademicYear, Semester
 from django.core.exceptions import PermissionDenied
 
 # -------------------------
@@ -51,58 +55,6 @@ class ParentInline(admin.TabularInline):
     verbose_name = trans ("អាណាព្យាបាល")
     verbose_name_plural = trans ("អាណាព្យាបាល")
 
-# -------------------------
-# Helpers
-# -------------------------
-def parse_date(value):
-    """Parse Excel / string dates. Accept dd/mm/YYYY or YYYY-MM-DD or Excel serials."""
-    if pd.isna(value):
-        return None
-    if isinstance(value, datetime):
-        return value.date()
-    s = str(value).strip()
-    if not s:
-        return None
-    try:
-        return datetime.strptime(s, "%d/%m/%Y").date()
-    except Exception:
-        pass
-    try:
-        return datetime.strptime(s, "%Y-%m-%d").date()
-    except Exception:
-        pass
-    try:
-        return pd.to_datetime(s, dayfirst=True, errors="coerce").date()
-    except Exception:
-        return None
-
-def khmer_status_to_code(kh):
-    mapping = {
-        "កំពុងរៀន": Enrollment.Status.ACTIVE,
-        "ផ្ទេរចេញ": Enrollment.Status.TRANSFERRED,
-        "បោះបង់": Enrollment.Status.DROPOUT,
-        "បញ្ចប់ការសិក្សា": Enrollment.Status.GRADUATED,
-        "ដកចេញ": Enrollment.Status.WITHDRAWN,
-    }
-    return mapping.get(str(kh).strip(), Enrollment.Status.ACTIVE)
-
-def khmer_gender_to_code(kh):
-    mapping = {
-        "ប្រុស": "M",
-        "ស្រី": "F",
-        "ផ្សេងៗ": "O",
-        "other": "O",
-        "male": "M",
-        "female": "F",
-    }
-    return mapping.get(str(kh).strip(), "")
-
-def safe_str(value):
-    """Convert value to string safely (handles numeric phone numbers)."""
-    if value is None:
-        return ""
-    return str(value).strip()
-
 # -------------------------
 # Student Admin
 # -------------------------
@@ -340,107 +292,19 @@ class StudentAdmin(admin.ModelAdmin):
     def import_students(self, request):
         if request.method == "POST" and request.FILES.get("excel_file"):
             try:
-                df = pd.read_excel(request.FILES["excel_file"], dtype=object)
+                report = validate_students(SheetReader(request.FILES["excel_file"]).chunks(IMPORT_CHUNK_SIZE))
             except Exception as e:
                 self.message_user(request, trans ("មិនអាចបើកឯកសារ Excel: %s") % e, level=messages.ERROR)
                 return redirect("..")
 
-            df.rename(columns=lambda c: str(c).strip(), inplace=True)
-
-            for _, row in df.iterrows():
-                student_id = safe_str(row.get("លេខសម្គាល់សិស្ស") or row.get("លេខសម្គាល់សិស្ស", "")).strip()
-                if not student_id:
-                    continue
-
-                family_name = safe_str(row.get("នាមត្រកូល"))
-                given_name = safe_str(row.get("នាមខ្លួន"))
-                phone_number = safe_str(row.get("លេខទូរស័ព្ទ"))
-                place_of_birth = safe_str(row.get("កន្លែងកំណើត"))
-                student_type_value = safe_str(row.get("ប្រភេទសិស្ស"))
-                gender_value = safe_str(row.get("ភេទ"))
-
-                dob = parse_date(row.get("ថ្ងៃខែឆ្នាំកំណើត"))
-                enrollment_date = parse_date(row.get("កាលបរិច្ឆេទចូលរៀន"))
-
-                major_name = safe_str(row.get("ប្រភេទថ្នាក់") or row.get("ជំនាញ") or row.get("ប្រភេទថ្នាក់"))
-                major_obj = None
-                if major_name:
-                    major_obj, _ = Major.objects.get_or_create(name=major_name)
-
-                gender_code = khmer_gender_to_code(gender_value)
-                student_type_code = student_type_value
-                map_type = {
-                    "ពេញម៉ោង": "ពេញម៉ោង",
-                    "ក្រៅម៉ោង": "ក្រៅម៉ោង",
-                    "Full-Time": "ពេញម៉ោង",
-                    "Part-Time": "ក្រៅម៉ោង",
-                }
-                student_type_code = map_type.get(student_type_value, student_type_value)
-
-                student, created = Student.objects.update_or_create(
-                    student_id=student_id,
-                    defaults={
-                        "family_name": family_name,
-                        "given_name": given_name,
-                        "gender": gender_code or "",
-                        "date_of_birth": dob,
-                        "place_of_birth": place_of_birth,
-                        "phone_number": phone_number,
-                        "student_type": student_type_code,
-                        "enrollment_date": enrollment_date,
-                        "major": major_obj,
-                    },
-                )
-
-                class_name = safe_str(row.get("ថ្នាក់រៀន"))
-                year_name = safe_str(row.get("ឆ្នាំសិក្សា"))
-
-                school_class_obj = SchoolClass.objects.filter(name=class_name).first() if class_name else None
-                academic_year_obj = None
-                if year_name:
-                    academic_year_obj, _ = AcademicYear.objects.get_or_create(name=year_name)
-
-                status_kh = safe_str(row.get("ស្ថានភាព"))
-                status_code = khmer_status_to_code(status_kh)
-
-                if student and school_class_obj and academic_year_obj:
-                    Enrollment.objects.update_or_create(
-                        student=student,
-                        academic_year=academic_year_obj,
-                        semester=None,
-                        defaults={
-                            "school_class": school_class_obj,
-                            "status": status_code,
-                            "enrolled_date": enrollment_date or (datetime.today().date()),
-                        },
-                    )
-
-                father_name = safe_str(row.get("ឈ្មោះឪពុក"))
-                father_job = safe_str(row.get("មុខរបរ ឪពុក"))
-                father_phone = safe_str(row.get("លេខទូរស័ព្ទ ឪពុក"))
-
-                mother_name = safe_str(row.get("ឈ្មោះម្តាយ"))
-                mother_job = safe_str(row.get("មុខរបរ ម្តាយ"))
-                mother_phone = safe_str(row.get("លេខទូរស័ព្ទ ម្តាយ"))
-
-                if father_name or mother_name:
-                    parent, _ = Parent.objects.get_or_create(
-                        father_name=father_name or None,
-                        mother_name=mother_name or None,
-                        defaults={
-                            "father_phone": father_phone or None,
-                            "mother_phone": mother_phone or None,
-                            "father_occupation": father_job or None,
-                            "mother_occupation": mother_job or None,
-                        },
-                    )
-                    parent.students.add(student)
-
-            # ✅ fixed here
-            self.message_user(request, trans ("✅ អានទិន្នន័យសិស្សរួចរាល់"), level=messages.SUCCESS)
-            return redirect("..")
-
-        return render(request, "admin/students/import_students.html", {})
+            response = check_sheet(request, report, "student_import_errors.xlsx")
+            if response:
+                return response
+
+            job = start_import(ImportJob.Kind.STUDENTS, request.FILES["excel_file"], request.user, report.rows)
+            return redirect_to_job(request, job)
+
+        return render(request, "admin/students/import_students.html", {"job": requested_job(request)})
 
     def export_students(self, request):
         qs = Student.objects.all()
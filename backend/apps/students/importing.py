@@ -0,0 +1,315 @@
+"""
+Bulk import of students from the admin's Excel template.
+
+Rows are parsed up front, majors, classes and academic years are resolved
+from lookup dicts loaded once, and students, enrollments and parent links are
+upserted chunk by chunk, each chunk in its own transaction with a fixed
+number of queries.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import gettext as _
+
+from apps.classes.models import SchoolClass
+from apps.core.conditional import bump_stamps_on_commit
+from apps.core.import_jobs import SheetImporter
+from apps.core.importing import SheetValidator, blank, parse_date, stripped
+from apps.core.models import AcademicYear, Major
+from .models import Enrollment, Parent, Student
+
+STUDENT_TYPES = {
+    "ពេញម៉ោង": "ពេញម៉ោង",
+    "ក្រៅម៉ោង": "ក្រៅម៉ោង",
+    "Full-Time": "ពេញម៉ោង",
+    "Part-Time": "ក្រៅម៉ោង",
+}
+STUDENT_FIELDS = [
+    "family_name", "given_name", "gender", "date_of_birth", "place_of_birth",
+    "phone_number", "student_type", "enrollment_date", "major",
+]
+
+
+STATUSES = {
+    "កំពុងរៀន": Enrollment.Status.ACTIVE,
+    "ផ្ទេរចេញ": Enrollment.Status.TRANSFERRED,
+    "បោះបង់": Enrollment.Status.DROPOUT,
+    "បញ្ចប់ការសិក្សា": Enrollment.Status.GRADUATED,
+    "ដកចេញ": Enrollment.Status.WITHDRAWN,
+}
+GENDERS = {
+    "ប្រុស": "M",
+    "ស្រី": "F",
+    "ផ្សេងៗ": "O",
+    "other": "O",
+    "male": "M",
+    "female": "F",
+}
+
+
+def khmer_status_to_code(kh):
+    return STATUSES.get(str(kh).strip(), Enrollment.Status.ACTIVE)
+
+
+def khmer_gender_to_code(kh):
+    return GENDERS.get(str(kh).strip(), "")
+
+
+def safe_str(value):
+    """Convert value to string safely (handles numeric phone numbers and empty cells)."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+
+class StudentRow(NamedTuple):
+    """One parsed row of the student import sheet."""
+    line: int
+    student_id: str
+    family_name: str
+    given_name: str
+    gender: str
+    date_of_birth: Optional[object]
+    place_of_birth: str
+    phone_number: str
+    student_type: str
+    enrollment_date: Optional[object]
+    major: str
+    class_name: str
+    year_name: str
+    status: str
+    father_name: str
+    father_job: str
+    father_phone: str
+    mother_name: str
+    mother_job: str
+    mother_phone: str
+
+
+def parse_rows(df):
+    """Parse the rows of an import sheet, skipping rows without a student id."""
+    df = df.rename(columns=lambda c: str(c).strip())
+    rows = []
+    # Excel line numbers of the sheet's default index: the header is line 1
+    for line, row in zip((df.index + 2).tolist(), df.to_dict("records")):
+        student_id = safe_str(row.get("លេខសម្គាល់សិស្ស"))
+        if not student_id:
+            continue
+        student_type = safe_str(row.get("ប្រភេទសិស្ស"))
+        rows.append(StudentRow(
+            line=line,
+            student_id=student_id,
+            family_name=safe_str(row.get("នាមត្រកូល")),
+            given_name=safe_str(row.get("នាមខ្លួន")),
+            gender=khmer_gender_to_code(safe_str(row.get("ភេទ"))),
+            date_of_birth=parse_date(row.get("ថ្ងៃខែឆ្នាំកំណើត")),
+            place_of_birth=safe_str(row.get("កន្លែងកំណើត")),
+            phone_number=safe_str(row.get("លេខទូរស័ព្ទ")),
+            student_type=STUDENT_TYPES.get(student_type, student_type),
+            enrollment_date=parse_date(row.get("កាលបរិច្ឆេទចូលរៀន")),
+            major=safe_str(row.get("ប្រភេទថ្នាក់")) or safe_str(row.get("ជំនាញ")),
+            class_name=safe_str(row.get("ថ្នាក់រៀន")),
+            year_name=safe_str(row.get("ឆ្នាំសិក្សា")),
+            status=khmer_status_to_code(safe_str(row.get("ស្ថានភាព"))),
+            father_name=safe_str(row.get("ឈ្មោះឪពុក")),
+            father_job=safe_str(row.get("មុខរបរ ឪពុក")),
+            father_phone=safe_str(row.get("លេខទូរស័ព្ទ ឪពុក")),
+            mother_name=safe_str(row.get("ឈ្មោះម្តាយ")),
+            mother_job=safe_str(row.get("មុខរបរ ម្តាយ")),
+            mother_phone=safe_str(row.get("លេខទូរស័ព្ទ ម្តាយ")),
+        ))
+    return rows
+
+
+class StudentSheetValidator(SheetValidator):
+    def __init__(self):
+        super().__init__()
+        self.class_names = set(SchoolClass.objects.values_list("name", flat=True))
+        self.year_names = set(AcademicYear.objects.values_list("name", flat=True))
+
+    def validate_rows(self, df):
+        df = df.rename(columns=lambda c: str(c).strip())
+        report = self.report
+        if "លេខសម្គាល់សិស្ស" not in df:
+            report.require(df, "លេខសម្គាល់សិស្ស")
+            return
+        # Rows without a student id are skipped by the import
+        rows = ~blank(df["លេខសម្គាល់សិស្ស"])
+        report.dates(df, "ថ្ងៃខែឆ្នាំកំណើត", rows)
+        report.dates(df, "កាលបរិច្ឆេទចូលរៀន", rows)
+        report.choices(df, "ភេទ", GENDERS, rows)
+        report.choices(df, "ស្ថានភាព", STATUSES, rows)
+        report.choices(df, "ប្រភេទសិស្ស", STUDENT_TYPES, rows)
+        report.choices(df, "ថ្នាក់រៀន", self.class_names, rows, _("រកមិនឃើញថ្នាក់"))
+        report.choices(df, "ឆ្នាំសិក្សា", self.year_names, rows, _("រកមិនឃើញឆ្នាំសិក្សា"))
+        # An enrollment needs both its class and its year
+        if "ថ្នាក់រៀន" in df and "ឆ្នាំសិក្សា" in df:
+            has_class, has_year = stripped(df["ថ្នាក់រៀន"]).ne(""), stripped(df["ឆ្នាំសិក្សា"]).ne("")
+            report.add(rows & has_class & ~has_year, "ឆ្នាំសិក្សា", _("ត្រូវការតម្លៃ"))
+            report.add(rows & has_year & ~has_class, "ថ្នាក់រៀន", _("ត្រូវការតម្លៃ"))
+
+
+def validate_students(chunks):
+    """Validate the DataFrame chunks of a student sheet without writing anything. Returns a ValidationReport."""
+    return StudentSheetValidator().validate(chunks)
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    enrollments: int = 0
+    parent_links: int = 0
+    # Lines whose class or academic year does not exist; the student is imported without enrollment
+    unenrolled: list = field(default_factory=list)
+
+
+class Lookups:
+    """Majors, classes and academic years by name, loaded once per import."""
+
+    def __init__(self):
+        self.majors = {}
+        for major_id, name in Major.objects.order_by("-id").values_list("id", "name"):
+            self.majors[name] = major_id
+        self.classes = {}
+        for class_id, name in SchoolClass.objects.order_by("-id").values_list("id", "name"):
+            self.classes[name] = class_id  # the first class of a name wins, as before
+        self.years = {}
+        for year_id, name in AcademicYear.objects.order_by("-id").values_list("id", "name"):
+            self.years[name] = year_id
+
+    def add_majors(self, names):
+        missing = {name for name in names if name and name not in self.majors}
+        if missing:
+            Major.objects.bulk_create([Major(name=name) for name in sorted(missing)])
+            self.majors.update(Major.objects.filter(name__in=missing).values_list("name", "id"))
+
+
+def _parent_key(row):
+    return (row.father_name or None, row.mother_name or None)
+
+
+def _existing_parents(keys):
+    fathers = {father for father, _mother in keys if father}
+    mothers = {mother for father, mother in keys if not father and mother}
+    parents = {}
+    for parent_id, father, mother in Parent.objects.filter(
+        Q(father_name__in=fathers) | Q(father_name__isnull=True, mother_name__in=mothers)
+    ).order_by("-id").values_list("id", "father_name", "mother_name"):
+        parents[(father, mother)] = parent_id
+    return {key: parents[key] for key in keys if key in parents}
+
+
+def import_chunk(rows, lookups, result):
+    """Upsert one chunk of rows in a single transaction."""
+    # Later rows of the same student win, as with row-by-row update_or_create
+    by_student = {row.student_id: row for row in rows}
+    with transaction.atomic():
+        lookups.add_majors(row.major for row in by_student.values())
+        existing = set(Student.objects.filter(student_id__in=by_student).values_list("student_id", flat=True))
+        Student.objects.bulk_create([
+            Student(
+                student_id=row.student_id,
+                family_name=row.family_name,
+                given_name=row.given_name,
+                gender=row.gender or "",
+                date_of_birth=row.date_of_birth,
+                place_of_birth=row.place_of_birth,
+                phone_number=row.phone_number,
+                student_type=row.student_type,
+                enrollment_date=row.enrollment_date,
+                major_id=lookups.majors.get(row.major),
+            )
+            for row in by_student.values()
+        ], update_conflicts=True, unique_fields=["student_id"], update_fields=STUDENT_FIELDS)
+        students = {
+            student_id: (pk, user_id)
+            for student_id, pk, user_id in Student.objects.filter(student_id__in=by_student).values_list(
+                "student_id", "id", "user_id"
+            )
+        }
+        result.created += len(by_student) - len(existing)
+        result.updated += len(existing)
+
+        # Enrollments without semester; unique_together does not catch them, so match them here
+        enrollments = {}
+        for row in rows:
+            class_id, year_id = lookups.classes.get(row.class_name), lookups.years.get(row.year_name)
+            if class_id and year_id:
+                enrollments[(students[row.student_id][0], year_id)] = (class_id, row)
+            elif row.class_name or row.year_name:
+                result.unenrolled.append(row.line)
+        current = {
+            (enrollment.student_id, enrollment.academic_year_id): enrollment
+            for enrollment in Enrollment.objects.filter(
+                student_id__in=[pk for pk, _user_id in students.values()], semester__isnull=True,
+                academic_year_id__in={year_id for _student, year_id in enrollments},
+            )
+        }
+        created, changed = [], []
+        for (student_pk, year_id), (class_id, row) in enrollments.items():
+            enrollment = current.get((student_pk, year_id)) or Enrollment(student_id=student_pk, academic_year_id=year_id)
+            enrollment.school_class_id = class_id
+            enrollment.status = row.status
+            enrollment.enrolled_date = row.enrollment_date or datetime.today().date()
+            (changed if enrollment.pk else created).append(enrollment)
+        Enrollment.objects.bulk_create(created)
+        Enrollment.objects.bulk_update(changed, ["school_class", "status", "enrolled_date"])
+        result.enrollments += len(enrollments)
+
+        # Parents are shared by name; links go straight into the through table
+        wanted = {_parent_key(row): row for row in rows if row.father_name or row.mother_name}
+        parents = _existing_parents(wanted)
+        missing = [key for key in wanted if key not in parents]
+        if missing:
+            Parent.objects.bulk_create([
+                Parent(
+                    father_name=father, mother_name=mother,
+                    father_phone=wanted[(father, mother)].father_phone or None,
+                    mother_phone=wanted[(father, mother)].mother_phone or None,
+                    father_occupation=wanted[(father, mother)].father_job or None,
+                    mother_occupation=wanted[(father, mother)].mother_job or None,
+                )
+                for father, mother in missing
+            ])
+            parents = _existing_parents(wanted)
+        links = {
+            (parents[_parent_key(row)], students[row.student_id][0])
+            for row in rows if row.father_name or row.mother_name
+        }
+        Parent.students.through.objects.bulk_create([
+            Parent.students.through(parent_id=parent_id, student_id=student_pk) for parent_id, student_pk in links
+        ], ignore_conflicts=True)
+        result.parent_links += len(links)
+
+        # Bulk writes skip the Enrollment signals that keep quiz and course lists fresh
+        stamps = [("enrollments", "")]
+        for student_pk, user_id in students.values():
+            stamps.append(("student", student_pk))
+            if user_id:
+                stamps.append(("user", user_id))
+        bump_stamps_on_commit(stamps)
+
+
+def import_students(rows, chunk_size=SheetImporter.chunk_size):
+    """Import parsed rows chunk by chunk. Returns an ImportResult."""
+    result = ImportResult()
+    lookups = Lookups()
+    for start in range(0, len(rows), chunk_size):
+        import_chunk(rows[start:start + chunk_size], lookups, result)
+    return result
+
+
+class StudentSheetImporter(SheetImporter):
+    def __init__(self, job):
+        super().__init__(job)
+        self.lookups = Lookups()
+
+    def import_rows(self, df):
+        result = ImportResult()
+        import_chunk(parse_rows(df), self.lookups, result)
+        return result.created, result.updated, [(line, _("រកមិនឃើញថ្នាក់ ឬឆ្នាំសិក្សា")) for line in result.unenrolled]
@@ -3,6 +3,9 @@ from apps.classes.models import SchoolClass
 from apps.core.models import AcademicYear, Semester, Major
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.core.conditional import bump_stamp_on_commit
 
 
 # ---------------------------
@@ -90,3 +93,17 @@ class Parent(models.Model):
         if self.mother_name:
             names.append(f"ម្ដាយ: {self.mother_name}")
         return " / ".join(names) if names else _("អាណាព្យាបាល")
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_student_lists_on_enrollment_change(sender, instance, **kwargs):
+    # The student's quiz and course lists depend on their active classes
+    bump_stamp_on_commit("student", instance.student_id)
+    # Class gradebooks list the enrolled students
+    bump_stamp_on_commit("enrollments")
+    try:
+        user_id = instance.student.user_id
+    except Student.DoesNotExist:
+        return
+    if user_id:
+        bump_stamp_on_commit("user", user_id)
@@ -1,3 +1,244 @@
-from django.test import TestCase
+import datetime
+import io
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from openpyxl import load_workbook
+
+from django.db import connection
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.authentication.models import CustomUser
+from apps.classes.models import ClassLevel, SchoolClass
+from apps.core.import_jobs import purge_failed_import_files, resume_job, run_import_job, start_import
+from apps.core.models import AcademicYear, ImportJob, Major, Stamp
+from .importing import StudentSheetImporter, import_students, parse_rows, validate_students
+from .models import Enrollment, Parent, Student
+
+
+def xlsx(df):
+    upload = io.BytesIO()
+    df.to_excel(upload, index=False)
+    return upload.getvalue()
+
+
+def sheet(count, start=1, class_name="12A", year_name="2025-2026"):
+    return pd.DataFrame([
+        {
+            "លេខសម្គាល់សិស្ស": f"S{i}", "នាមត្រកូល": "Sok", "នាមខ្លួន": f"Dara {i}", "ភេទ": "ប្រុស",
+            "ថ្ងៃខែឆ្នាំកំណើត": "01/02/2008", "លេខទូរស័ព្ទ": 12345678, "ប្រភេទសិស្ស": "Full-Time",
+            "ជំនាញ": "Science", "ថ្នាក់រៀន": class_name, "ឆ្នាំសិក្សា": year_name, "ស្ថានភាព": "កំពុងរៀន",
+            "ឈ្មោះឪពុក": f"Father {i % 3}", "ឈ្មោះម្តាយ": f"Mother {i % 3}",
+        }
+        for i in range(start, start + count)
+    ])
+
+
+class StudentImportTests(TestCase):
+    def setUp(self):
+        self.year = AcademicYear.objects.create(
+            name="2025-2026", status=True,
+            start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2026, 1, 1),
+        )
+        self.school_class = SchoolClass.objects.create(name="12A", level=ClassLevel.objects.create(name="12"))
+
+    def test_import_creates_students_enrollments_and_parents(self):
+        result = import_students(parse_rows(sheet(5)))
+
+        self.assertEqual((result.created, result.updated, result.enrollments), (5, 0, 5))
+        student = Student.objects.get(student_id="S1")
+        self.assertEqual(student.gender, "M")
+        self.assertEqual(student.phone_number, "12345678")
+        self.assertEqual(student.student_type, "ពេញម៉ោង")
+        self.assertEqual(student.date_of_birth, datetime.date(2008, 2, 1))
+        self.assertEqual(student.major, Major.objects.get(name="Science"))
+        self.assertEqual(Enrollment.objects.filter(school_class=self.school_class, academic_year=self.year).count(), 5)
+        # Parents are shared by name
+        self.assertEqual(Parent.objects.count(), 3)
+        self.assertEqual(Parent.objects.get(father_name="Father 1").students.count(), 2)
+
+    def test_reimport_updates_in_place(self):
+        import_students(parse_rows(sheet(3)))
+        rows = sheet(4)
+        rows["នាមត្រកូល"] = "Chan"
+        result = import_students(parse_rows(rows))
+
+        self.assertEqual((result.created, result.updated), (1, 3))
+        self.assertEqual(Student.objects.filter(family_name="Chan").count(), 4)
+        self.assertEqual(Enrollment.objects.count(), 4)
+        self.assertEqual(Parent.objects.count(), 3)
+        self.assertEqual(Parent.students.through.objects.count(), 4)
+
+    def test_unknown_class_is_reported(self):
+        result = import_students(parse_rows(sheet(2, class_name="Missing")))
+
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertEqual(result.unenrolled, [2, 3])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        import_students(parse_rows(sheet(1)))
+        # Including the stamps bumped on commit
+        with CaptureQueriesContext(connection) as small, self.captureOnCommitCallbacks(execute=True):
+            import_students(parse_rows(sheet(2, start=100)))
+        with CaptureQueriesContext(connection) as large, self.captureOnCommitCallbacks(execute=True):
+            import_students(parse_rows(sheet(50, start=200)))
+        self.assertEqual(len(small), len(large))
+        student = Student.objects.get(student_id="S249")
+        self.assertTrue(Stamp.objects.filter(scope="student", key=str(student.pk)).exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class StudentImportValidationTests(TestCase):
+    def setUp(self):
+        AcademicYear.objects.create(
+            name="2025-2026", status=True,
+            start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2026, 1, 1),
+        )
+        SchoolClass.objects.create(name="12A", level=ClassLevel.objects.create(name="12"))
+
+    def bad_sheet(self):
+        df = sheet(6)
+        df.loc[1, "ថ្ងៃខែឆ្នាំកំណើត"] = "31/02/2008"
+        df.loc[2, "ភេទ"] = "?"
+        df.loc[3, "ថ្នាក់រៀន"] = "13Z"
+        df.loc[4, "ស្ថានភាព"] = "unknown"
+        df.loc[5, "លេខសម្គាល់សិស្ស"] = None  # skipped by the import, not an error
+        df.loc[5, "ភេទ"] = "?"
+        return df
+
+    def test_errors_are_reported_per_row(self):
+        report = validate_students([self.bad_sheet()])
+
+        self.assertEqual(report.error_lines, [3, 4, 5, 6])
+        errors = report.errors.set_index("line")
+        self.assertEqual(errors.loc[3, "column"], "ថ្ងៃខែឆ្នាំកំណើត")
+        self.assertEqual(errors.loc[5, "value"], "13Z")
+
+    def test_large_sheet_validates_without_queries_per_row(self):
+        df = sheet(10000)
+        with CaptureQueriesContext(connection) as queries:
+            report = validate_students(df[i:i + 500] for i in range(0, len(df), 500))
+        self.assertFalse(report)
+        self.assertEqual(report.rows, 10000)
+        # Classes and years are loaded once for every chunk
+        self.assertEqual(len(queries), 2)
+
+    def test_dry_run_downloads_report_and_writes_nothing(self):
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        self.client.force_login(admin)
+        upload = io.BytesIO()
+        self.bad_sheet().to_excel(upload, index=False)
+        upload.seek(0)
+        upload.name = "students.xlsx"
+
+        response = self.client.post(reverse("admin:import_students"), {"excel_file": upload, "dry_run": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        sheet_rows = list(load_workbook(io.BytesIO(b"".join(response.streaming_content))).active.values)
+        self.assertEqual([row[0] for row in sheet_rows[1:]], [3, 4, 5, 6])
+        self.assertFalse(Student.objects.exists())
+
+        upload.seek(0)
+        self.client.post(reverse("admin:import_students"), {"excel_file": upload})
+        self.assertFalse(Student.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMPORT_ASYNC=False, SECURE_SSL_REDIRECT=False)
+class StudentImportJobTests(TestCase):
+    def setUp(self):
+        AcademicYear.objects.create(
+            name="2025-2026", status=True,
+            start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2026, 1, 1),
+        )
+        SchoolClass.objects.create(name="12A", level=ClassLevel.objects.create(name="12"))
+        self.admin = CustomUser.objects.create_superuser(username="admin", password="x")
+
+    def start(self, df):
+        with self.captureOnCommitCallbacks(execute=True):
+            return start_import(
+                ImportJob.Kind.STUDENTS, SimpleUploadedFile("students.xlsx", xlsx(df)), self.admin, len(df),
+            )
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_upload_runs_as_job_and_page_shows_progress(self):
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile("students.xlsx", xlsx(sheet(5)))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("admin:import_students"), {"excel_file": upload})
+
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f"{reverse('admin:import_students')}?job={job.pk}")
+        # The uploaded sheet is deleted once imported
+        self.assertFalse(job.file)
+        self.assertEqual(default_storage.listdir("imports")[1], [])
+        self.assertEqual((job.status, job.total_rows, job.processed_rows, job.created), (ImportJob.Status.DONE, 5, 5, 5))
+        self.assertEqual(Student.objects.count(), 5)
+        self.assertContains(self.client.get(response.url), f"#{job.pk}")
+        progress = self.client.get(reverse("admin:core_importjob_progress", args=[job.pk])).json()
+        self.assertEqual((progress["processed_rows"], progress["finished"]), (5, True))
+
+    def test_failed_job_resumes_after_last_committed_chunk(self):
+        import_rows = StudentSheetImporter.import_rows
+        calls = []
+
+        def crash_on_second_chunk(importer, df):
+            calls.append(len(df))
+            if len(calls) == 2:
+                raise RuntimeError("worker lost")
+            return import_rows(importer, df)
+
+        with mock.patch.object(StudentSheetImporter, "chunk_size", 2), \
+                mock.patch.object(StudentSheetImporter, "import_rows", crash_on_second_chunk), \
+                self.assertLogs("apps.core.import_jobs", "ERROR"):
+            job = self.start(sheet(5))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created), (ImportJob.Status.FAILED, 2, 2))
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertTrue(default_storage.exists(job.file.name))
+
+        with mock.patch.object(StudentSheetImporter, "chunk_size", 2), \
+                mock.patch.object(StudentSheetImporter, "import_rows", crash_on_second_chunk):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(resume_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created), (ImportJob.Status.DONE, 5, 5))
+        # The committed chunk was not imported again
+        self.assertEqual(calls, [2, 2, 2, 1])
+        self.assertEqual(Student.objects.count(), 5)
+
+    def test_failed_job_sheets_are_purged_after_retention(self):
+        with mock.patch.object(StudentSheetImporter, "import_rows", side_effect=RuntimeError("worker lost")), \
+                self.assertLogs("apps.core.import_jobs", "ERROR"):
+            recent, old = self.start(sheet(2)), self.start(sheet(2))
+        ImportJob.objects.filter(pk=old.pk).update(finished_at=timezone.now() - datetime.timedelta(days=8))
+        old.refresh_from_db()
+        name = old.file.name
+
+        with override_settings(IMPORT_FILE_RETENTION_DAYS=7):
+            self.assertEqual(purge_failed_import_files(), 1)
+        old.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertFalse(old.file)
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(recent.file.name))
+        # Without its sheet the job can no longer be resumed
+        self.assertFalse(resume_job(old))
+
+    def test_running_job_is_only_taken_over_once_stale(self):
+        job = ImportJob.objects.create(
+            kind=ImportJob.Kind.STUDENTS, file=SimpleUploadedFile("students.xlsx", xlsx(sheet(3))),
+            status=ImportJob.Status.RUNNING, heartbeat_at=timezone.now(),
+        )
+        run_import_job(job.pk)
+        self.assertFalse(Student.objects.exists())
+
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+        run_import_job(job.pk)
+        self.assertEqual(Student.objects.count(), 3)
@@ -11,6 +11,11 @@ from django.utils.html import format_html
 from .models import Teacher, Position, Specialty, LeaveRequest
 from django.utils.translation import gettext_lazy as trans
 from .views import download_teacher_template
+from .importing import validate_teachers
+from apps.core.import_jobs import IMPORT_CHUNK_SIZE, redirect_to_job, requested_job, start_import
+from apps.core.importing import check_sheet
+from apps.core.models import ImportJob
+from apps.core.sheets import SheetReader
 
 # -----------------------
 # Shared small textarea
@@ -72,11 +77,11 @@ class SpecialtyAdmin(admin.ModelAdmin):
 
     def import_specialties(self, request):
         if request.method == "POST" and request.FILES.get("excel_file"):
-            df = pd.read_excel(request.FILES["excel_file"])
-            for _, row in df.iterrows():
-                name = str(row.get("Name")).strip()
-                if name:
-                    self.model.objects.get_or_create(name=name)
+            for chunk in SheetReader(request.FILES["excel_file"]).chunks(IMPORT_CHUNK_SIZE):
+                for _, row in chunk.iterrows():
+                    name = str(row.get("Name") or "").strip()
+                    if name:
+                        self.model.objects.get_or_create(name=name)
 
             # ✅ Now works fine
             self.message_user(request, trans("Specialties imported successfully"), level=messages.SUCCESS)
@@ -156,60 +161,15 @@ class TeacherAdmin(admin.ModelAdmin):
     # -------------------
     def import_teachers(self, request):
         if request.method == "POST" and request.FILES.get("excel_file"):
-            df = pd.read_excel(request.FILES["excel_file"])
-
-            for _, row in df.iterrows():
-                # --- Normalize date_of_birth ---
-                dob = row.get("Date of birth")
-                if pd.notna(dob):
-                    try:
-                        if isinstance(dob, (int, float)):
-                            dob = pd.to_datetime(dob, origin="1899-12-30", unit="D").date()
-                        else:
-                            dob = pd.to_datetime(str(dob), dayfirst=True, errors="coerce").date()
-                    except Exception:
-                        dob = None
-                else:
-                    dob = None
-
-                # --- Get or create Position by name ---
-                position_name = row.get("Position", "").strip()
-                if position_name:
-                    position, _ = Position.objects.get_or_create(name=position_name)
-                else:
-                    position = None
-
-                # --- Get or create Teacher ---
-                teacher, _ = Teacher.objects.get_or_create(
-                    tid=row["TID"],
-                    defaults={
-                        "family_name": row.get("Family name", ""),
-                        "given_name": row.get("Given name", ""),
-                        "status": row.get("Status", ""),
-                        "id_card_number": row.get("ID card number", ""),
-                        "date_of_birth": dob,
-                        "email": row.get("Email", ""),
-                        "gender": row.get("Gender", ""),
-                        "phone_number": row.get("Phone number", ""),
-                        "place_of_birth": row.get("Place of birth", ""),
-                        "enrolled_date": pd.to_datetime(row.get("Enrolled date"), dayfirst=True, errors="coerce").date()
-                        if pd.notna(row.get("Enrolled date")) else None,
-                        "position": position,
-                    },
-                )
-
-                # --- Assign specialties by name ---
-                specialties = row.get("Specialized division")
-                if pd.notna(specialties):
-                    teacher.specialties.clear()  # clear previous if updating
-                    for s in str(specialties).split(","):
-                        spec, _ = Specialty.objects.get_or_create(name=s.strip())
-                        teacher.specialties.add(spec)
-
-            self.message_user(request, "Teachers imported successfully", level=messages.SUCCESS)
-            return redirect("..")
+            report = validate_teachers(SheetReader(request.FILES["excel_file"]).chunks(IMPORT_CHUNK_SIZE))
+            response = check_sheet(request, report, "teacher_import_errors.xlsx")
+            if response:
+                return response
+
+            job = start_import(ImportJob.Kind.TEACHERS, request.FILES["excel_file"], request.user, report.rows)
+            return redirect_to_job(request, job)
 
-        return render(request, "admin/teachers/import_teachers.html")
+        return render(request, "admin/teachers/import_teachers.html", {"job": requested_job(request)})
     
 
     # -------------------
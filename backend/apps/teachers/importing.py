@@ -0,0 +1,106 @@
+"""
+Validation and import of the admin's teacher import sheet.
+"""
+import pandas as pd
+from django.utils.translation import gettext as _
+
+from apps.core.import_jobs import SheetImporter
+from apps.core.importing import SheetValidator, blank, parse_date, stripped
+from .models import Position, Specialty, Teacher
+
+REQUIRED_COLUMNS = (
+    "TID", "Family name", "Given name", "ID card number", "Date of birth", "Email", "Gender", "Phone number",
+    "Position", "Enrolled date",
+)
+# Sheet columns of unique teacher fields
+UNIQUE_COLUMNS = {"ID card number": "id_card_number", "Email": "email", "Phone number": "phone_number"}
+EMAIL_RE = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+
+
+class TeacherSheetValidator(SheetValidator):
+    def __init__(self):
+        super().__init__()
+        # New teachers must not reuse the unique fields of existing ones
+        self.tids = set()
+        self.taken = {field: set() for field in UNIQUE_COLUMNS.values()}
+        for teacher in Teacher.objects.values("tid", *UNIQUE_COLUMNS.values()):
+            self.tids.add(teacher["tid"])
+            for field in UNIQUE_COLUMNS.values():
+                if teacher[field]:
+                    self.taken[field].add(str(teacher[field]))
+
+    def validate_rows(self, df):
+        report = self.report
+        for column in REQUIRED_COLUMNS:
+            report.require(df, column)
+        report.dates(df, "Date of birth")
+        report.dates(df, "Enrolled date")
+        report.choices(df, "Gender", Teacher.GenderChoices.values)
+        report.choices(df, "Status", Teacher.StatusChoices.values)
+        if "Email" in df:
+            emails = stripped(df["Email"])
+            report.add(emails.ne("") & ~emails.str.fullmatch(EMAIL_RE), "Email", _("អ៊ីមែលមិនត្រឹមត្រូវ"), df["Email"])
+        if "TID" not in df:
+            return
+
+        report.duplicates(df, "TID")
+        new = ~blank(df["TID"]) & ~stripped(df["TID"]).isin(self.tids)
+        for column, field in UNIQUE_COLUMNS.items():
+            if column not in df:
+                continue
+            report.duplicates(df, column)
+            report.add(new & stripped(df[column]).isin(self.taken[field]), column, _("មានគ្រូផ្សេងប្រើរួចហើយ"), df[column])
+
+
+def validate_teachers(chunks):
+    """Validate the DataFrame chunks of a teacher sheet without writing anything. Returns a ValidationReport."""
+    return TeacherSheetValidator().validate(chunks)
+
+
+def import_teachers(df):
+    """Create the teachers of sheet rows that do not exist yet and set their specialties. Returns (created, updated)."""
+    created_count = updated_count = 0
+    for _index, row in df.iterrows():
+        # --- Get or create Position by name ---
+        position_name = row.get("Position", "").strip()
+        if position_name:
+            position, _created = Position.objects.get_or_create(name=position_name)
+        else:
+            position = None
+
+        # --- Get or create Teacher ---
+        teacher, created = Teacher.objects.get_or_create(
+            tid=row["TID"],
+            defaults={
+                "family_name": row.get("Family name", ""),
+                "given_name": row.get("Given name", ""),
+                "status": row.get("Status", ""),
+                "id_card_number": row.get("ID card number", ""),
+                "date_of_birth": parse_date(row.get("Date of birth")),
+                "email": row.get("Email", ""),
+                "gender": row.get("Gender", ""),
+                "phone_number": row.get("Phone number", ""),
+                "place_of_birth": row.get("Place of birth", ""),
+                "enrolled_date": parse_date(row.get("Enrolled date")),
+                "position": position,
+            },
+        )
+        if created:
+            created_count += 1
+        else:
+            updated_count += 1
+
+        # --- Assign specialties by name ---
+        specialties = row.get("Specialized division")
+        if pd.notna(specialties):
+            teacher.specialties.clear()  # clear previous if updating
+            for s in str(specialties).split(","):
+                spec, _created = Specialty.objects.get_or_create(name=s.strip())
+                teacher.specialties.add(spec)
+    return created_count, updated_count
+
+
+class TeacherSheetImporter(SheetImporter):
+    def import_rows(self, df):
+        created, updated = import_teachers(df)
+        return created, updated, []
@@ -1,3 +1,85 @@
-from django.test import TestCase
+import datetime
+import io
+import tempfile
 
-# Create your tests here.
+import pandas as pd
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from apps.authentication.models import CustomUser
+from apps.core.import_jobs import start_import
+from apps.core.models import ImportJob
+from .importing import validate_teachers
+from .models import Position, Teacher
+
+
+class TeacherImportValidationTests(TestCase):
+    def test_errors_are_reported_per_row(self):
+        Teacher.objects.create(
+            tid="T1", family_name="Mok", given_name="Kong", id_card_number="1",
+            date_of_birth=datetime.date(1990, 1, 1), email="teacher@school.local", gender="Male",
+            phone_number="1", position=Position.objects.create(name="Teacher"),
+            enrolled_date=datetime.date(2020, 1, 1),
+        )
+        row = {
+            "TID": "T2", "Family name": "Chan", "Given name": "Dara", "ID card number": "2",
+            "Date of birth": "01/02/1990", "Email": "dara@school.local", "Gender": "Female", "Phone number": "2",
+            "Position": "Teacher", "Enrolled date": 45000,
+        }
+        df = pd.DataFrame([
+            row,
+            {**row, "TID": "T1", "Email": "kong@school.local", "Phone number": "1", "ID card number": "1"},
+            {**row, "TID": "T3", "Email": "teacher@school.local", "ID card number": "3", "Phone number": "3"},
+            {**row, "TID": "T4", "Gender": "F", "Date of birth": "", "ID card number": "4", "Phone number": "4",
+             "Email": "nobody"},
+        ])
+
+        errors = validate_teachers([df]).errors
+
+        # Updating T1 may keep its own phone and id card; new T3 may not take T1's email
+        self.assertEqual(errors[errors["line"] == 4]["column"].tolist(), ["Email"])
+        self.assertEqual(sorted(errors[errors["line"] == 5]["column"]), ["Date of birth", "Email", "Gender"])
+        self.assertEqual(set(errors["line"]), {4, 5})
+
+    def test_duplicates_are_found_across_chunks(self):
+        row = {
+            "TID": "T2", "Family name": "Chan", "Given name": "Dara", "ID card number": "2",
+            "Date of birth": "01/02/1990", "Email": "dara@school.local", "Gender": "Female", "Phone number": "2",
+            "Position": "Teacher", "Enrolled date": 45000,
+        }
+        df = pd.DataFrame([
+            row,
+            {**row, "TID": "T3", "Email": "chan@school.local", "ID card number": "3", "Phone number": "3"},
+            {**row, "TID": "T4", "Email": "sok@school.local", "ID card number": "4", "Phone number": "4"},
+            {**row, "TID": "T2", "Email": "sao@school.local", "ID card number": "5", "Phone number": "5"},
+            {**row, "TID": "T6", "Email": "pich@school.local", "ID card number": "6", "Phone number": "3"},
+            {**row, "TID": "T2", "Email": "mony@school.local", "ID card number": "7", "Phone number": "7"},
+        ])
+
+        errors = validate_teachers([df[:2], df[2:4], df[4:]]).errors
+
+        self.assertEqual(errors["line"].tolist(), [2, 3, 5, 6, 7])
+        self.assertEqual(errors.set_index("line")["column"].to_dict(), {
+            2: "TID", 3: "Phone number", 5: "TID", 6: "Phone number", 7: "TID",
+        })
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMPORT_ASYNC=False)
+    def test_import_job_creates_teachers(self):
+        admin = CustomUser.objects.create_superuser(username="admin", password="x")
+        upload = io.BytesIO()
+        pd.DataFrame([{
+            "TID": "T2", "Family name": "Chan", "Given name": "Dara", "ID card number": "2",
+            "Date of birth": "01/02/1990", "Email": "dara@school.local", "Gender": "Female", "Phone number": "2",
+            "Position": "Teacher", "Enrolled date": 45000, "Specialized division": "Math, Khmer",
+        }]).to_excel(upload, index=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_import(ImportJob.Kind.TEACHERS, SimpleUploadedFile("teachers.xlsx", upload.getvalue()), admin)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created), (ImportJob.Status.DONE, 1))
+        teacher = Teacher.objects.get(tid="T2")
+        self.assertEqual(teacher.date_of_birth, datetime.date(1990, 2, 1))
+        self.assertEqual(teacher.enrolled_date, datetime.date(2023, 3, 15))
+        self.assertEqual(sorted(teacher.specialties.values_list("name", flat=True)), ["Khmer", "Math"])
@@ -10,8 +10,8 @@ from django.contrib.auth.models import Group
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
 
 # Core app
-from apps.core.models import AcademicYear, Semester, Major
-from apps.core.admin import AcademicYearAdmin, SemesterAdmin, MajorAdmin
+from apps.core.models import AcademicYear, Semester, Major, ImportJob
+from apps.core.admin import AcademicYearAdmin, SemesterAdmin, MajorAdmin, ImportJobAdmin
 
 # Classes app
 from apps.classes.models import ClassLevel, SchoolClass, HomeroomTeacher
@@ -125,6 +125,7 @@ custom_admin_site = MyAdminSite(name="custom_admin")
 custom_admin_site.register(AcademicYear, AcademicYearAdmin)
 custom_admin_site.register(Semester, SemesterAdmin)
 custom_admin_site.register(Major, MajorAdmin)
+custom_admin_site.register(ImportJob, ImportJobAdmin)
 
 # Classes
 custom_admin_site.register(ClassLevel, ClassLevelAdmin)
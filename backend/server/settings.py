@@ -58,6 +58,24 @@ DATABASES = {
     'default': env.db('DATABASE_URL')
 }
 
+# Shared cache (e.g. redis://127.0.0.1:6379/1) so compiled quiz data is reused across workers
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
+# Quiz submissions are graded in celery workers when enabled; otherwise inside the request
+QUIZ_ASYNC_GRADING = env.bool('QUIZ_ASYNC_GRADING', default=False)
+# Admin score recalculations likewise run as background jobs in the workers
+QUIZ_ASYNC_RECALCULATION = env.bool('QUIZ_ASYNC_RECALCULATION', default=QUIZ_ASYNC_GRADING)
+# Spreadsheet imports uploaded in the admin likewise run as background jobs
+IMPORT_ASYNC = env.bool('IMPORT_ASYNC', default=QUIZ_ASYNC_GRADING)
+# Days the uploaded sheet of a failed import is kept for resuming it; finished imports delete theirs
+IMPORT_FILE_RETENTION_DAYS = env.int('IMPORT_FILE_RETENTION_DAYS', default=7)
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='memory://')
+CELERY_TASK_IGNORE_RESULT = True
+# Extra words, one per line, for segmenting Khmer short answers (see apps.quizzes.khmer)
+KHMER_WORDLIST = env('KHMER_WORDLIST', default=None)
+
 # ------------------------------------------------
 # APPLICATIONS
 # ------------------------------------------------